@@ -0,0 +1,51 @@
+"""add jwxt_user_info and user_test_record lookup indexes
+
+Revision ID: 3f1c2a9b7d4e
+Revises:
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a9b7d4e'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 表由 load_db 中的 create_all 创建，新建的库已经带有这些索引，这里只在缺失时创建
+INDEXES = (
+    ("ix_jwxt_user_info_user_id_sync_time", "jwxt_user_info", ["user_id", "sync_time"]),
+    ("ix_user_test_record_user_id_test_name_create_time", "user_test_record", ["user_id", "test_name", "create_time"]),
+)
+# 被上面的复合索引覆盖的单列索引（复合索引以 user_id 开头，同样可以支撑外键）
+REDUNDANT_INDEXES = (("ix_user_test_record_user_id", "user_test_record", ["user_id"]),)
+
+
+def _index_names(table: str) -> set[str]:
+    inspector = sa.inspect(op.get_bind())
+    return {index["name"] for index in inspector.get_indexes(table)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, table, columns in INDEXES:
+        if name not in _index_names(table):
+            op.create_index(name, table, columns)
+    for name, table, _ in REDUNDANT_INDEXES:
+        if name in _index_names(table):
+            op.drop_index(name, table_name=table)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, columns in REDUNDANT_INDEXES:
+        if name not in _index_names(table):
+            op.create_index(name, table, columns)
+    for name, table, _ in INDEXES:
+        if name in _index_names(table):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,37 @@
+"""add user_test_record (user_id, create_time) index
+
+Revision ID: 5d7a9c3e1b2f
+Revises: c4e8a1f2b6d9
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d7a9c3e1b2f'
+down_revision: Union[str, Sequence[str], None] = 'c4e8a1f2b6d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX_NAME = "ix_user_test_record_user_id_create_time"
+
+
+def _index_names() -> set[str]:
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("user_test_record")}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 不按测试名称筛选时的 (create_time, id) 分页
+    if INDEX_NAME not in _index_names():
+        op.create_index(INDEX_NAME, "user_test_record", ["user_id", "create_time"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if INDEX_NAME in _index_names():
+        op.drop_index(INDEX_NAME, table_name="user_test_record")
@@ -0,0 +1,39 @@
+"""add jwxt_user_info.raw_data_hash
+
+Revision ID: 8b2d4e6f1a3c
+Revises: 3f1c2a9b7d4e
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2d4e6f1a3c'
+down_revision: Union[str, Sequence[str], None] = '3f1c2a9b7d4e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _column_names(table: str) -> set[str]:
+    inspector = sa.inspect(op.get_bind())
+    return {column["name"] for column in inspector.get_columns(table)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 旧记录的哈希留空，下一次同步时会写入一条带哈希的新快照
+    if "raw_data_hash" not in _column_names("jwxt_user_info"):
+        op.add_column(
+            "jwxt_user_info",
+            sa.Column("raw_data_hash", sa.String(length=64), nullable=True, comment="原始JSON数据的SHA-256"),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if "raw_data_hash" in _column_names("jwxt_user_info"):
+        op.drop_column("jwxt_user_info", "raw_data_hash")
@@ -0,0 +1,38 @@
+"""add user_test_record idempotency_key
+
+Revision ID: 9e3b5f7d2a4c
+Revises: 5d7a9c3e1b2f
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e3b5f7d2a4c'
+down_revision: Union[str, Sequence[str], None] = '5d7a9c3e1b2f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX_NAME = "uq_user_test_record_user_id_idempotency_key"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if "idempotency_key" not in {column["name"] for column in inspector.get_columns("user_test_record")}:
+        op.add_column(
+            "user_test_record",
+            sa.Column("idempotency_key", sa.String(length=64), nullable=True, comment="客户端生成的幂等键"),
+        )
+    if INDEX_NAME not in {index["name"] for index in inspector.get_indexes("user_test_record")}:
+        op.create_index(INDEX_NAME, "user_test_record", ["user_id", "idempotency_key"], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(INDEX_NAME, table_name="user_test_record")
+    op.drop_column("user_test_record", "idempotency_key")
@@ -0,0 +1,34 @@
+"""add username_sequence
+
+Revision ID: c4e8a1f2b6d9
+Revises: 8b2d4e6f1a3c
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a1f2b6d9'
+down_revision: Union[str, Sequence[str], None] = '8b2d4e6f1a3c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 计数器在每个前缀第一次使用时按已有用户数初始化，这里不需要回填
+    if not sa.inspect(op.get_bind()).has_table("username_sequence"):
+        op.create_table(
+            "username_sequence",
+            sa.Column("prefix", sa.String(length=12), primary_key=True, comment="账号前缀"),
+            sa.Column("value", sa.Integer(), nullable=False, comment="已分配的最大顺序号"),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("username_sequence")
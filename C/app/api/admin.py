@@ -0,0 +1,165 @@
+from typing import Annotated, Literal
+
+from fastapi import APIRouter, Depends, Query, Request
+from redis.asyncio import Redis
+
+from app.core.logger import get_logger_stats
+from app.core.redis import get_redis_client, get_redis_pool_stats
+from app.core.sql import get_db_pool_stats
+from app.deps.auth import check_and_get_current_role
+from app.models.user import User, UserRole
+from app.repositories.jwxt import user_info_write_stats
+from app.schemas.user import UserImportResponse
+from app.services.auth.password_hasher import password_hasher
+from app.services.auth.token_blacklist import blacklist_filter, revoke_user_tokens
+from app.services.auth.token_cache import token_cache
+from app.services.jwxt_info_compactor import jwxt_info_compactor
+from app.services.jwxt_jobs import JOB_QUEUE_KEY, jwxt_job_queue
+from app.services.jwxt_service import jwxt_external_service
+from app.services.jwxt_sync_scheduler import jwxt_sync_scheduler
+from app.services.user_import import UserImporter
+from app.services.view_cache import view_cache
+
+router = APIRouter()
+
+get_current_admin = check_and_get_current_role(UserRole.admin)
+
+
+@router.get("/redis/pool")
+async def redis_pool_stats(current_user: Annotated[User, Depends(get_current_admin)]):
+    """
+    获取 Redis 连接池状态
+
+    返回使用中、空闲以及累计创建的连接数，仅管理员可访问。
+    """
+    return get_redis_pool_stats()
+
+
+@router.get("/db/pool")
+async def db_pool_stats(current_user: Annotated[User, Depends(get_current_admin)]):
+    """
+    获取数据库连接池（主库与只读副本）的使用情况与取连接的等待时间
+    """
+    return get_db_pool_stats()
+
+
+@router.get("/logging")
+async def logging_stats(current_user: Annotated[User, Depends(get_current_admin)]):
+    """
+    获取日志队列的积压与丢弃数量
+    """
+    return get_logger_stats()
+
+
+@router.get("/token-cache")
+async def token_cache_stats(current_user: Annotated[User, Depends(get_current_admin)]):
+    """
+    获取进程内 jwt 鉴权缓存的命中、未命中与淘汰计数
+    """
+    return {"size": len(token_cache), "max_size": token_cache.maxsize, **token_cache.stats.to_json()}
+
+
+@router.get("/token-blacklist")
+async def token_blacklist_stats(current_user: Annotated[User, Depends(get_current_admin)]):
+    """
+    获取本地黑名单布隆过滤器的内存占用、估算与实测误判率以及省掉的 Redis 查询比例
+    """
+    return blacklist_filter.to_json()
+
+
+@router.post("/users/{user_id}/revoke-tokens")
+async def revoke_tokens(
+    user_id: int,
+    current_user: Annotated[User, Depends(get_current_admin)],
+    redis: Annotated[Redis, Depends(get_redis_client)],
+):
+    """
+    吊销指定用户所有未过期的令牌，强制其重新登录
+    """
+    return {"revoked": await revoke_user_tokens(redis, user_id)}
+
+
+@router.get("/password-hasher")
+async def password_hasher_stats(current_user: Annotated[User, Depends(get_current_admin)]):
+    """
+    获取密码哈希工作池的并发与排队情况
+    """
+    return {
+        "executor": password_hasher.executor_type,
+        "max_workers": password_hasher.max_workers,
+        **password_hasher.stats.to_json(),
+    }
+
+
+@router.get("/cache/views")
+async def view_cache_stats(current_user: Annotated[User, Depends(get_current_admin)]):
+    """
+    获取个人资料、教务信息视图缓存的命中率与合并的并发加载数
+    """
+    return {"local_size": len(view_cache), "max_local_size": view_cache.local_size, **view_cache.stats.to_json()}
+
+
+@router.get("/jwxt/connections")
+async def jwxt_connection_stats(current_user: Annotated[User, Depends(get_current_admin)]):
+    """
+    获取访问教务系统时每个主机的请求数、新建连接数与连接复用率
+    """
+    return jwxt_external_service.get_connection_stats()
+
+
+@router.get("/jwxt/resilience")
+async def jwxt_resilience_stats(current_user: Annotated[User, Depends(get_current_admin)]):
+    """
+    获取教务系统熔断器状态、重试预算与对冲请求的触发延迟
+    """
+    return jwxt_external_service.get_resilience_stats()
+
+
+@router.get("/jwxt/jobs")
+async def jwxt_job_stats(
+    current_user: Annotated[User, Depends(get_current_admin)],
+    redis: Annotated[Redis, Depends(get_redis_client)],
+):
+    """
+    获取本进程绑定/同步任务的提交、合并与完成数，以及 Redis 中排队的任务数
+    """
+    return {**jwxt_job_queue.stats.to_json(), "queued": await redis.llen(JOB_QUEUE_KEY)}
+
+
+@router.get("/jwxt/token-cache")
+async def jwxt_token_cache_stats(current_user: Annotated[User, Depends(get_current_admin)]):
+    """
+    获取教务系统 token 缓存的命中率与省掉的登录请求数
+    """
+    return jwxt_external_service.token_cache.stats.to_json()
+
+
+@router.get("/jwxt/sync-scheduler")
+async def jwxt_sync_scheduler_stats(current_user: Annotated[User, Depends(get_current_admin)]):
+    """
+    获取教务系统后台同步的进度与吞吐量
+    """
+    return jwxt_sync_scheduler.stats.to_json()
+
+
+@router.get("/jwxt/info-history")
+async def jwxt_info_history_stats(current_user: Annotated[User, Depends(get_current_admin)]):
+    """
+    获取教务信息快照的写入去重情况与清理任务回收的行数、字节数
+    """
+    return {"writes": user_info_write_stats.to_json(), "compactor": jwxt_info_compactor.stats.to_json()}
+
+
+@router.post("/users/import", response_model=UserImportResponse)
+async def import_users(
+    request: Request,
+    current_user: Annotated[User, Depends(get_current_admin)],
+    file_format: Literal["csv", "jsonl"] = Query("csv", alias="format", description="请求体格式"),
+):
+    """
+    批量导入用户
+
+    请求体为 CSV（首行表头：username,realname,email,password[,role]）或每行一个 JSON 对象的 JSONL，
+    边接收边按批写入。已存在、文件内重复或字段不合法的行记录在 errors 中，不影响其他行的导入。
+    """
+    return await UserImporter().run(request.stream(), file_format)
@@ -1,5 +1,4 @@
 import asyncio
-import os
 import time
 import uuid
 from datetime import datetime, timedelta
@@ -7,18 +6,16 @@ import redis
 from typing import Annotated
 
 import jwt
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from redis.asyncio import Redis
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-# 前端目录路径定义
-FRONTEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "frontend")
-
 from app.core.config import config
+from app.core.frontend import frontend_routes
 from app.core.logger import logger
 from app.core.redis import get_redis_client
 from app.deps.auth import oauth2_scheme, get_current_user  # 确保该依赖已实现用户认证
@@ -26,8 +23,8 @@ from app.deps.sql import get_db
 from app.models.user import User, UserRole
 from app.repositories.user import UserRepository
 from app.schemas.auth import Payload, RegisterRequest
-from app.services.auth.auth_service import authenticate_user, create_access_token, get_password_hash
-from app.services.auth.token_blacklist import add_token_to_blacklist
+from app.services.auth.auth_service import authenticate_user, create_access_token, hash_password_async
+from app.services.auth.token_blacklist import add_token_to_blacklist, track_issued_token
 
 router = APIRouter()
 
@@ -54,11 +51,18 @@ async def logout(
         raise HTTPException(status_code=500, detail="登出失败")
 
 @router.post("/login", tags=["auth"])
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+async def login(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis_client),
+):
     logger.info(f"收到登录请求: {form_data.username}")
 
     repo = UserRepository(db)
     user = await authenticate_user(repo, form_data.username, form_data.password)
+    # 哈希过时时 authenticate_user 已写入新哈希；get_db 的提交在响应发出之后，这里先提交，失败时不签发令牌
+    if db.info.get("has_writes"):
+        await db.commit()
 
     if not user:
         logger.warning(f"用户 {form_data.username} 不存在或密码错误，抛出 401")
@@ -68,9 +72,12 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSessi
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    logger.debug(f"为用户 {form_data.username} 创建 access_token ...")
+    logger.debug("为用户 %s 创建 access_token ...", form_data.username)
     access_token_expires = timedelta(minutes=config.expire_minutes)
-    access_token = create_access_token(payload=Payload(sub=user.username), expires_delta=access_token_expires)
+    payload = Payload(sub=user.username)
+    access_token = create_access_token(payload=payload, expires_delta=access_token_expires)
+    # 记录该用户签发的 jti，修改密码或被管理员强制下线时一次吊销全部令牌
+    await track_issued_token(redis, user.id, payload.jti, int(access_token_expires.total_seconds()))
 
     logger.info(f"用户 {form_data.username} 登录成功, 密钥后五位 {access_token[-5:]}")
     return {"access_token": access_token, "token_type": "bearer"}
@@ -92,7 +99,7 @@ async def register(register_request: RegisterRequest, db: AsyncSession = Depends
         logger.warning(f"邮箱 {register_request.email} 已存在，抛出 400")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
 
-    hashed_password = get_password_hash(register_request.password)
+    hashed_password = await hash_password_async(register_request.password)
 
     try:
         await repo.create_user(
@@ -105,30 +112,24 @@ async def register(register_request: RegisterRequest, db: AsyncSession = Depends
     except IntegrityError as e:
         logger.error(f"注册用户 {register_request.username} 失败: {e}")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="用户名或邮箱已存在")
+    # 提交后再返回，客户端收到成功时用户已经可以在其他 worker 上登录
+    await db.commit()
 
     logger.info(f"用户 {register_request.username} 注册成功")
     return {"msg": "User registered successfully"}
 
 
 @router.get("/register")
-async def register_page():
-    # 先检查是否存在Vue构建后的应用
-    vue_dist_dir = os.path.join(FRONTEND_DIR, "金融就业服务系统", "finance-employment", "dist")
-    index_file = os.path.join(vue_dist_dir, "index.html")
-    
-    if os.path.exists(index_file):
-        # 如果存在Vue构建后的应用，返回index.html，由Vue Router处理/register路由
-        return FileResponse(index_file)
-    else:
-        # 否则尝试返回原有的register.html
-        register_file = os.path.join(FRONTEND_DIR, "register.html")
-        if os.path.exists(register_file):
-            return FileResponse(register_file)
-        else:
-            return JSONResponse({
-                "message": "注册文件未找到",
-                "hint": "请确保已构建Vue应用或register.html文件在frontend目录中"
-            })
+async def register_page(request: Request):
+    # 先返回Vue构建后的应用，由Vue Router处理/register路由；否则返回原有的register.html
+    if frontend_routes.spa_index:
+        return frontend_routes.spa_index.response(request)
+    if frontend_routes.register_page:
+        return frontend_routes.register_page.response(request)
+    return JSONResponse({
+        "message": "注册文件未找到",
+        "hint": "请确保已构建Vue应用或register.html文件在frontend目录中"
+    })
 
 # 用户仪表盘数据接口
 
@@ -1,137 +1,136 @@
-from datetime import datetime
+import json
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.logger import logger
+from app.core.redis import get_shared_redis
 from app.deps.auth import get_current_user, get_db
 from app.models.user import User
 from app.repositories.jwxt import JWXTRepository
 from app.schemas.jwxt import (
     JWXTBindRequest,
     JWXTBindResponse,
-    JWXTSyncResponse,
+    JWXTJobResponse,
     JWXTUserInfoResponse,
 )
+from app.services.jwxt_jobs import FINISHED_STATUSES, job_events_channel, jwxt_job_queue
 from app.services.jwxt_service import jwxt_external_service
-from app.services.password_encryption import decrypt_jwxt_password
+from app.services.password_encryption import encrypt_jwxt_password
+from app.services.view_cache import jwxt_info_view_key, view_cache
 
 router = APIRouter()
 
+JOB_EVENTS_KEEPALIVE = 15.0
+"""SSE 连接上没有进度更新时，每隔多少秒发送一次注释行保持连接"""
 
-@router.post("/bind", response_model=JWXTBindResponse)
+
+def job_response(job: dict, coalesced: bool = False) -> JWXTJobResponse:
+    return JWXTJobResponse(
+        job_id=job["job_id"],
+        kind=job["kind"],
+        status=job["status"],
+        stage=job["stage"],
+        stages=job["stages"],
+        stage_message=job["stage_message"],
+        message=job["message"],
+        data=job["data"],
+        coalesced=coalesced,
+        created_at=job["created_at"],
+        updated_at=job["updated_at"],
+    )
+
+
+@router.post("/bind", response_model=JWXTJobResponse, status_code=status.HTTP_202_ACCEPTED)
 async def bind_jwxt_account(
     request: JWXTBindRequest,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Annotated[AsyncSession, Depends(get_db)],
 ):
     """
     绑定教务系统账号
 
     此接口用于将用户的教务系统账号与当前账号绑定。
-    绑定过程会验证教务系统账号密码的正确性。
+    绑定过程会验证教务系统账号密码的正确性，需要访问教务系统，因此以任务方式执行：
+    接口立即返回任务 ID，通过 /jobs/{job_id} 或 /jobs/{job_id}/events 查询进度与结果。
+    已有未结束的绑定任务时直接返回该任务。
     """
-    try:
-        jwxt_repo = JWXTRepository(db)
-
-        # 检查当前用户是否已绑定
-        existing_binding = await jwxt_repo.get_binding_by_user_id(current_user.id)
-        if existing_binding:
-            return JWXTBindResponse(success=False, message="您已绑定教务系统账号，请先解绑后重新绑定")
-
-        # 检查学号是否已被其他用户绑定
-        is_bound = await jwxt_repo.is_student_id_bound(request.student_id)
-        if is_bound:
-            return JWXTBindResponse(success=False, message="该学号已被其他用户绑定")
-
-        # 验证教务系统账号密码
-        is_valid, user_data, error_msg = await jwxt_external_service.validate_and_get_user_info(
-            request.student_id, request.password
-        )
-
-        if not is_valid:
-            return JWXTBindResponse(success=False, message=f"教务系统验证失败: {error_msg}")
-
-        # 创建绑定记录
-        binding = await jwxt_repo.create_binding(current_user.id, request.student_id, request.password)
+    # 密码加密后再入队，Redis 中不保存明文
+    job, coalesced = await jwxt_job_queue.submit(
+        current_user.id,
+        "bind",
+        {"student_id": request.student_id, "password": encrypt_jwxt_password(request.password)},
+    )
+    return job_response(job, coalesced)
 
-        # 创建用户信息记录
-        if user_data:
-            await jwxt_repo.create_user_info(current_user.id, request.student_id, user_data)
 
-        # 更新绑定的同步时间
-        await jwxt_repo.update_binding(binding, last_sync_time=datetime.now())
-
-        # 提交事务
-        await jwxt_repo.commit()
-
-        logger.info(f"User {current_user.id} successfully bound JWXT account {request.student_id}")
-
-        return JWXTBindResponse(success=True, message="绑定成功", data=user_data)
-
-    except Exception as e:
-        await jwxt_repo.rollback()
-        logger.error(f"Error binding JWXT account for user {current_user.id}: {e}")
-
-        return JWXTBindResponse(success=False, message="绑定失败，请稍后重试")
-
-
-@router.post("/sync", response_model=JWXTSyncResponse)
+@router.post("/sync", response_model=JWXTJobResponse, status_code=status.HTTP_202_ACCEPTED)
 async def sync_jwxt_info(
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Annotated[AsyncSession, Depends(get_db)],
 ):
     """
     从教务系统同步用户信息
 
     此接口用于从教务系统同步最新的用户信息。
-    需要用户已绑定教务系统账号。
+    需要用户已绑定教务系统账号。与绑定一样以任务方式执行，已有未结束的同步任务时直接返回该任务。
     """
-    try:
-        jwxt_repo = JWXTRepository(db)
+    logger.info(f"用户 {current_user.username} 请求从教务系统同步用户信息")
+    job, coalesced = await jwxt_job_queue.submit(current_user.id, "sync", {})
+    return job_response(job, coalesced)
 
-        logger.info(f"用户 {current_user.username} 请求从教务系统同步用户信息")
 
-        logger.debug("[1/4] 获取绑定信息")
-        binding = await jwxt_repo.get_binding_by_user_id(current_user.id)
-        if not binding:
-            return JWXTSyncResponse(success=False, message="您尚未绑定教务系统账号，请先绑定")
-        student_id = binding.student_id
-
-        logger.debug("[2/4] 尝试登录到教务系统")
-        password = decrypt_jwxt_password(binding.jwxt_password)
-        if password is None:
-            return JWXTSyncResponse(success=False, message="密码解密失败，请重新绑定账号")
-        login_response = await jwxt_external_service.authenticate_user(student_id, password)
-        if not login_response.success or not login_response.token:
-            return JWXTSyncResponse(
-                success=False, message=f"教务系统登录失败: {login_response.message}。请重新绑定账号"
-            )
-        token = login_response.token
-
-        logger.debug("[3/4] 获取用户信息")
-        response = await jwxt_external_service.get_user_info(binding.student_id, token)
-        if not response.success or not response.data:
-            return JWXTSyncResponse(success=False, message=f"获取用户信息失败: {response.message}")
-        user_data = response.data
-
-        logger.debug("[4/4] 更新本地数据")
-        await jwxt_repo.create_user_info(current_user.id, binding.student_id, user_data)
-        await jwxt_repo.update_binding(binding, last_sync_time=datetime.now())
-        await jwxt_repo.commit()
+async def get_own_job(job_id: str, user: User) -> dict:
+    job = await jwxt_job_queue.get(job_id)
+    if job is None or job["user_id"] != user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="任务不存在或已过期")
+    return job
 
-        logger.info(f"User {current_user.id} successfully synced JWXT info for account {binding.student_id}")
-        return JWXTSyncResponse(
-            success=True,
-            message="同步成功",
-            data=user_data,
-        )
 
-    except Exception as e:
-        logger.error(f"Error syncing JWXT info for user {current_user.id}: {e}")
+@router.get("/jobs/{job_id}", response_model=JWXTJobResponse)
+async def get_jwxt_job(
+    job_id: str,
+    current_user: Annotated[User, Depends(get_current_user)],
+):
+    """
+    查询绑定/同步任务的进度与结果
+    """
+    return job_response(await get_own_job(job_id, current_user))
 
-        return JWXTSyncResponse(success=False, message="同步失败，请稍后重试")
+
+@router.get("/jobs/{job_id}/events")
+async def stream_jwxt_job(
+    job_id: str,
+    current_user: Annotated[User, Depends(get_current_user)],
+):
+    """
+    以 Server-Sent Events 推送任务进度
+
+    每次状态变化推送一条 data 为任务状态 JSON 的事件，任务结束后关闭连接。
+    """
+    await get_own_job(job_id, current_user)
+
+    async def events():
+        redis = await get_shared_redis()
+        async with redis.pubsub() as pubsub:
+            # 先订阅再读取当前状态，避免漏掉两者之间的更新
+            await pubsub.subscribe(job_events_channel(job_id))
+            job = await jwxt_job_queue.get(job_id)
+            while job is not None:
+                yield f"data: {job_response(job).model_dump_json()}\n\n"
+                if job["status"] in FINISHED_STATUSES:
+                    return
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=JOB_EVENTS_KEEPALIVE)
+                if message is None:
+                    # 保持连接，并在消息丢失时重新读取状态
+                    yield ": keepalive\n\n"
+                    job = await jwxt_job_queue.get(job_id)
+                else:
+                    job = json.loads(message["data"])
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.get("/info", response_model=JWXTUserInfoResponse)
@@ -147,28 +146,26 @@ async def get_jwxt_binding_info(
     try:
         jwxt_repo = JWXTRepository(db)
 
-        # 获取绑定信息
-        binding = await jwxt_repo.get_binding_by_user_id(current_user.id)
+        # 绑定信息与最新快照走读穿透缓存，bind/sync/unbind 提交后删除
+        info = await view_cache.get_or_load(
+            jwxt_info_view_key(current_user.id), lambda: jwxt_repo.get_info_view(current_user.id)
+        )
 
-        if not binding:
+        if not info:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="您尚未绑定教务系统账号")
 
-        jwxt_profiles = await jwxt_repo.get_user_info_by_user_id(current_user.id)
-
-        if not jwxt_profiles:
+        if not info["has_info"]:
             logger.warning(f"No JWXT user info found for user {current_user.id}")
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="未找到同步的教务系统用户信息，请先同步")
 
-        jwxt_profile = jwxt_profiles[0]
-
         return JWXTUserInfoResponse(
-            student_id=binding.student_id,
-            student_name=jwxt_profile.realname,
-            college=jwxt_profile.college,
-            major=jwxt_profile.major,
-            class_name=jwxt_profile.class_name,
-            grade=jwxt_profile.grade,
-            sync_time=binding.last_sync_time or datetime.min,
+            student_id=info["student_id"],
+            student_name=info["realname"],
+            college=info["college"],
+            major=info["major"],
+            class_name=info["class_name"],
+            grade=info["grade"],
+            sync_time=info["sync_time"],
         )
 
     except Exception as e:
@@ -199,6 +196,8 @@ async def unbind_jwxt_account(
         # 删除绑定（级联删除相关数据）
         await jwxt_repo.delete_binding(binding)
         await jwxt_repo.commit()
+        await jwxt_external_service.token_cache.invalidate(binding.student_id)
+        await view_cache.invalidate(jwxt_info_view_key(current_user.id))
 
         logger.info(f"User {current_user.id} successfully unbound JWXT account {binding.student_id}")
 
@@ -1,29 +1,36 @@
+import base64
+import json
 import time
+from datetime import datetime
 from typing import Annotated
 
 import jwt
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import config
 from app.core.logger import logger
 from app.core.redis import get_redis_client
-from app.deps.auth import get_current_user, get_db, oauth2_scheme
+from app.deps.auth import get_current_user, get_current_user_record, get_db, oauth2_scheme
 from app.models.user import User
 from app.repositories.profile import UserProfileRepository
-from app.repositories.test_record import UserTestRecordRepository
+from app.repositories.test_record import TestRecordCursor, UserTestRecordRepository
 from app.repositories.user import UserRepository
 from app.schemas.user import (
     UserAddTestRecordRequest,
+    UserAddTestRecordsRequest,
+    UserAddTestRecordsResponse,
     UserResetPasswordRequest,
     UserSetProfileRequest,
 )
-from app.services.auth_service import (
-    authenticate_user,
-    get_password_hash,
+from app.services.auth.auth_service import (
+    hash_password_async,
+    verify_password_async,
 )
-from app.services.token_blacklist import add_token_to_blacklist
+from app.services.auth.token_blacklist import revoke_user_tokens
+from app.services.view_cache import profile_view_key, view_cache
 
 router = APIRouter()
 
@@ -35,65 +42,50 @@ def get_user_profile_repo(db: Annotated[AsyncSession, Depends(get_db)]) -> UserP
 @router.post("/resetpw", tags=["user"])
 async def reset_password(
     form_data: UserResetPasswordRequest,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[User, Depends(get_current_user_record)],
     redis: Annotated[Redis, Depends(get_redis_client)],
     db: Annotated[AsyncSession, Depends(get_db)],
     token: str = Depends(oauth2_scheme),
 ):
     logger.info(f"用户 {current_user.username} 请求重置密码")
 
-    # 获取用户
     user_repo = UserRepository(db)
-    user = await user_repo.get_by_username(current_user.username)
-    if not user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    user = current_user
 
     # 验证旧密码
-    user = await authenticate_user(user_repo, current_user.username, form_data.old_password)
-    if not user:
+    valid, _ = await verify_password_async(form_data.old_password, user.password)
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
     # 修改密码
-    hashed_password = get_password_hash(form_data.new_password)
+    hashed_password = await hash_password_async(form_data.new_password)
     await user_repo.change_password(user, hashed_password)
 
-    # 将当前 token 加入黑名单
+    # 吊销该用户所有已签发的令牌（包括当前令牌）。这里不等 get_db 在请求结束时提交，而是先提交新密码再吊销：
+    # 否则在吊销与提交之间仍可用旧密码登录，签发的新令牌不在吊销范围内
+    await db.commit()
     payload = jwt.decode(token, config.secret_key, algorithms=config.algorithm)
-    jti = payload.get("jti")
-    exp = payload.get("exp")
-    now = int(time.time())
-    ttl = exp - now
-
-    logger.debug(f"将 jti {jti[-5:]} 加入到 redis 黑名单中...")
-    await add_token_to_blacklist(redis, jti, ttl)
+    current = {payload["jti"]: payload["exp"] - int(time.time())}
+    revoked = await revoke_user_tokens(redis, user.id, include=current)
 
-    logger.info(f"用户 {current_user.username} 登出成功，jti 已禁用")
+    logger.info(f"用户 {current_user.username} 密码重置成功，已吊销 {revoked} 个令牌")
     return {"msg": "密码重置成功，请使用新密码登录"}
 
 
 @router.get("/profile", tags=["user"])
 async def get_profile(
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Annotated[AsyncSession, Depends(get_db)],
     profile_repo: Annotated[UserProfileRepository, Depends(get_user_profile_repo)],
 ):
     logger.info(f"用户 {current_user.username} 请求获取个人资料")
 
-    user_repo = UserRepository(db)
-    user = await user_repo.get_by_username(current_user.username)
-    if not user:
+    # 读穿透缓存，setprofile 提交后删除
+    profile_data = await view_cache.get_or_load(
+        profile_view_key(current_user.id), lambda: profile_repo.get_profile_view(current_user.id)
+    )
+    if profile_data is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    profile = await profile_repo.get_by_username(user.username)
-    profile_data = {
-        "username": user.username,
-        "realname": user.realname,
-        "email": user.email,
-        "college": profile.college if profile else None,
-        "major": profile.major if profile else None,
-        "grade": profile.grade if profile else None,
-    }
-
     logger.info(f"用户 {current_user.username} 个人资料获取成功")
     return profile_data
 
@@ -101,16 +93,14 @@ async def get_profile(
 @router.post("/setprofile", tags=["user"])
 async def set_profile(
     profile_data: UserSetProfileRequest,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[User, Depends(get_current_user_record)],
     db: Annotated[AsyncSession, Depends(get_db)],
     profile_repo: Annotated[UserProfileRepository, Depends(get_user_profile_repo)],
 ):
     logger.info(f"用户 {current_user.username} 请求设置个人资料")
 
     user_repo = UserRepository(db)
-    user = await user_repo.get_by_username(current_user.username)
-    if not user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    user = current_user
 
     if profile_data.email or profile_data.realname:
         await user_repo.edit_info(
@@ -120,9 +110,11 @@ async def set_profile(
         )
 
     if not (profile_data.college or profile_data.major or profile_data.grade):
+        await db.commit()
+        await view_cache.invalidate(profile_view_key(user.id))
         return {"msg": "Profile updated successfully"}
 
-    profile = await profile_repo.get_by_username(user.username)
+    profile = await profile_repo.get_by_user_id(user.id)
 
     # 如果已有资料则更新，否则创建新资料
     if profile:
@@ -144,41 +136,111 @@ async def set_profile(
         if not new_profile:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to create profile")
 
+    # 先提交再删除缓存，避免其他请求在提交前把旧数据重新写入缓存
+    await db.commit()
+    await view_cache.invalidate(profile_view_key(user.id))
+
     logger.info(f"用户 {current_user.username} 个人资料设置成功")
     return {"msg": "Profile updated successfully"}
 
 
+def encode_cursor(create_time: datetime, record_id: int) -> str:
+    """把 (create_time, id) 编码为不透明的分页游标"""
+    raw = json.dumps([create_time.isoformat(), record_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> TestRecordCursor:
+    try:
+        create_time, record_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(create_time), int(record_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def serialize_test_record(record) -> dict:
+    return {
+        "test_name": record.test_name,
+        "result": record.result,
+        "details": record.details,
+        "created_at": record.create_time,
+    }
+
+
 @router.get("/testrecords", tags=["user"])
 async def get_test_records(
     current_user: Annotated[User, Depends(get_current_user)],
     db: Annotated[AsyncSession, Depends(get_db)],
     test_name: str | None = None,
+    limit: int = Query(
+        config.test_records_page_size, ge=1, le=config.test_records_max_page_size, description="每页条数"
+    ),
+    cursor: str | None = Query(None, description="上一页返回的 next_cursor，为空时从最新的记录开始"),
+    stream: bool = Query(False, description="为 true 时以 NDJSON 逐行返回游标之后的全部记录，忽略 limit"),
 ):
-    logger.info(f"用户 {current_user.username} 请求获取测试记录")
+    """
+    获取测试记录，按创建时间从新到旧排序
 
-    user_repo = UserRepository(db)
-    user = await user_repo.get_by_username(current_user.username)
-    if not user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    默认分页返回，next_cursor 为空表示没有更多记录；stream=true 时逐行流式返回，内存占用不随记录数增长。
+    """
+    logger.info(f"用户 {current_user.username} 请求获取测试记录")
 
     test_record_repo = UserTestRecordRepository(db)
-    test_records = await test_record_repo.get_by_username(user.username, test_name=test_name)
+    after = decode_cursor(cursor) if cursor else None
+
+    if stream:
+
+        async def ndjson():
+            async for record in test_record_repo.stream_by_user_id(current_user.id, test_name=test_name, after=after):
+                data = serialize_test_record(record)
+                data["created_at"] = record.create_time.isoformat()
+                yield json.dumps(data, ensure_ascii=False) + "\n"
 
-    if not test_records:
-        return {"test_records": []}
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
 
-    records_data = [
-        {
-            "test_name": record.test_name,
-            "result": record.result,
-            "details": record.details,
-            "created_at": record.create_time,
-        }
-        for record in test_records
-    ]
+    # 多取一行用于判断是否还有下一页
+    records = await test_record_repo.get_page_by_user_id(
+        current_user.id, test_name=test_name, limit=limit + 1, after=after
+    )
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        next_cursor = encode_cursor(records[-1].create_time, records[-1].id)
 
     logger.info(f"用户 {current_user.username} 测试记录获取成功")
-    return {"test_records": records_data}
+    return {"test_records": [serialize_test_record(record) for record in records], "next_cursor": next_cursor}
+
+
+async def save_test_records(
+    db: AsyncSession, user_id: int, records: list[UserAddTestRecordRequest]
+) -> UserAddTestRecordsResponse:
+    """
+    写入测试记录：幂等键在本批或数据库中已出现过的记录跳过，其余用一条多行 INSERT 写入
+
+    不带幂等键的记录不做查重；不提交事务，由调用方在返回响应前提交。
+    写入后在同一事务中回查本批的幂等键：事务只看得到查重时已存在的记录与自己写入的记录（MySQL 默认的
+    REPEATABLE READ），查重之后被并发请求抢先写入、因唯一索引冲突而跳过的记录查不到，计入 duplicates
+    """
+    test_record_repo = UserTestRecordRepository(db)
+    keys = [record.idempotency_key for record in records if record.idempotency_key]
+    existing = await test_record_repo.get_existing_idempotency_keys(user_id, keys)
+
+    seen: set[str] = set()
+    duplicates = []
+    rows = []
+    for record in records:
+        key = record.idempotency_key
+        if key and (key in existing or key in seen):
+            duplicates.append(key)
+            continue
+        if key:
+            seen.add(key)
+        rows.append(record.model_dump())
+
+    await test_record_repo.bulk_create_test_records(user_id, rows)
+    inserted = await test_record_repo.get_existing_idempotency_keys(user_id, list(seen))
+    raced = [row["idempotency_key"] for row in rows if row["idempotency_key"] and row["idempotency_key"] not in inserted]
+    return UserAddTestRecordsResponse(created=len(rows) - len(raced), duplicates=duplicates + raced)
 
 
 @router.post("/addtestrecord", tags=["user"])
@@ -189,20 +251,31 @@ async def add_test_record(
 ):
     logger.info(f"用户 {current_user.username} 请求添加测试记录")
 
-    user_repo = UserRepository(db)
-    user = await user_repo.get_by_username(current_user.username)
-    if not user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-
-    test_record_repo = UserTestRecordRepository(db)
-    test_record = await test_record_repo.create_test_record(
-        user_id=user.id,
-        test_name=test_record_data.test_name,
-        result=test_record_data.result,
-        details=test_record_data.details,
-    )
-    if not test_record:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to add test record")
+    result = await save_test_records(db, current_user.id, [test_record_data])
+    await db.commit()
+    if result.duplicates:
+        logger.info(f"用户 {current_user.username} 重复提交测试记录，已忽略")
 
     logger.info(f"用户 {current_user.username} 测试记录添加成功")
     return {"msg": "Test record added successfully"}
+
+
+@router.post("/addtestrecords", tags=["user"], response_model=UserAddTestRecordsResponse)
+async def add_test_records(
+    request_data: UserAddTestRecordsRequest,
+    current_user: Annotated[User, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+):
+    """
+    批量添加测试记录
+
+    每条记录可携带 idempotency_key，客户端重试整批提交时已写入的记录会被跳过并在 duplicates 中返回。
+    """
+    logger.info(f"用户 {current_user.username} 请求批量添加 {len(request_data.records)} 条测试记录")
+
+    result = await save_test_records(db, current_user.id, request_data.records)
+    # 先提交再返回：提交失败时客户端收到错误并重试，不会误以为已经写入
+    await db.commit()
+
+    logger.info(f"用户 {current_user.username} 批量添加测试记录完成: 新增 {result.created}，重复 {len(result.duplicates)}")
+    return result
@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import os
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+
+from fastapi.responses import Response
+from starlette.requests import Request
+
+from .config import config
+from .logger import logger
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))# 获取项目根目录路径
+FRONTEND_DIR = os.path.join(BASE_DIR, "frontend")
+VUE_DIST_DIR = os.path.join(FRONTEND_DIR, "金融就业服务系统", "finance-employment", "dist")
+
+
+@dataclass(frozen=True)
+class FrontendDocument:
+    """缓存在内存中的 html 文档"""
+
+    path: str
+    content: bytes
+    mtime_ns: int
+    etag: str
+    last_modified: str
+
+    @classmethod
+    def load(cls, path: str) -> Optional["FrontendDocument"]:
+        try:
+            with open(path, "rb") as f:
+                content = f.read()
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        return cls(
+            path=path,
+            content=content,
+            mtime_ns=mtime_ns,
+            etag=f'"{hashlib.sha1(content).hexdigest()}"',
+            last_modified=formatdate(mtime_ns / 1e9, usegmt=True),
+        )
+
+    def is_not_modified(self, request: Request) -> bool:
+        """按 If-None-Match / If-Modified-Since 判断客户端缓存是否仍然有效"""
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or self.etag in tags
+
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return self.mtime_ns // 10**9 <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def response(self, request: Request) -> Response:
+        headers = {"ETag": self.etag, "Last-Modified": self.last_modified, "Cache-Control": "no-cache"}
+        if self.is_not_modified(request):
+            return Response(status_code=304, headers=headers)
+        return Response(self.content, media_type="text/html", headers=headers)
+
+
+class FrontendRoutes:
+    """
+    启动时一次性解析前端目录结构，并把 index.html / login.html / register.html 读入内存
+
+    之后的 SPA 导航请求直接从内存返回，不再访问磁盘；开发环境可开启 frontend_watch 在文件变化时重新加载
+    """
+
+    def __init__(self, frontend_dir: str = FRONTEND_DIR, vue_dist_dir: str = VUE_DIST_DIR):
+        self.frontend_dir = frontend_dir
+        self.vue_dist_dir = vue_dist_dir
+        self.spa_index: Optional[FrontendDocument] = None
+        self.login_page: Optional[FrontendDocument] = None
+        self.register_page: Optional[FrontendDocument] = None
+        self.frontend_exists = False
+        self.frontend_files: list[str] = []
+        self._task: Optional[asyncio.Task] = None
+        self.load()
+
+    def _watched_paths(self) -> list[str]:
+        return [
+            os.path.join(self.vue_dist_dir, "index.html"),
+            os.path.join(self.frontend_dir, "login.html"),
+            os.path.join(self.frontend_dir, "register.html"),
+        ]
+
+    def load(self):
+        """重新读取前端目录与 html 文档"""
+        index_file, login_file, register_file = self._watched_paths()
+        self.spa_index = FrontendDocument.load(index_file)
+        self.login_page = FrontendDocument.load(login_file)
+        self.register_page = FrontendDocument.load(register_file)
+        self.frontend_exists = os.path.isdir(self.frontend_dir)
+        try:
+            self.frontend_files = os.listdir(self.frontend_dir) if self.frontend_exists else []
+        except OSError as e:
+            logger.error(f"读取前端目录失败: {e}")
+            self.frontend_files = []
+
+    def _snapshot(self) -> list[Optional[int]]:
+        snapshot = []
+        for path in self._watched_paths():
+            try:
+                snapshot.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                snapshot.append(None)
+        return snapshot
+
+    async def watch(self, interval: float):
+        """轮询 html 文件的修改时间，有变化时重新加载"""
+        last = await asyncio.to_thread(self._snapshot)
+        while True:
+            await asyncio.sleep(interval)
+            current = await asyncio.to_thread(self._snapshot)
+            if current != last:
+                logger.info("检测到前端文件变化，重新加载 index.html")
+                await asyncio.to_thread(self.load)
+                last = current
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.watch(config.frontend_watch_interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+frontend_routes = FrontendRoutes()
@@ -1,5 +1,10 @@
+import atexit
+import json
 import logging
+import queue
 import time
+from datetime import datetime, timedelta
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 import colorlog
 from .config import config
@@ -7,20 +12,91 @@ from .config import config
 LOG_PATH = Path("./logs")
 LOG_PATH.mkdir(exist_ok=True)
 
+_listener: QueueListener | None = None
+_queue_handler: "BoundedQueueHandler | None" = None
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    写入有界队列的 QueueHandler，调用 logger 的线程只负责入队，真正的 IO 在 QueueListener 的后台线程中完成
+
+    队列满时按 policy 处理：drop 丢弃并计数，block 阻塞直到有空位
+    """
+
+    def __init__(self, log_queue: queue.Queue, policy: str = "drop"):
+        super().__init__(log_queue)
+        self.policy = policy
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        if self.policy == "block":
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DailyFileHandler(logging.FileHandler):
+    """按天写入 logs/YYYY-MM-DD.log，跨过午夜后自动切换到新一天的文件"""
+
+    def __init__(self, directory: Path, encoding: str = "utf-8"):
+        self.directory = directory
+        self.rollover_at = self._next_midnight()
+        super().__init__(self._filename(), encoding=encoding, delay=True)
+
+    def _filename(self) -> str:
+        return str(self.directory / f'{time.strftime("%Y-%m-%d", time.localtime())}.log')
+
+    @staticmethod
+    def _next_midnight() -> float:
+        tomorrow = datetime.now().date() + timedelta(days=1)
+        return datetime.combine(tomorrow, datetime.min.time()).timestamp()
+
+    def emit(self, record: logging.LogRecord):
+        if record.created >= self.rollover_at:
+            self.close()
+            self.baseFilename = str(Path(self._filename()).absolute())
+            self.rollover_at = self._next_midnight()
+        super().emit(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(
+            {
+                "time": self.formatTime(record),
+                "name": record.name,
+                "level": record.levelname,
+                "func": record.funcName,
+                "message": record.getMessage(),
+            },
+            ensure_ascii=False,
+        )
+
 
 def init_logger():
 
+    global _listener, _queue_handler
+
     logger = logging.getLogger("app")# 创建名为 "app" 的 logger 对象
-    logger.setLevel(logging.DEBUG)# 日志级别为 DEBUG（最低级别，意味着会记录所有级别的日志
+    # logger 的等级取控制台与文件两者中较低的一个，低于该等级的日志在调用处就被过滤，不会进入队列
+    logger.setLevel(min(logging.getLevelName(config.log_level), logging.getLevelName(config.log_file_level)))
 
     # 创建控制台日志处理器
     console_handler = logging.StreamHandler()
     console_handler.setLevel(config.log_level)
 
-    # 创建文件日志处理器
-    file_handler = logging.FileHandler(f'logs/{time.strftime("%Y-%m-%d", time.localtime())}.log', encoding="utf-8")
-    file_handler.setLevel(logging.DEBUG)
-    file_handler.setFormatter(logging.Formatter("[%(asctime)s] [%(name)s] [%(levelname)s] %(funcName)s: %(message)s"))
+    # 创建文件日志处理器，跨过午夜会切换到新的日期文件
+    file_handler = DailyFileHandler(LOG_PATH)
+    file_handler.setLevel(config.log_file_level)
+    if config.log_json:
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter("[%(asctime)s] [%(name)s] [%(levelname)s] %(funcName)s: %(message)s"))
 
     # 定义颜色输出格式
     color_formatter = colorlog.ColoredFormatter(
@@ -38,18 +114,43 @@ def init_logger():
     console_handler.setFormatter(color_formatter)
 
     # 移除默认的handler
-    for handler in logger.handlers:
+    for handler in list(logger.handlers):
         logger.removeHandler(handler)
+    if _listener is not None:
+        _listener.stop()
     # 禁用日志传播，防止日志被父 logger 重复处理
     logger.propagate = False
 
-    # 添加处理器
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    # 控制台与文件处理器挂在 QueueListener 上，在后台线程中写出，业务代码只做入队
+    _queue_handler = BoundedQueueHandler(queue.Queue(config.log_queue_size), config.log_queue_policy)
+    _listener = QueueListener(_queue_handler.queue, console_handler, file_handler, respect_handler_level=True)
+    _listener.start()
+    logger.addHandler(_queue_handler)
 
     return logger # 将配置好的 logger 对象导出，
     # 其他模块只需通过 from .logger import logger 导入，
     # 即可使用 logger.debug()、logger.info()、logger.error() 等方法记录不同级别的日志，实现统一的日志管理。
 
 
+def stop_logger():
+    """停止后台写日志线程，并把队列中剩余的日志写完"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger_stats() -> dict:
+    """日志队列当前积压数量与因队列已满而丢弃的日志数量"""
+    if _queue_handler is None:
+        return {"queued": 0, "dropped": 0, "capacity": config.log_queue_size, "policy": config.log_queue_policy}
+    return {
+        "queued": _queue_handler.queue.qsize(),
+        "dropped": _queue_handler.dropped,
+        "capacity": config.log_queue_size,
+        "policy": config.log_queue_policy,
+    }
+
+
 logger = init_logger()
+atexit.register(stop_logger)
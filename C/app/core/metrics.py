@@ -0,0 +1,168 @@
+import os
+import shutil
+import time
+from typing import Optional
+
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import config
+from .logger import logger
+
+# 多进程模式需要在导入 prometheus_client 之前设置数据目录
+if config.metrics_multiproc_dir:
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", config.metrics_multiproc_dir)
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+try:
+    import prometheus_client
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+    from prometheus_client import multiprocess
+except ImportError:  # prometheus_client 为可选依赖，未安装时所有指标都是空操作，/metrics 返回 503
+    prometheus_client = None
+
+"""Prometheus 指标
+
+记录每个路由的请求数（按状态码分类）与延迟直方图、数据库连接池取连接的等待时间、Redis 命令延迟以及教务系统上游请求的延迟与结果，
+由 /metrics 以 Prometheus 文本格式输出。
+
+多个 uvicorn worker 时设置 metrics_multiproc_dir（即 PROMETHEUS_MULTIPROC_DIR），各进程把指标写入该目录下的 mmap 文件，
+/metrics 汇总目录中所有进程的数据，因此无论请求落到哪个 worker 结果都一致。该目录需要在启动服务前清空。
+"""
+
+# 秒；覆盖从缓存命中的亚毫秒级请求到等待教务系统的数秒请求
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs) -> "_NoopMetric":
+        return self
+
+    def observe(self, value: float):
+        pass
+
+    def inc(self, amount: float = 1):
+        pass
+
+    def set(self, value: float):
+        pass
+
+
+def _histogram(name: str, documentation: str, labelnames: list[str], buckets=LATENCY_BUCKETS):
+    if prometheus_client is None:
+        return _NoopMetric()
+    return Histogram(name, documentation, labelnames, buckets=buckets)
+
+
+def _counter(name: str, documentation: str, labelnames: list[str]):
+    if prometheus_client is None:
+        return _NoopMetric()
+    return Counter(name, documentation, labelnames)
+
+
+def _gauge(name: str, documentation: str, labelnames: list[str]):
+    if prometheus_client is None:
+        return _NoopMetric()
+    # 多进程模式下取存活进程中的最大值
+    return Gauge(name, documentation, labelnames, multiprocess_mode="livemax")
+
+
+http_requests = _counter("http_requests_total", "HTTP 请求数", ["method", "route", "status"])
+http_request_duration = _histogram("http_request_duration_seconds", "HTTP 请求延迟", ["method", "route"])
+db_pool_checkout_duration = _histogram(
+    "db_pool_checkout_seconds", "从数据库连接池取出连接的等待时间", ["pool"], buckets=FAST_BUCKETS
+)
+db_pool_checkout_timeouts = _counter("db_pool_checkout_timeouts_total", "从数据库连接池取连接超时的次数", ["pool"])
+redis_command_duration = _histogram("redis_command_duration_seconds", "Redis 命令延迟", ["command"], buckets=FAST_BUCKETS)
+redis_command_errors = _counter("redis_command_errors_total", "Redis 命令失败次数", ["command"])
+jwxt_request_duration = _histogram(
+    "jwxt_upstream_duration_seconds", "教务系统上游请求延迟，outcome 为请求结果", ["method", "outcome"]
+)
+jwxt_circuit_state = _gauge("jwxt_circuit_state", "教务系统熔断器状态：0 关闭，1 半开，2 打开", ["host"])
+jwxt_circuit_rejections = _counter("jwxt_circuit_rejections_total", "熔断器打开时直接拒绝的教务系统请求数", ["host"])
+jwxt_retries = _counter("jwxt_retries_total", "教务系统请求的重试次数，reason 为重试原因", ["method", "reason"])
+jwxt_hedged_requests = _counter(
+    "jwxt_hedged_requests_total", "发出的对冲请求数，winner 为先成功返回的一方（primary/hedge），都失败时为 none", ["method", "winner"]
+)
+
+
+def status_class(status_code: int) -> str:
+    return f"{status_code // 100}xx"
+
+
+def route_template(scope: Scope) -> str:
+    """
+    请求匹配到的路由模板，未匹配任何路由时为 unmatched
+
+    include_router 注册的路由在 scope["route"] 中是子路由器里的原始路由（路径不带前缀，如 /profile），
+    带前缀的完整模板在 FastAPI 的路由上下文中；旧版本 FastAPI 没有该上下文，scope["route"].path 本身就是完整模板
+    """
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    path = getattr(context, "path", None) or getattr(scope.get("route"), "path", None)
+    return path or "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    记录每个请求的路由、状态码分类与耗时（到响应体发送完毕为止）
+
+    路由标签使用匹配到的路由模板（如 /api/user/testrecords、/{path:path}），不使用原始路径，避免标签数量无限增长
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = route_template(scope)
+            method = scope["method"]
+            http_request_duration.labels(method, route).observe(time.perf_counter() - start)
+            http_requests.labels(method, route, status_class(status_code)).inc()
+
+
+def metrics_response() -> Response:
+    """以 Prometheus 文本格式输出指标，多进程模式下汇总所有 worker 的数据"""
+    if prometheus_client is None:
+        return Response("prometheus_client 未安装\n", status_code=503, media_type="text/plain")
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def clear_multiproc_dir(path: Optional[str] = None):
+    """启动服务前清空多进程指标目录，避免上次运行遗留的数据被计入"""
+    path = path or os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not path or not os.path.isdir(path):
+        return
+    for name in os.listdir(path):
+        full_path = os.path.join(path, name)
+        if os.path.isdir(full_path):
+            shutil.rmtree(full_path)
+        else:
+            os.remove(full_path)
+    logger.info(f"已清空多进程指标目录: {path}")
+
+
+def mark_process_dead():
+    """worker 退出时调用，清理该进程在多进程目录中的实时数据"""
+    if prometheus_client is not None and "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
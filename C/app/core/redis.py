@@ -1,22 +1,122 @@
+import time
 from collections.abc import AsyncGenerator
-from redis.asyncio import Redis
+from typing import Optional
+
+from redis.asyncio import ConnectionPool, Redis
+from redis.asyncio.client import Pipeline
+
 from .config import config
 from .logger import logger
+from .metrics import redis_command_duration, redis_command_errors
+
+
+class CountingConnectionPool(ConnectionPool):
+    """在 ConnectionPool 的基础上记录累计创建过的连接数，便于观察连接是否被复用"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.created_connections = 0
+
+    def make_connection(self):
+        self.created_connections += 1
+        return super().make_connection()
+
+
+class InstrumentedPipeline(Pipeline):
+    """整个管道的一次往返记为一条 PIPELINE 命令"""
+
+    async def execute(self, raise_on_error: bool = True):
+        start = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        except Exception:
+            redis_command_errors.labels("PIPELINE").inc()
+            raise
+        finally:
+            redis_command_duration.labels("PIPELINE").observe(time.perf_counter() - start)
+
+
+class InstrumentedRedis(Redis):
+    """记录每条 Redis 命令的耗时与失败次数，标签为命令名（GET、SET、EXISTS 等）"""
+
+    async def execute_command(self, *args, **options):
+        command = str(args[0]).upper()
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        except Exception:
+            redis_command_errors.labels(command).inc()
+            raise
+        finally:
+            redis_command_duration.labels(command).observe(time.perf_counter() - start)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> InstrumentedPipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+# 进程内共享的连接池与客户端，由 main.py 的 lifespan 负责创建和关闭
+_pool: Optional[CountingConnectionPool] = None
+_client: Optional[InstrumentedRedis] = None
+
+
+def _create_pool() -> CountingConnectionPool:
+    return CountingConnectionPool(
+        host=config.redis_host,  # 从配置中获取Redis主机地址（localhost）
+        port=config.redis_port,  # 从配置中获取Redis端口（默认6379）
+        max_connections=config.redis_max_connections,
+        health_check_interval=config.redis_health_check_interval,
+        socket_timeout=config.redis_socket_timeout,
+        socket_connect_timeout=config.redis_socket_connect_timeout,
+        decode_responses=True,  # 自动将Redis返回的字节数据解码为字符串（方便使用）
+    )
+
+
+async def load_redis():
+    """初始化进程内共享的 Redis 连接池"""
+    global _pool, _client
+    if _client is not None:
+        return
+    logger.info("初始化 Redis 连接池...")
+    _pool = _create_pool()
+    _client = InstrumentedRedis(connection_pool=_pool)
+
+
+async def close_redis():
+    """关闭 Redis 连接池，断开所有连接"""
+    global _pool, _client
+    if _client is None:
+        return
+    await _client.aclose()
+    if _pool is not None:  # _client 可能由测试或压测替换为进程内的 Redis，没有连接池
+        await _pool.disconnect()
+    _pool, _client = None, None
+
+
+def get_redis_pool_stats() -> dict:
+    """获取连接池状态：使用中 / 空闲 / 累计创建的连接数"""
+    if _pool is None:
+        return {"in_use": 0, "idle": 0, "created": 0, "max_connections": config.redis_max_connections}
+    return {
+        "in_use": len(_pool._in_use_connections),
+        "idle": len(_pool._available_connections),
+        "created": _pool.created_connections,
+        "max_connections": _pool.max_connections,
+    }
+
+
+async def get_shared_redis() -> Redis:
+    """获取进程内共享的 Redis 客户端，供依赖注入以外的服务层代码使用"""
+    if _client is None:
+        # 未经过 lifespan 启动（如脚本或测试直接调用）时按需初始化
+        await load_redis()
+    return _client  # type: ignore[return-value]
 
 
 #                                异步生成器函数 接收值类型 返回值类型
 async def get_redis_client() -> AsyncGenerator[Redis, None]:
+    """
+    依赖注入函数，提供进程内共享的 Redis 客户端。
 
-    """这是一个异步生成器函数，生成异步的Redis客户端并管理其生命周期。"""
-
-    logger.info("初始化 Redis 实例...")
-    # 创建异步Redis客户端实例
-    client = Redis(
-                        host=config.redis_host,    # 从配置中获取Redis主机地址（localhost）
-                        port=config.redis_port,    # 从配置中获取Redis端口（默认6379）
-                        decode_responses=True      # 自动将Redis返回的字节数据解码为字符串（方便使用）
-                    )
-    try:
-        yield client  # 提供客户端给调用方使用
-    finally:
-        await client.close()  # 关闭 redis连接
\ No newline at end of file
+    客户端背后是同一个连接池，请求结束后不关闭连接，连接归还到池中供后续请求复用。
+    """
+    yield await get_shared_redis()
@@ -15,12 +15,22 @@
 # 作用：完全释放数据库连接资源，避免应用退出后仍有残留连接
 
 
+import time
 from collections.abc import AsyncGenerator
-from sqlalchemy import Column, Integer, DateTime, func
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import Column, Integer, DateTime, event, func
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine, async_sessionmaker  # 新增导入async_sessionmaker
-from sqlalchemy.orm import declarative_base, declared_attr  # 移除同步sessionmaker
+from sqlalchemy.orm import Session, declarative_base, declared_attr  # 移除同步sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.sql.elements import TextClause
+from starlette.requests import Request
 from app.core.config import config
 from app.core.logger import logger
+from app.core.metrics import db_pool_checkout_duration, db_pool_checkout_timeouts
+from app.core.timing import record_timing
 
 # 保持基类定义不变
 Base = declarative_base()
@@ -37,29 +47,185 @@ class BaseModel:
     update_time = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now(), comment="更新时间")
 
 
+class PoolCheckoutStats:
+    """连接池取连接的次数、等待时间与超时次数"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def to_json(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+        }
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """记录每次从连接池取出连接所等待时间的连接池"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_stats = PoolCheckoutStats()
+        self.label = "primary"
+        """指标中的 pool 标签"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.checkout_stats.timeouts += 1
+            db_pool_checkout_timeouts.labels(self.label).inc()
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            self.checkout_stats.checkouts += 1
+            self.checkout_stats.total_wait += wait
+            self.checkout_stats.max_wait = max(self.checkout_stats.max_wait, wait)
+            db_pool_checkout_duration.labels(self.label).observe(wait)
+            record_timing("db-pool", wait)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.checkout_stats = self.checkout_stats
+        pool.label = self.label
+        return pool
+
+
+def _create_engine(url: str, label: str = "primary") -> AsyncEngine:
+    engine = create_async_engine(
+        url,
+        poolclass=TimedQueuePool,
+        pool_size=config.db_pool_size,
+        max_overflow=config.db_max_overflow,
+        pool_timeout=config.db_pool_timeout,
+        pool_recycle=config.db_pool_recycle,
+        pool_pre_ping=config.db_pool_pre_ping,
+        echo=False,  # 生产环境关闭SQL日志
+    )
+    engine.pool.label = label
+    return engine
+
+
 # 异步引擎配置
-_engine: AsyncEngine = create_async_engine(
-    config.db_url,
-    pool_pre_ping=True,
-    echo=False,  # 生产环境关闭SQL日志
+_engine: AsyncEngine = _create_engine(config.db_url)
+# 只读副本引擎，未配置时为 None，所有查询走主库
+_replica_engine: Optional[AsyncEngine] = (
+    _create_engine(config.db_replica_url, "replica") if config.db_replica_url else None
 )
 
+
+class ReplicaStickiness:
+    """
+    记录最近提交过写操作的用户，在 db_replica_sticky_seconds 内这些用户的读请求继续走主库
+
+    只在当前进程内生效，多 worker 部署时同一用户的请求落到其他进程仍可能读到副本上的旧数据
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._until: dict[object, float] = {}
+
+    def stick(self, key: object):
+        now = time.monotonic()
+        self._until[key] = now + self.ttl
+        if len(self._until) > 10000:
+            self._until = {k: v for k, v in self._until.items() if v > now}
+
+    def is_sticky(self, key: object) -> bool:
+        until = self._until.get(key)
+        return until is not None and until > time.monotonic()
+
+
+replica_stickiness = ReplicaStickiness(config.db_replica_sticky_seconds)
+
+
+class RoutingSession(Session):
+    """
+    读写分离的会话：只读查询走副本，写操作（flush、INSERT/UPDATE/DELETE、SELECT ... FOR UPDATE）走主库
+
+    会话内一旦写过，之后的查询都走主库；提交后按 info["sticky_key"]（当前用户）在一段时间内保持走主库
+    """
+
+    def get_bind(self, mapper=None, *, clause=None, **kw):
+        primary = super().get_bind(mapper, clause=clause, **kw)
+        if _replica_engine is None or self.info.get("use_primary"):
+            return primary
+        # 原生 SQL 无法判断是否只读，按写操作处理
+        if self._flushing or (
+            clause is not None
+            and (clause.is_dml or isinstance(clause, TextClause) or getattr(clause, "_for_update_arg", None))
+        ):
+            self.info["use_primary"] = True
+            return primary
+        if replica_stickiness.is_sticky(self.info.get("sticky_key")):
+            return primary
+        return _replica_engine.sync_engine
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _stick_to_primary_after_write(session: Session):
+    if session.info.get("use_primary") and session.info.get("sticky_key") is not None:
+        replica_stickiness.stick(session.info["sticky_key"])
+
+
+def use_primary(session: AsyncSession):
+    """强制该会话之后的查询都走主库，用于读取后马上要基于结果写入的场景"""
+    session.info["use_primary"] = True
+
+
+def get_db_pool_stats() -> dict:
+    """主库与副本连接池的使用情况与取连接等待时间"""
+    stats = {}
+    for name, engine in (("primary", _engine), ("replica", _replica_engine)):
+        if engine is None:
+            continue
+        pool = engine.pool
+        stats[name] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "idle": pool.checkedin(),
+            **pool.checkout_stats.to_json(),
+        }
+    return stats
+
+
 # 创建异步会话工厂：使用async_sessionmaker替代sessionmaker
 AsyncSessionLocal = async_sessionmaker(  # 这里从sessionmaker改为async_sessionmaker
     _engine, 
     class_=AsyncSession,
+    sync_session_class=RoutingSession,
     autocommit=False, 
     autoflush=False,
     expire_on_commit=False  # 异步模式建议设置
 )
 
-# 异步依赖注入函数（保持不变）
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
-    """异步获取数据库会话，自动关闭连接"""
+READ_ONLY_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+# 异步依赖注入函数
+async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    异步获取数据库会话，自动关闭连接
+
+    GET/HEAD/OPTIONS 请求是只读的，结束时不提交，直接关闭会话；其余请求结束时统一提交一次，仓库层只 flush 不提交。
+    这里的清理在响应发出之后才执行，提交失败不会反映到响应上，因此写接口应在返回前自行 commit，
+    这里的提交只是兜底（没有未提交的修改时不产生写入）
+    """
+    read_only = request.method in READ_ONLY_METHODS
     async with AsyncSessionLocal() as session:
         try:
             yield session
-            await session.commit()
+            if not read_only:
+                await session.commit()
+            elif session.info.get("has_writes") or session.new or session.dirty or session.deleted:
+                logger.warning(f"只读请求 {request.method} {request.url.path} 中的数据库修改未提交，已丢弃")
         except Exception as e:
             await session.rollback()
             raise e
@@ -67,6 +233,68 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_session_has_writes(session: Session, flush_context):
+    session.info["has_writes"] = True
+
+
+class SQLStatementCounter:
+    """单个请求内执行的 SQL 语句与事务提交/回滚计数"""
+
+    def __init__(self):
+        self.count = 0
+        self.commits = 0
+        self.rollbacks = 0
+
+    @property
+    def round_trips(self) -> int:
+        """
+        与数据库的往返次数：每条语句以及每次 COMMIT/ROLLBACK 各算一次
+
+        get_db 在响应发出后才结束会话，其中的最终 COMMIT/ROLLBACK 不会计入响应头
+        """
+        return self.count + self.commits + self.rollbacks
+
+
+_sql_statement_counter: ContextVar[Optional[SQLStatementCounter]] = ContextVar("sql_statement_counter", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_sql_statement(conn, cursor, statement, parameters, context, executemany):
+    counter = _sql_statement_counter.get()
+    if counter is not None:
+        counter.count += 1
+    conn.info["query_start"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _time_sql_statement(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info.pop("query_start", None)
+    if start is not None:
+        record_timing("db", time.perf_counter() - start)
+
+
+@event.listens_for(Engine, "commit")
+def _count_commit(conn):
+    counter = _sql_statement_counter.get()
+    if counter is not None:
+        counter.commits += 1
+
+
+@event.listens_for(Engine, "rollback")
+def _count_rollback(conn):
+    counter = _sql_statement_counter.get()
+    if counter is not None:
+        counter.rollbacks += 1
+
+
+def start_sql_statement_counter() -> SQLStatementCounter:
+    """为当前请求开始统计 SQL 语句数，之后在同一上下文中执行的语句都会计入返回的计数器"""
+    counter = SQLStatementCounter()
+    _sql_statement_counter.set(counter)
+    return counter
+
+
 async def load_db():
     """异步初始化数据库表"""
     logger.info("初始化数据库表...")
@@ -77,4 +305,6 @@ async def load_db():
 async def close_db():
     """关闭数据库引擎，释放连接资源"""
     await _engine.dispose()
+    if _replica_engine is not None:
+        await _replica_engine.dispose()
     
\ No newline at end of file
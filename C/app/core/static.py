@@ -0,0 +1,163 @@
+import gzip
+import mimetypes
+import os
+import re
+from pathlib import Path
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from .logger import logger
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，未安装时只生成 .gz
+    brotli = None
+
+STATIC_CACHE_PATH = Path("./cache/static")
+
+# Vite 等构建工具输出的带内容哈希的文件名，例如 index-BxYz12Ab.js、app.3f9a1c2e.css（哈希段至少含一个数字）
+HASHED_NAME = re.compile(r"[.-](?=[A-Za-z0-9_]*\d)[A-Za-z0-9_]{8,}\.[A-Za-z0-9]+$")
+COMPRESSIBLE_SUFFIXES = {".js", ".mjs", ".css", ".html", ".svg", ".json", ".map", ".txt", ".xml", ".wasm"}
+# 优先级从高到低：(Accept-Encoding 中的名称, 文件后缀)
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+def accepted_encodings(accept_encoding: str) -> set[str]:
+    """解析 Accept-Encoding，忽略 q=0 的编码"""
+    encodings = set()
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if name:
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    在 StaticFiles 的基础上：
+    - 客户端接受时返回 .br/.gz 预压缩文件（构建产物自带的或启动时生成到 cache/static 下的）
+    - 带内容哈希的文件名返回 Cache-Control: immutable，其余文件要求重新验证
+    ETag/If-None-Match、Range 与 sendfile（服务器支持 http.response.pathsend 时）由 FileResponse 提供
+    """
+
+    def __init__(
+        self,
+        *,
+        directory: str,
+        precompress: bool = True,
+        min_size: int = 1024,
+        cache_dir: Path = STATIC_CACHE_PATH,
+        **kwargs,
+    ):
+        super().__init__(directory=directory, **kwargs)
+        self.min_size = min_size
+        self.cache_dir = cache_dir
+        self.variants: dict[str, dict[str, str]] = {}
+        """原文件绝对路径 -> {编码: 压缩文件路径}"""
+        self._build_variants(precompress)
+
+    def _build_variants(self, precompress: bool):
+        root = os.path.realpath(self.directory)
+        generated = 0
+        for dirpath, _, filenames in os.walk(root):
+            names = set(filenames)
+            for filename in filenames:
+                if filename.endswith((".br", ".gz")):
+                    continue
+                full_path = os.path.join(dirpath, filename)
+                variants = {
+                    encoding: os.path.join(dirpath, filename + suffix)
+                    for encoding, suffix in ENCODINGS
+                    if filename + suffix in names
+                }
+                if precompress and self._compressible(full_path):
+                    rel_path = os.path.relpath(full_path, root)
+                    for encoding, suffix in ENCODINGS:
+                        if encoding in variants or (encoding == "br" and brotli is None):
+                            continue
+                        target = self.cache_dir / (rel_path + suffix)
+                        if self._compress(full_path, target, encoding):
+                            generated += 1
+                        variants[encoding] = str(target.absolute())
+                if variants:
+                    self.variants[full_path] = variants
+        logger.info(f"静态文件预压缩完成: {len(self.variants)} 个文件有压缩版本，本次新生成 {generated} 个")
+
+    def _compressible(self, full_path: str) -> bool:
+        try:
+            return Path(full_path).suffix in COMPRESSIBLE_SUFFIXES and os.path.getsize(full_path) >= self.min_size
+        except OSError:
+            return False
+
+    @staticmethod
+    def _compress(source: str, target: Path, encoding: str) -> bool:
+        """生成压缩文件，已有且比原文件新时跳过；返回是否新生成"""
+        if target.exists() and target.stat().st_mtime >= os.stat(source).st_mtime:
+            return False
+        target.parent.mkdir(parents=True, exist_ok=True)
+        data = Path(source).read_bytes()
+        compressed = brotli.compress(data) if encoding == "br" else gzip.compress(data, compresslevel=9, mtime=0)
+        tmp = target.with_name(target.name + ".tmp")
+        tmp.write_bytes(compressed)
+        tmp.replace(target)
+        return True
+
+    @staticmethod
+    def cache_control(full_path: str) -> str:
+        return IMMUTABLE_CACHE_CONTROL if HASHED_NAME.search(os.path.basename(full_path)) else REVALIDATE_CACHE_CONTROL
+
+    def _select_variant(self, full_path: str, request_headers: Headers) -> tuple[Optional[str], Optional[str]]:
+        variants = self.variants.get(str(full_path))
+        if not variants:
+            return None, None
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        for encoding, _ in ENCODINGS:
+            if encoding in variants and encoding in accepted:
+                return encoding, variants[encoding]
+        return None, None
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        headers = {"Cache-Control": self.cache_control(str(full_path))}
+        if str(full_path) in self.variants:
+            headers["Vary"] = "Accept-Encoding"
+
+        encoding, variant_path = self._select_variant(full_path, request_headers)
+        variant_stat = None
+        if variant_path is not None:
+            try:
+                variant_stat = os.stat(variant_path)
+            except OSError:
+                encoding = None
+
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+            # media_type 按原文件名推断，ETag/Content-Length 按压缩文件计算
+            response = FileResponse(
+                variant_path,
+                status_code=status_code,
+                headers=headers,
+                media_type=mimetypes.guess_type(str(full_path))[0] or "text/plain",
+                stat_result=variant_stat,
+            )
+        else:
+            response = FileResponse(full_path, status_code=status_code, headers=headers, stat_result=stat_result)
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,113 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import config
+
+"""请求内各阶段耗时（Server-Timing）
+
+鉴权（jwt 解码、黑名单检查）、SQL、连接池等待、bcrypt 与教务系统上游请求把各自的耗时记入当前请求的 RequestTiming，
+响应时以标准的 Server-Timing 响应头返回，浏览器开发者工具的 Timing 面板与压测脚本可以直接看到每个阶段占了多少时间。
+
+只对管理员（get_current_user 鉴权通过后标记）或带调试请求头 X-Server-Timing 的请求返回，避免向普通用户暴露内部耗时。
+"""
+
+SERVER_TIMING_REQUEST_HEADER = "x-server-timing"
+
+
+class RequestTiming:
+    """单个请求内按阶段累计的耗时与次数"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: dict[str, list] = {}
+        """阶段名 -> [累计秒数, 次数]，按首次出现的顺序输出"""
+        self.expose = False
+        """是否返回 Server-Timing 响应头"""
+
+    def add(self, name: str, seconds: float):
+        phase = self.phases.get(name)
+        if phase is None:
+            self.phases[name] = [seconds, 1]
+        else:
+            phase[0] += seconds
+            phase[1] += 1
+
+    def header_value(self) -> str:
+        """Server-Timing 响应头的值，dur 单位为毫秒，多次发生的阶段在 desc 中注明次数"""
+        metrics = []
+        for name, (seconds, count) in self.phases.items():
+            metric = f"{name};dur={seconds * 1000:.2f}"
+            if count > 1:
+                metric += f';desc="x{count}"'
+            metrics.append(metric)
+        metrics.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.2f}")
+        return ", ".join(metrics)
+
+
+_request_timing: ContextVar[Optional[RequestTiming]] = ContextVar("request_timing", default=None)
+
+
+def start_request_timing() -> RequestTiming:
+    """为当前请求开始记录耗时，之后在同一上下文中记录的阶段都会计入返回的对象"""
+    timing = RequestTiming()
+    _request_timing.set(timing)
+    return timing
+
+
+def record_timing(name: str, seconds: float):
+    """把一个阶段的耗时记入当前请求，不在请求上下文中（脚本、后台任务）时忽略"""
+    timing = _request_timing.get()
+    if timing is not None:
+        timing.add(name, seconds)
+
+
+@contextmanager
+def timed(name: str):
+    """记录 with 块的耗时，块内抛出异常时同样记录"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_timing(name, time.perf_counter() - start)
+
+
+def expose_server_timing():
+    """让当前请求返回 Server-Timing 响应头，由鉴权在确认是管理员后调用"""
+    timing = _request_timing.get()
+    if timing is not None:
+        timing.expose = True
+
+
+def debug_header_allowed(value: Optional[str]) -> bool:
+    if value is None:
+        return False
+    if config.server_timing_token:
+        return value == config.server_timing_token
+    return config.env == "dev"
+
+
+class ServerTimingMiddleware:
+    """为每个请求开始记录耗时，需要时在响应开始时加上 Server-Timing 响应头（total 为到响应头发出为止的耗时）"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = start_request_timing()
+        timing.expose = debug_header_allowed(Headers(scope=scope).get(SERVER_TIMING_REQUEST_HEADER))
+
+        async def send_with_timing(message: Message):
+            if message["type"] == "http.response.start" and timing.expose:
+                MutableHeaders(scope=message).append("Server-Timing", timing.header_value())
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
@@ -11,10 +11,12 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import config
 from app.core.logger import logger
 from app.core.redis import get_redis_client
+from app.core.timing import expose_server_timing, timed
 from app.models.user import User, UserRole
 from app.repositories.user import UserRepository
 from app.schemas.auth import Payload
 from app.services.auth.token_blacklist import is_token_blacklisted
+from app.services.auth.token_cache import token_cache
 
 from .sql import get_db
 
@@ -34,8 +36,25 @@ async def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+    # 先查进程内缓存：只解析载荷取出 jti（不验签），命中时会比对完整令牌
+    try:
+        with timed("jwt"):
+            jti = jwt.decode(token, options={"verify_signature": False}).get("jti")
+    except InvalidTokenError:
+        logger.warning("用户鉴权失败，用户使用了无效的 jwt")
+        raise credentials_exception
+
+    if jti and (principal := token_cache.get(jti, token)):
+        logger.debug("鉴权成功(缓存): 登录用户 %s", principal.username)
+        db.info["sticky_key"] = principal.username  # 读写分离时该用户刚写入过则继续读主库
+        if principal.role == UserRole.admin:
+            expose_server_timing()
+        return User(id=principal.user_id, username=principal.username, role=principal.role, status=principal.status)
+
     try:
-        payload_dict = jwt.decode(token, config.secret_key, algorithms=[config.algorithm])
+        with timed("jwt"):
+            payload_dict = jwt.decode(token, config.secret_key, algorithms=[config.algorithm])
         payload = Payload(**payload_dict)
         if (
             (payload.sub is None or payload.exp is None)
@@ -53,6 +72,7 @@ async def get_current_user(
         logger.warning("用户鉴权失败，用户使用了无效的 jwt")
         raise credentials_exception
 
+    db.info["sticky_key"] = payload.sub  # 读写分离时该用户刚写入过则继续读主库
     repo = UserRepository(db)
     user = await repo.get_by_username(payload.sub)
 
@@ -60,7 +80,32 @@ async def get_current_user(
         logger.warning("用户鉴权失败，尝试登录的用户不存在或已被禁用")
         raise credentials_exception
 
-    logger.debug(f"鉴权成功: 登录用户 {user.username}")
+    token_cache.put(payload.jti, token, payload.exp, user.id, user.username, user.role, user.status)
+
+    if user.role == UserRole.admin:
+        expose_server_timing()
+    logger.debug("鉴权成功: 登录用户 %s", user.username)
+    return user
+
+
+async def get_current_user_record(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[User, Depends(get_current_user)],
+) -> User:
+    """
+    获取当前登录用户完整的 users 行
+
+    get_current_user 未命中鉴权缓存时已在本请求的会话中加载过该用户，此时直接从会话的身份映射返回；
+    命中缓存时按主键查询一次。因此一个请求内当前用户最多只会被查询一次。
+    """
+    user = await UserRepository(db).get_by_id(current_user.id)
+    if not user or not user.status:
+        logger.warning("用户鉴权失败，尝试登录的用户不存在或已被禁用")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
 
@@ -2,7 +2,7 @@ from datetime import datetime
 from typing import Optional
 
 import sqlalchemy
-from sqlalchemy import DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.core.sql import Base
@@ -15,7 +15,7 @@ class JWXTBinding(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True, autoincrement=True, comment="主键ID")
     user_id: Mapped[int] = mapped_column(
-        Integer, ForeignKey("user.id", ondelete="CASCADE"), nullable=False, unique=True, comment="用户ID"
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, unique=True, comment="用户ID"
     )
     student_id: Mapped[str] = mapped_column(String(20), nullable=False, unique=True, comment="学号")
     jwxt_password: Mapped[str] = mapped_column(String(255), nullable=False, comment="教务系统密码(加密)")
@@ -42,10 +42,12 @@ class JWXTUserInfo(Base):
     """从教务系统同步的用户信息表"""
 
     __tablename__ = "jwxt_user_info"
+    # 按用户查询最近一次同步的信息：WHERE user_id = ? ORDER BY sync_time DESC
+    __table_args__ = (Index("ix_jwxt_user_info_user_id_sync_time", "user_id", "sync_time"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True, autoincrement=True, comment="主键ID")
     user_id: Mapped[int] = mapped_column(
-        Integer, ForeignKey("user.id", ondelete="CASCADE"), nullable=False, comment="用户ID"
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, comment="用户ID"
     )
     student_id: Mapped[str] = mapped_column(String(20), nullable=False, comment="学号")
     realname: Mapped[Optional[str]] = mapped_column(String(50), nullable=True, comment="学生姓名")
@@ -56,6 +58,7 @@ class JWXTUserInfo(Base):
 
     # 存储原始JSON数据
     raw_data: Mapped[Optional[str]] = mapped_column(Text, nullable=True, comment="原始JSON数据")
+    raw_data_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True, comment="原始JSON数据的SHA-256")
 
     sync_time: Mapped[datetime] = mapped_column(
         DateTime,
@@ -11,7 +11,7 @@ class UserProfile(Base):
     __tablename__ = "user_profile"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True, autoincrement=True, comment="主键ID")
-    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("user.id"), nullable=False, unique=True, comment="用户ID")
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False, unique=True, comment="用户ID")
 
     college: Mapped[str] = mapped_column(String(100), nullable=True, comment="学院")
     major: Mapped[str] = mapped_column(String(100), nullable=True, comment="专业")
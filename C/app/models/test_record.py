@@ -1,7 +1,8 @@
 from datetime import datetime
+from typing import Optional
 
 import sqlalchemy
-from sqlalchemy import DateTime, Integer, String
+from sqlalchemy import DateTime, Index, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.core.sql import Base
@@ -9,13 +10,21 @@ from app.core.sql import Base
 
 class UserTestRecord(Base):
     __tablename__ = "user_test_record"
+    # 按用户（及测试名称）查询测试记录，并按创建时间排序；主键隐含在二级索引末尾，可直接用于 (create_time, id) 分页
+    __table_args__ = (
+        Index("ix_user_test_record_user_id_test_name_create_time", "user_id", "test_name", "create_time"),
+        Index("ix_user_test_record_user_id_create_time", "user_id", "create_time"),
+        # 同一用户的幂等键唯一，客户端重试提交时不会重复写入；未提供幂等键（NULL）的记录不受约束
+        Index("uq_user_test_record_user_id_idempotency_key", "user_id", "idempotency_key", unique=True),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True, autoincrement=True, comment="主键ID")
-    user_id: Mapped[int] = mapped_column(Integer, sqlalchemy.ForeignKey("user.id"), nullable=False, comment="用户ID")
+    user_id: Mapped[int] = mapped_column(Integer, sqlalchemy.ForeignKey("users.id"), nullable=False, comment="用户ID")
 
     test_name: Mapped[str] = mapped_column(String(50), nullable=False, comment="测试名称")
     result: Mapped[str] = mapped_column(String(250), nullable=False, comment="测试结果")
     details: Mapped[str] = mapped_column(String(500), nullable=True, comment="测试详情")
+    idempotency_key: Mapped[Optional[str]] = mapped_column(String(64), nullable=True, comment="客户端生成的幂等键")
 
     create_time: Mapped[datetime] = mapped_column(
         DateTime,
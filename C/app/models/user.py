@@ -41,3 +41,12 @@ class User(Base):
         onupdate=sqlalchemy.func.now(),
         comment="更新时间",
     )
+
+
+class UsernameSequence(Base):
+    """按账号前缀分配顺序号的计数器表，替代 COUNT(*) LIKE 'prefix%'"""
+
+    __tablename__ = "username_sequence"
+
+    prefix: Mapped[str] = mapped_column(String(12), primary_key=True, comment="账号前缀")
+    value: Mapped[int] = mapped_column(Integer, nullable=False, default=0, comment="已分配的最大顺序号")
@@ -1,15 +1,32 @@
+import hashlib
 import json
+from dataclasses import asdict, dataclass
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy import select
+from sqlalchemy import delete, func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
 
 from app.models.jwxt import JWXTBinding, JWXTUserInfo
 from app.schemas.jwxt import JWXTUserInfoAPIResponse
 from app.services.password_encryption import encrypt_jwxt_password
 
 
+@dataclass
+class UserInfoWriteStats:
+    inserted: int = 0
+    """写入的新快照数"""
+    unchanged: int = 0
+    """与上一条快照内容相同、只更新了同步时间的次数"""
+
+    def to_json(self):
+        return asdict(self)
+
+
+user_info_write_stats = UserInfoWriteStats()
+
+
 class JWXTRepository:
     """JWXT数据访问层"""
 
@@ -26,6 +43,17 @@ class JWXTRepository:
         result = await self.db.execute(select(JWXTBinding).where(JWXTBinding.student_id == student_id))
         return result.scalar_one_or_none()
 
+    async def get_bindings_due_for_sync(self, before: datetime, after_id: int = 0, limit: int = 100) -> List[JWXTBinding]:
+        """获取最后同步时间早于 before（或从未同步）的绑定，按ID分批读取"""
+        result = await self.db.execute(
+            select(JWXTBinding)
+            .where(JWXTBinding.id > after_id)
+            .where(or_(JWXTBinding.last_sync_time.is_(None), JWXTBinding.last_sync_time < before))
+            .order_by(JWXTBinding.id)
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+
     async def create_binding(self, user_id: int, student_id: str, password: str) -> JWXTBinding:
         """创建新的绑定"""
         # 加密密码
@@ -65,7 +93,7 @@ class JWXTRepository:
         result = await self.db.execute(
             select(JWXTUserInfo)
             .where(JWXTUserInfo.user_id == user_id)
-            .order_by(JWXTUserInfo.sync_time.desc())
+            .order_by(JWXTUserInfo.sync_time.desc(), JWXTUserInfo.id.desc())
             .limit(limit)
         )
         return list(result.scalars().all())
@@ -75,24 +103,107 @@ class JWXTRepository:
         user_info_list = await self.get_user_info_by_user_id(user_id, 1)
         return user_info_list[0] if user_info_list else None
 
+    async def get_info_view(self, user_id: int) -> Optional[dict]:
+        """
+        获取教务信息页需要的绑定与最新快照字段
+
+        :return: 可直接 JSON 序列化的字典；未绑定时返回 None，已绑定但没有快照时 has_info 为 False
+        """
+        binding = await self.db.execute(
+            select(JWXTBinding.student_id, JWXTBinding.last_sync_time).where(JWXTBinding.user_id == user_id)
+        )
+        binding_row = binding.one_or_none()
+        if binding_row is None:
+            return None
+
+        info = await self.db.execute(
+            select(
+                JWXTUserInfo.realname, JWXTUserInfo.college, JWXTUserInfo.major, JWXTUserInfo.class_name, JWXTUserInfo.grade
+            )
+            .where(JWXTUserInfo.user_id == user_id)
+            .order_by(JWXTUserInfo.sync_time.desc(), JWXTUserInfo.id.desc())
+            .limit(1)
+        )
+        info_row = info.one_or_none()
+        sync_time = binding_row.last_sync_time or datetime.min
+        return {
+            "student_id": binding_row.student_id,
+            "sync_time": sync_time.isoformat(),
+            "has_info": info_row is not None,
+            **(dict(info_row._mapping) if info_row else {}),
+        }
+
     async def create_user_info(self, user_id: int, student_id: str, user_data: JWXTUserInfoAPIResponse) -> JWXTUserInfo:
-        """创建用户信息记录"""
+        """
+        创建用户信息记录
+
+        与该用户最近一条记录的 raw_data 哈希相同时不再插入新行，只更新那一条的同步时间
+        """
+        raw_data = json.dumps(user_data, ensure_ascii=False, sort_keys=True)
+        raw_data_hash = hashlib.sha256(raw_data.encode("utf-8")).hexdigest()
+
+        result = await self.db.execute(
+            select(JWXTUserInfo)
+            .options(defer(JWXTUserInfo.raw_data))
+            .where(JWXTUserInfo.user_id == user_id)
+            .order_by(JWXTUserInfo.sync_time.desc(), JWXTUserInfo.id.desc())
+            .limit(1)
+        )
+        latest = result.scalar_one_or_none()
+        if latest is not None and latest.student_id == student_id and latest.raw_data_hash == raw_data_hash:
+            latest.sync_time = func.now()  # 与新记录的 server_default 使用同一时钟
+            await self.db.flush()
+            user_info_write_stats.unchanged += 1
+            return latest
+
         user_info = JWXTUserInfo(
             user_id=user_id,
             student_id=student_id,
             realname=user_data.get("xm"),
-            college=user_data.get("college"),
-            major=user_data.get("major"),
-            class_name=user_data.get("class_name"),
-            grade=user_data.get("grade"),
-            enrollment_date=user_data.get("enrollment_date"),
-            raw_data=json.dumps(user_data, ensure_ascii=False),
+            college=user_data.get("yxmc"),
+            major=user_data.get("zymc"),
+            class_name=user_data.get("bj"),
+            grade=user_data.get("nj"),
+            raw_data=raw_data,
+            raw_data_hash=raw_data_hash,
         )
 
         self.db.add(user_info)
         await self.db.flush()
+        user_info_write_stats.inserted += 1
         return user_info
 
+    async def get_user_ids_over_retention(self, keep_last: int, after_user_id: int = 0, limit: int = 500) -> List[int]:
+        """获取信息记录数超过 keep_last 条的用户ID，按用户ID分批读取"""
+        result = await self.db.execute(
+            select(JWXTUserInfo.user_id)
+            .where(JWXTUserInfo.user_id > after_user_id)
+            .group_by(JWXTUserInfo.user_id)
+            .having(func.count(JWXTUserInfo.id) > keep_last)
+            .order_by(JWXTUserInfo.user_id)
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+
+    async def get_user_info_history(self, user_ids: List[int]) -> list:
+        """获取这些用户全部信息记录的 (id, user_id, sync_time, raw_data 长度)，每个用户按同步时间倒序"""
+        result = await self.db.execute(
+            select(
+                JWXTUserInfo.id,
+                JWXTUserInfo.user_id,
+                JWXTUserInfo.sync_time,
+                func.coalesce(func.length(JWXTUserInfo.raw_data), 0),
+            )
+            .where(JWXTUserInfo.user_id.in_(user_ids))
+            .order_by(JWXTUserInfo.user_id, JWXTUserInfo.sync_time.desc(), JWXTUserInfo.id.desc())
+        )
+        return list(result.all())
+
+    async def delete_user_info_by_ids(self, ids: List[int]) -> int:
+        """按ID批量删除信息记录，返回删除行数"""
+        result = await self.db.execute(delete(JWXTUserInfo).where(JWXTUserInfo.id.in_(ids)))
+        return result.rowcount
+
     async def is_student_id_bound(self, student_id: str, exclude_user_id: Optional[int] = None) -> bool:
         """检查学号是否已被其他用户绑定"""
         query = select(JWXTBinding).where(JWXTBinding.student_id == student_id)
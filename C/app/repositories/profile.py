@@ -19,6 +19,27 @@ class UserProfileRepository:
         result = await self.session.execute(select(UserProfile).join(User).where(User.username == username))
         return result.scalar_one_or_none()
 
+    async def get_by_user_id(self, user_id: int) -> Optional[UserProfile]:
+        """
+        通过用户ID获得用户资料对象
+        """
+        result = await self.session.execute(select(UserProfile).where(UserProfile.user_id == user_id))
+        return result.scalar_one_or_none()
+
+    async def get_profile_view(self, user_id: int) -> Optional[dict]:
+        """
+        一条查询获取个人资料页需要的用户信息与资料（资料不存在时对应字段为 None）
+
+        :return: 可直接 JSON 序列化的字典，用户不存在时返回 None
+        """
+        result = await self.session.execute(
+            select(User.username, User.realname, User.email, UserProfile.college, UserProfile.major, UserProfile.grade)
+            .outerjoin(UserProfile, UserProfile.user_id == User.id)
+            .where(User.id == user_id)
+        )
+        row = result.one_or_none()
+        return dict(row._mapping) if row else None
+
     async def create_profile(
         self,
         user_id: int,
@@ -45,7 +66,7 @@ class UserProfileRepository:
         )
         self.session.add(profile)
         try:
-            await self.session.commit()
+            await self.session.flush()
             await self.session.refresh(profile)
             return profile
         except IntegrityError:
@@ -78,7 +99,7 @@ class UserProfileRepository:
             profile.grade = grade
 
         try:
-            await self.session.commit()
+            await self.session.flush()
             await self.session.refresh(profile)
             return profile
         except IntegrityError:
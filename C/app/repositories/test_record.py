@@ -1,13 +1,29 @@
+from collections.abc import AsyncIterator
+from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import select
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import Row, Select, insert, select, tuple_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.test_record import UserTestRecord
 from app.models.user import User
 
 
+# 分页游标：上一页最后一条记录的 (create_time, id)
+TestRecordCursor = tuple[datetime, int]
+
+# 列表只需要这些列，按列查询不经过 ORM 身份映射，流式读取时内存不随行数增长
+TEST_RECORD_COLUMNS = (
+    UserTestRecord.id,
+    UserTestRecord.test_name,
+    UserTestRecord.result,
+    UserTestRecord.details,
+    UserTestRecord.create_time,
+)
+
+
 class UserTestRecordRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
@@ -22,35 +38,93 @@ class UserTestRecordRepository:
         result = await self.session.execute(query)
         return result.scalars().all()  # type: ignore
 
-    async def create_test_record(
+    async def get_by_user_id(self, user_id: int, test_name: Optional[str] = None) -> list[UserTestRecord]:
+        """
+        通过用户ID获得用户测试记录对象
+        """
+        query = select(UserTestRecord).where(UserTestRecord.user_id == user_id)
+        if test_name:
+            query = query.where(UserTestRecord.test_name == test_name)
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
+
+    @staticmethod
+    def _page_query(user_id: int, test_name: Optional[str], after: Optional[TestRecordCursor]) -> Select:
+        """按 (create_time, id) 从新到旧排序，从游标之后开始"""
+        query = select(*TEST_RECORD_COLUMNS).where(UserTestRecord.user_id == user_id)
+        if test_name:
+            query = query.where(UserTestRecord.test_name == test_name)
+        if after is not None:
+            # 行值比较，MySQL 8 与 SQLite 都能把它当作索引上的范围扫描
+            query = query.where(tuple_(UserTestRecord.create_time, UserTestRecord.id) < tuple_(*after))
+        return query.order_by(UserTestRecord.create_time.desc(), UserTestRecord.id.desc())
+
+    async def get_page_by_user_id(
         self,
         user_id: int,
-        test_name: str,
-        result: str,
-        details: Optional[str] = None,
-    ) -> Optional[UserTestRecord]:
+        test_name: Optional[str] = None,
+        limit: int = 50,
+        after: Optional[TestRecordCursor] = None,
+    ) -> list[Row]:
         """
-        创建一个用户测试记录
+        分页获取用户测试记录（keyset 分页）
 
-        :param user_id: 用户ID
-        :param test_name: 测试名称
-        :param result: 测试结果
-        :param details: 测试详情
+        :param after: 上一页最后一条记录的 (create_time, id)，为空时从最新的记录开始
 
-        :return: 用户测试记录对象。失败则返回 None
+        :return: 最多 limit 行，每行包含 TEST_RECORD_COLUMNS 中的列
         """
+        result = await self.session.execute(self._page_query(user_id, test_name, after).limit(limit))
+        return list(result.all())
 
-        test_record = UserTestRecord(
-            user_id=user_id,
-            test_name=test_name,
-            result=result,
-            details=details,
+    async def stream_by_user_id(
+        self,
+        user_id: int,
+        test_name: Optional[str] = None,
+        after: Optional[TestRecordCursor] = None,
+        batch_size: int = 500,
+    ) -> AsyncIterator[Row]:
+        """
+        用服务端游标逐行读取用户测试记录，每次从数据库取 batch_size 行，顺序与 get_page_by_user_id 相同
+        """
+        query = self._page_query(user_id, test_name, after).execution_options(yield_per=batch_size)
+        result = await self.session.stream(query)
+        async for row in result:
+            yield row
+
+    async def get_existing_idempotency_keys(self, user_id: int, keys: list[str]) -> set[str]:
+        """
+        找出该用户已经使用过的幂等键
+        """
+        if not keys:
+            return set()
+        result = await self.session.execute(
+            select(UserTestRecord.idempotency_key).where(
+                UserTestRecord.user_id == user_id, UserTestRecord.idempotency_key.in_(keys)
+            )
         )
-        self.session.add(test_record)
-        try:
-            await self.session.commit()
-            await self.session.refresh(test_record)
-            return test_record
-        except IntegrityError:
-            await self.session.rollback()
-            return None
+        return set(result.scalars().all())
+
+    async def bulk_create_test_records(self, user_id: int, records: list[dict]):
+        """
+        用一条多行 INSERT 批量创建测试记录，不回查生成的行
+
+        幂等键与已有记录冲突的行被跳过（并发重试时由唯一索引兜底）。MySQL 上不用 INSERT IGNORE：
+        它还会把外键错误、超长或越界的值降级为警告，静默丢弃或截断这些行；ON DUPLICATE KEY UPDATE id = id
+        只忽略唯一键冲突，其他错误照常抛出。
+
+        不返回写入行数：SQLAlchemy 的 MySQL 驱动总是带 CLIENT_FOUND_ROWS，被跳过的行也计入 rowcount，
+        需要区分时由调用方在同一事务中用 get_existing_idempotency_keys 回查
+
+        :param records: 每个元素包含 test_name/result/details/idempotency_key
+        """
+        if not records:
+            return
+        rows = [{"user_id": user_id, **record} for record in records]
+        dialect = self.session.get_bind().dialect.name
+        if dialect == "mysql":
+            statement = mysql_insert(UserTestRecord).values(rows).on_duplicate_key_update(id=UserTestRecord.id)
+        elif dialect == "sqlite":
+            statement = sqlite_insert(UserTestRecord).values(rows).on_conflict_do_nothing()
+        else:
+            statement = insert(UserTestRecord).values(rows)
+        await self.session.execute(statement)
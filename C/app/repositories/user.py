@@ -1,8 +1,10 @@
 from typing import Optional
-from sqlalchemy import select, func
+from sqlalchemy import insert, or_, select, func, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models.user import User, UserRole
+from app.models.user import User, UserRole, UsernameSequence
 
 """ Repositories 数据访问层——CRUD
 SessionLocal（会话工厂）→ 
@@ -14,6 +16,14 @@ class UserRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
+    async def get_by_id(self, user_id: int) -> Optional[User]:
+        """
+        通过用户ID获得用户对象
+
+        优先从会话的身份映射中返回，同一会话内已加载过的用户不会再次查询
+        """
+        return await self.session.get(User, user_id)
+
     async def get_by_username(self, username: str) -> Optional[User]:
         """
         通过用户名获得用户对象
@@ -32,11 +42,51 @@ class UserRepository:
         """
         获取当前的添加顺序
 
+        通过 username_sequence 计数器表原子递增，常数时间且并发注册时不会分配到重复的序号。
+        计数器行在当前事务提交前被锁定，事务回滚时序号一起回滚，因此序号连续、不留空洞。
+        某个前缀第一次使用时按已有用户数初始化计数器。
+
         :param prefix: 账号前缀
         """
-        user = await self.session.execute(select(func.count(User.id)).where(User.username.startswith(prefix)))
-        total_users = user.scalar() or 0
-        return total_users + 1
+        dialect = self.session.get_bind().dialect.name
+
+        if dialect == "mysql":
+            # 只用一条 INSERT ... ON DUPLICATE KEY UPDATE 加锁：先 UPDATE 不存在的行会加间隙锁，
+            # REPEATABLE READ 下两个并发的首次注册随后 INSERT 时互相等待对方的间隙锁而死锁。
+            # 计数器行已存在时种子值被忽略，只在不加锁读不到计数器行时才统计已有用户数
+            seeded = await self.session.execute(select(UsernameSequence.value).where(UsernameSequence.prefix == prefix))
+            start = 1 if seeded.scalar_one_or_none() is not None else await self._count_prefix(prefix) + 1
+            # LAST_INSERT_ID(expr) 把插入或递增后的值记在当前连接上，无需再加锁读取
+            await self.session.execute(
+                mysql_insert(UsernameSequence)
+                .values(prefix=prefix, value=func.last_insert_id(start))
+                .on_duplicate_key_update(value=func.last_insert_id(UsernameSequence.value + 1))
+            )
+            return (await self.session.execute(select(func.last_insert_id()))).scalar_one()
+
+        result = await self.session.execute(
+            update(UsernameSequence)
+            .where(UsernameSequence.prefix == prefix)
+            .values(value=UsernameSequence.value + 1)
+            .returning(UsernameSequence.value)
+        )
+        order = result.scalar_one_or_none()
+        if order is not None:
+            return order
+
+        # 该前缀第一次使用：按已有用户数初始化，并发初始化时由主键冲突转为递增
+        start = await self._count_prefix(prefix) + 1
+        result = await self.session.execute(
+            sqlite_insert(UsernameSequence)
+            .values(prefix=prefix, value=start)
+            .on_conflict_do_update(index_elements=[UsernameSequence.prefix], set_={"value": UsernameSequence.value + 1})
+            .returning(UsernameSequence.value)
+        )
+        return result.scalar_one()
+
+    async def _count_prefix(self, prefix: str) -> int:
+        existing = await self.session.execute(select(func.count(User.id)).where(User.username.startswith(prefix)))
+        return existing.scalar() or 0
 
     async def create_user(
         self,
@@ -72,10 +122,39 @@ class UserRepository:
         )
 
         self.session.add(user)
-        await self.session.commit()
+        await self.session.flush()
 
         return user
 
+    async def get_existing_usernames_and_emails(
+        self, usernames: list[str], emails: list[str]
+    ) -> tuple[set[str], set[str]]:
+        """
+        一次查询找出已被占用的用户名与邮箱
+
+        :return: (已存在的用户名集合, 已存在的邮箱集合)
+        """
+        if not usernames and not emails:
+            return set(), set()
+        result = await self.session.execute(
+            select(User.username, User.email).where(or_(User.username.in_(usernames), User.email.in_(emails)))
+        )
+        rows = result.all()
+        return {row.username for row in rows}, {row.email for row in rows}
+
+    async def bulk_create_users(self, users: list[dict]) -> int:
+        """
+        用一条多行 INSERT 批量创建用户
+
+        :param users: 每个元素包含 username/password(已哈希)/realname/email/role/status
+
+        :raise IntegrityError: 用户名或邮箱已存在
+        """
+        if not users:
+            return 0
+        await self.session.execute(insert(User).values(users))
+        return len(users)
+
     async def edit_info(
         self,
         user: User,
@@ -95,14 +174,19 @@ class UserRepository:
         :param dept_no: 院系ID
         :param major_no: 专业ID
         :param class_number: 班级ID
+
+        角色或状态变化时记入 session.info["principal_changes"]，提交后该用户的鉴权缓存被移除（见 token_blacklist）
         """
+        old_role, old_status = user.role, user.status
         user.realname = realname or user.realname
         user.role = role or user.role
-        user.status = status or user.status
+        user.status = status if status is not None else user.status
         user.email = email or user.email
+        if (user.role, user.status) != (old_role, old_status):
+            self.session.info.setdefault("principal_changes", set()).add(user.id)
 
         try:
-            await self.session.commit()
+            await self.session.flush()
         except IntegrityError:
             return False
 
@@ -116,7 +200,7 @@ class UserRepository:
         :param new_password: 新密码（已哈希）
         """
         user.password = new_password
-        await self.session.commit()
+        await self.session.flush()
 
     def _term_filter(self, course_date_column, term: str):
         """
@@ -137,4 +221,4 @@ class UserRepository:
         :param user: 用户对象
         """
         await self.session.delete(user)
-        await self.session.commit()
+        await self.session.flush()
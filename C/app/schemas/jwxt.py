@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Any, Optional, TypedDict
+from typing import Any, Literal, Optional, TypedDict
 
 from pydantic import BaseModel, Field
 
@@ -47,6 +47,22 @@ class JWXTSyncResponse(BaseModel):
     updated_fields: Optional[list] = Field(default=None, description="更新的字段列表")
 
 
+class JWXTJobResponse(BaseModel):
+    """JWXT 绑定/同步任务状态"""
+
+    job_id: str = Field(..., description="任务ID")
+    kind: Literal["bind", "sync"] = Field(..., description="任务类型")
+    status: Literal["queued", "running", "succeeded", "failed"] = Field(..., description="任务状态")
+    stage: int = Field(0, description="当前阶段，1 检查绑定、2 登录、3 获取用户信息、4 写入本地数据")
+    stages: int = Field(4, description="阶段总数")
+    stage_message: Optional[str] = Field(None, description="当前阶段说明")
+    message: Optional[str] = Field(None, description="任务结束后的结果说明")
+    data: Optional[JWXTUserInfoAPIResponse] = Field(default=None, description="成功时的用户信息数据")
+    coalesced: bool = Field(False, description="是否合并到了该用户正在进行的同类任务")
+    created_at: datetime = Field(..., description="提交时间")
+    updated_at: datetime = Field(..., description="最后更新时间")
+
+
 class JWXTUserInfoResponse(BaseModel):
     """JWXT用户信息响应"""
 
@@ -83,3 +99,4 @@ class JWXTExternalUserInfoResponse(BaseModel):
     success: bool = Field(..., description="是否成功")
     message: str = Field(..., description="响应消息")
     data: Optional[JWXTUserInfoAPIResponse] = Field(None, description="用户信息原始数据")
+    auth_failed: bool = Field(False, description="是否因 token 无效或过期而失败")
@@ -56,3 +56,50 @@ class UserAddTestRecordRequest(BaseModel):
         examples=["你是一个外向、乐观的人，喜欢与人交往。", "你适合从事金融分析、投资等工作。"],
     )
     """测试详情"""
+    idempotency_key: Optional[str] = Field(
+        None,
+        min_length=1,
+        max_length=64,
+        description="客户端为每条记录生成的幂等键（如 UUID），重试时携带相同的值不会重复添加",
+        examples=["0b9f5c1e-7a43-4d2e-9c55-3f1e2d6a8b10"],
+    )
+    """幂等键"""
+
+
+class UserAddTestRecordsRequest(BaseModel):
+    """
+    批量添加测试记录请求体
+    """
+
+    records: list[UserAddTestRecordRequest] = Field(..., min_length=1, max_length=500, description="测试记录，最多 500 条")
+    """测试记录"""
+
+
+class UserAddTestRecordsResponse(BaseModel):
+    """
+    批量添加测试记录结果
+    """
+
+    created: int = Field(..., description="新写入的记录数")
+    duplicates: list[str] = Field(default_factory=list, description="已经提交过而被跳过的幂等键")
+
+
+class UserImportError(BaseModel):
+    """
+    批量导入中失败的一行
+    """
+
+    line: int = Field(..., description="行号（CSV 含表头时从 2 开始）")
+    username: Optional[str] = Field(None, description="用户名")
+    error: str = Field(..., description="失败原因")
+
+
+class UserImportResponse(BaseModel):
+    """
+    批量导入结果
+    """
+
+    total: int = Field(0, description="读取的数据行数")
+    created: int = Field(0, description="成功创建的用户数")
+    failed: int = Field(0, description="失败的行数")
+    errors: list[UserImportError] = Field(default_factory=list, description="失败行的明细")
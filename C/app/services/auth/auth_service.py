@@ -5,8 +5,10 @@ from passlib.context import CryptContext
 from app.core.config import config
 from app.models.user import User
 from app.repositories.user import UserRepository
+from app.services.auth.password_hasher import password_hasher
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min_rounds 低于 12 的哈希（如批量导入时生成的）会在登录时被 verify_and_update 重新哈希
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__min_rounds=12)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -14,6 +16,23 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+def hash_passwords(passwords: list[str], rounds: Optional[int] = None) -> list[str]:
+    """批量计算哈希，供进程池一次提交一批，减少进程间通信"""
+    handler = pwd_context.handler("bcrypt").using(rounds=rounds) if rounds else pwd_context
+    return [handler.hash(password) for password in passwords]
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """校验密码，若哈希的算法或参数已过时则同时返回新的哈希"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+async def hash_password_async(password: str) -> str:
+    """在密码哈希工作池中计算哈希，不阻塞事件循环"""
+    return await password_hasher.run(get_password_hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """在密码哈希工作池中校验密码，返回 (是否正确, 需要更新时的新哈希)"""
+    return await password_hasher.run(verify_and_update_password, plain_password, hashed_password)
+
 def create_access_token(payload: dict | object, expires_delta: Optional[timedelta] = None) -> str:
     # 检查payload是否有to_json方法，如果有则调用它获取字典
     if hasattr(payload, 'to_json'):
@@ -27,9 +46,17 @@ def create_access_token(payload: dict | object, expires_delta: Optional[timedelt
 
 async def authenticate_user(userdb: UserRepository, username: str, password: str) -> Optional[User]:
     user = await userdb.get_by_username(username)
-    if user and verify_password(password, user.password):
-        return user
-    return None
+    if not user:
+        return None
+
+    valid, new_hash = await verify_password_async(password, user.password)
+    if not valid:
+        return None
+
+    # passlib 认为哈希已过时（如 bcrypt rounds 调整）时，借登录时的明文重新哈希
+    if new_hash:
+        await userdb.change_password(user, new_hash)
+    return user
 
 
 def generate_random_password(length: int = 8) -> str:
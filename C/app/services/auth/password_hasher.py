@@ -0,0 +1,98 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Callable, Literal, Optional, TypeVar
+
+from app.core.config import config
+from app.core.logger import logger
+from app.core.timing import record_timing, timed
+
+T = TypeVar("T")
+
+"""密码哈希工作池
+
+bcrypt 单次计算耗时在几十到上百毫秒，直接在 async 路由中调用会阻塞整个事件循环，
+登录高峰时其他所有请求都会被卡住。这里把哈希与校验放到有上限的线程池/进程池中执行，
+并用信号量限制同时进行的计算数，超出的请求在协程中排队等待，不占用事件循环。
+"""
+
+
+@dataclass
+class PasswordHasherStats:
+    in_flight: int = 0
+    """正在计算的任务数"""
+    waiting: int = 0
+    """排队等待的任务数"""
+    completed: int = 0
+    """已完成的任务数"""
+    total_wait_seconds: float = 0.0
+    """累计排队时间（秒）"""
+    max_wait_seconds: float = 0.0
+    """最长排队时间（秒）"""
+
+    def to_json(self):
+        data = asdict(self)
+        data["avg_wait_seconds"] = self.total_wait_seconds / self.completed if self.completed else 0.0
+        return data
+
+
+class PasswordHasher:
+    """在线程池或进程池中执行密码哈希相关的 CPU 密集型函数"""
+
+    def __init__(self, max_workers: int, executor_type: Literal["thread", "process"] = "thread"):
+        self.max_workers = max(1, max_workers)
+        self.executor_type = executor_type
+        self.stats = PasswordHasherStats()
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hasher")
+            logger.info(f"初始化密码哈希工作池: {self.executor_type} x {self.max_workers}")
+        return self._executor
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        """
+        在工作池中执行 func(*args)
+
+        进程池模式下 func 及其参数需要可以被 pickle（模块级函数）
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+
+        enqueued = time.perf_counter()
+        self.stats.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.stats.waiting -= 1
+
+        waited = time.perf_counter() - enqueued
+        self.stats.total_wait_seconds += waited
+        self.stats.max_wait_seconds = max(self.stats.max_wait_seconds, waited)
+        record_timing("bcrypt-queue", waited)
+
+        self.stats.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            with timed("bcrypt"):
+                return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.stats.in_flight -= 1
+            self.stats.completed += 1
+            self._semaphore.release()
+
+    def shutdown(self):
+        """关闭工作池，等待进行中的任务结束"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._semaphore = None
+
+
+password_hasher = PasswordHasher(max_workers=config.password_hash_workers, executor_type=config.password_hash_executor)
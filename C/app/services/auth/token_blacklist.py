@@ -1,6 +1,294 @@
+"""令牌黑名单
+
+每个被吊销的 jti 在 Redis 中保存为 token_blacklist:<jti>，过期时间与令牌相同。
+几乎所有令牌都不会被吊销，因此在本进程内维护一个布隆过滤器：过滤器判断“不在黑名单”时无需访问 Redis，
+判断“可能在黑名单”时再用 EXISTS 确认。过滤器在启动（及断线重连）时从 BLACKLIST_INDEX_KEY 全量加载，
+之后通过 pub/sub 增量同步；同步未就绪时所有检查都回退到 Redis。
+
+过滤器分两代轮换：新吊销的 jti 写入当前代，检查时两代都查；每过一个令牌有效期丢弃旧的一代，
+被吊销的令牌至少在过滤器中保留一个有效期，已过期的 jti 随轮换被清出，内存不会持续增长。
+"""
+
+import asyncio
+import hashlib
+import math
+import time
+from dataclasses import asdict, dataclass
+from typing import Iterable, Optional
+
 from redis.asyncio import Redis
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import config
+from app.core.logger import logger
+from app.core.redis import get_shared_redis
+from app.core.timing import timed
+from app.services.auth.token_cache import token_cache
 
 BLACKLIST_PREFIX = "token_blacklist:"
+BLACKLIST_INDEX_KEY = "token_blacklist_index"
+"""有序集合：已吊销的 jti -> 令牌过期时间戳，新启动的进程据此重建本地过滤器"""
+BLACKLIST_BACKFILLED_KEY = "token_blacklist_index:backfilled"
+"""索引已补齐的标记。索引上线前吊销的令牌只有 token_blacklist:<jti> 键，首次加载时用 SCAN 补进索引"""
+BLACKLIST_CHANNEL = "token_blacklist_revoked"
+"""吊销通知频道，消息为空格分隔的 jti"""
+PRINCIPAL_CHANNEL = "token_principal_changed"
+"""用户角色或状态变化的通知频道，消息为空格分隔的用户 ID，收到后从鉴权缓存中移除这些用户"""
+USER_TOKENS_PREFIX = "user_tokens:"
+"""有序集合：用户签发过且未过期的 jti -> 令牌过期时间戳，用于吊销某个用户的全部令牌"""
+
+
+class BloomFilter:
+    """按容量与目标误判率确定位数组大小与哈希次数的布隆过滤器"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        """位数"""
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        """已加入的元素数（重复加入会重复计数）"""
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        # 双重哈希：由一次 blake2b 得到两个 64 位哈希，组合出 k 个位置
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self._bits)
+
+    def estimated_false_positive_rate(self) -> float:
+        """按当前置位比例估算的误判率"""
+        bits_set = sum(bin(byte).count("1") for byte in self._bits)
+        return (bits_set / self.size) ** self.hash_count
+
+
+class RotatingBloomFilter:
+    """两代轮换的布隆过滤器，每个元素至少保留 rotate_interval 秒"""
+
+    def __init__(self, capacity: int, error_rate: float, rotate_interval: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rotate_interval = rotate_interval
+        self.current = BloomFilter(capacity, error_rate)
+        self.previous = BloomFilter(capacity, error_rate)
+        self.rotations = 0
+        self._rotated_at = time.monotonic()
+
+    def _maybe_rotate(self):
+        if time.monotonic() - self._rotated_at >= self.rotate_interval:
+            self.previous = self.current
+            self.current = BloomFilter(self.capacity, self.error_rate)
+            self._rotated_at = time.monotonic()
+            self.rotations += 1
+
+    def add(self, item: str):
+        self._maybe_rotate()
+        self.current.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        self._maybe_rotate()
+        return item in self.current or item in self.previous
+
+    @property
+    def memory_bytes(self) -> int:
+        return self.current.memory_bytes + self.previous.memory_bytes
+
+    def to_json(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "target_false_positive_rate": self.error_rate,
+            "hash_count": self.current.hash_count,
+            "items": self.current.count + self.previous.count,
+            "memory_bytes": self.memory_bytes,
+            "estimated_false_positive_rate": 1
+            - (1 - self.current.estimated_false_positive_rate()) * (1 - self.previous.estimated_false_positive_rate()),
+            "rotations": self.rotations,
+        }
+
+
+@dataclass
+class BlacklistFilterStats:
+    checks: int = 0
+    local_negatives: int = 0
+    """过滤器判断不在黑名单、省掉一次 Redis 查询的次数"""
+    confirmed: int = 0
+    """过滤器命中且 Redis 确认已吊销的次数"""
+    false_positives: int = 0
+    """过滤器命中但 Redis 中不存在的次数"""
+    fallbacks: int = 0
+    """过滤器未就绪（未同步或断线）而直接查询 Redis 的次数"""
+    synced: int = 0
+    """加入过滤器的 jti 数（全量加载、pub/sub 通知与本进程的吊销）"""
+    resyncs: int = 0
+
+    def to_json(self):
+        data = asdict(self)
+        negatives = self.local_negatives + self.false_positives
+        data["observed_false_positive_rate"] = self.false_positives / negatives if negatives else 0.0
+        data["redis_calls_saved_rate"] = self.local_negatives / self.checks if self.checks else 0.0
+        return data
+
+
+class BlacklistFilter:
+    """本进程的黑名单预检过滤器，由后台任务从 Redis 同步"""
+
+    def __init__(self, capacity: int, error_rate: float, rotate_interval: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rotate_interval = rotate_interval
+        self.filter = RotatingBloomFilter(capacity, error_rate, rotate_interval)
+        self.stats = BlacklistFilterStats()
+        self.ready = False
+        """已完成全量加载并处于订阅中，为 False 时过滤器结果不可信"""
+        self._task: Optional[asyncio.Task] = None
+
+    def might_contain(self, jti: str) -> Optional[bool]:
+        """过滤器的判断结果；未就绪时返回 None"""
+        self.stats.checks += 1
+        if not self.ready:
+            self.stats.fallbacks += 1
+            return None
+        if jti in self.filter:
+            return True
+        self.stats.local_negatives += 1
+        return False
+
+    def record(self, might_contain: Optional[bool], revoked: bool):
+        """记录过滤器命中后 Redis 的确认结果"""
+        if might_contain:
+            if revoked:
+                self.stats.confirmed += 1
+            else:
+                self.stats.false_positives += 1
+
+    def add(self, jtis: Iterable[str]):
+        for jti in jtis:
+            self.filter.add(jti)
+            self.stats.synced += 1
+
+    async def _backfill_index(self, redis: Redis):
+        """把只有黑名单键、不在索引中的 jti 按键的剩余时间补进索引，完成后写入标记，之后的加载不再 SCAN"""
+        if await redis.exists(BLACKLIST_BACKFILLED_KEY):
+            return
+        count = 0
+        batch: list[str] = []
+        async for key in redis.scan_iter(match=BLACKLIST_PREFIX + "*", count=1000):
+            batch.append(key)
+            if len(batch) >= 1000:
+                count += await self._index_keys(redis, batch)
+                batch = []
+        if batch:
+            count += await self._index_keys(redis, batch)
+        await redis.set(BLACKLIST_BACKFILLED_KEY, "1")
+        logger.info(f"令牌黑名单索引已补齐 {count} 个 jti")
+
+    @staticmethod
+    async def _index_keys(redis: Redis, keys: list[str]) -> int:
+        async with redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.ttl(key)
+            ttls = await pipe.execute()
+        now = time.time()
+        # 没有过期时间（-1）或已删除（-2）的键跳过
+        entries = {key[len(BLACKLIST_PREFIX):]: now + ttl for key, ttl in zip(keys, ttls) if ttl > 0}
+        if entries:
+            await redis.zadd(BLACKLIST_INDEX_KEY, entries)
+        return len(entries)
+
+    async def _load(self, redis: Redis):
+        """从索引全量重建过滤器，顺便清理索引中已过期的 jti；索引补齐之前 ready 保持 False，检查回退到 EXISTS"""
+        await self._backfill_index(redis)
+        now = time.time()
+        await redis.zremrangebyscore(BLACKLIST_INDEX_KEY, "-inf", now)
+        jtis = await redis.zrangebyscore(BLACKLIST_INDEX_KEY, now, "+inf")
+        self.filter = RotatingBloomFilter(self.capacity, self.error_rate, self.rotate_interval)
+        self.add(jtis)
+        self.stats.resyncs += 1
+        logger.info(f"令牌黑名单过滤器已加载 {len(jtis)} 个 jti")
+
+    async def _listen(self):
+        while True:
+            try:
+                redis = await get_shared_redis()
+                async with redis.pubsub() as pubsub:
+                    # 先订阅再加载，加载期间发布的吊销会在之后的消息中补上
+                    await pubsub.subscribe(BLACKLIST_CHANNEL, PRINCIPAL_CHANNEL)
+                    await self._load(redis)
+                    self.ready = True
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+                        if message["channel"] == PRINCIPAL_CHANNEL:
+                            for user_id in message["data"].split():
+                                token_cache.revoke_user(int(user_id))
+                            continue
+                        jtis = message["data"].split()
+                        self.add(jtis)
+                        for jti in jtis:
+                            token_cache.revoke(jti)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"令牌黑名单同步中断，1 秒后重新加载: {e}")
+            finally:
+                self.ready = False
+            await asyncio.sleep(1)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def to_json(self) -> dict:
+        return {"ready": self.ready, **self.filter.to_json(), **self.stats.to_json()}
+
+
+blacklist_filter = BlacklistFilter(
+    capacity=config.token_blacklist_filter_capacity,
+    error_rate=config.token_blacklist_filter_error_rate,
+    rotate_interval=config.token_blacklist_filter_rotate_seconds or config.expire_minutes * 60,
+)
+
+
+def _queue_revocations(pipe, revoked: dict[str, int]):
+    """把吊销 jti -> 剩余秒数写入管道：黑名单键、索引与通知"""
+    now = time.time()
+    for jti, expires_in in revoked.items():
+        pipe.set(BLACKLIST_PREFIX + jti, "true", ex=expires_in)
+    pipe.zadd(BLACKLIST_INDEX_KEY, {jti: now + expires_in for jti, expires_in in revoked.items()})
+    pipe.zremrangebyscore(BLACKLIST_INDEX_KEY, "-inf", now)
+    pipe.publish(BLACKLIST_CHANNEL, " ".join(revoked))
+
+
+def _revoke_locally(jtis: Iterable[str]):
+    for jti in jtis:
+        # 立即更新本进程：被吊销的令牌下一次请求就会重新走黑名单检查
+        blacklist_filter.filter.add(jti)
+        token_cache.revoke(jti)
+
 
 # 用户 “主动登出” 场景
 
@@ -11,15 +299,103 @@ async def add_token_to_blacklist(redis_client: Redis, jti: str, expires_in: int)
     :param jti: jwt secret
     :param expires_in: 过期时间（秒）
     """
-    key = BLACKLIST_PREFIX + jti
-    await redis_client.set(key, "true", ex=expires_in)
+    async with redis_client.pipeline(transaction=True) as pipe:
+        _queue_revocations(pipe, {jti: expires_in})
+        await pipe.execute()
+    _revoke_locally([jti])
+
+
+async def track_issued_token(redis_client: Redis, user_id: int, jti: str, expires_in: int):
+    """
+    登录签发令牌时记录该用户的 jti，供 revoke_user_tokens 使用
+    """
+    key = USER_TOKENS_PREFIX + str(user_id)
+    now = time.time()
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.zadd(key, {jti: now + expires_in})
+        pipe.zremrangebyscore(key, "-inf", now)
+        pipe.expire(key, expires_in)  # 令牌有效期相同，最新签发的令牌最晚过期
+        await pipe.execute()
+
+
+async def revoke_user_tokens(redis_client: Redis, user_id: int, include: Optional[dict[str, int]] = None) -> int:
+    """
+    吊销某个用户所有未过期的令牌，读取一次后在一个管道中写入全部黑名单键
+
+    :param include: 额外要吊销的 jti -> 剩余秒数，如记录功能上线前签发的当前令牌
+
+    :return: 吊销的令牌数
+    """
+    key = USER_TOKENS_PREFIX + str(user_id)
+    now = time.time()
+    entries = await redis_client.zrangebyscore(key, now, "+inf", withscores=True)
+    revoked = {jti: max(1, math.ceil(exp - now)) for jti, exp in entries}
+    revoked.update({jti: expires_in for jti, expires_in in (include or {}).items() if expires_in > 0})
+    if not revoked:
+        return 0
+
+    async with redis_client.pipeline(transaction=True) as pipe:
+        _queue_revocations(pipe, revoked)
+        pipe.delete(key)
+        await pipe.execute()
+    _revoke_locally(revoked)
+    return len(revoked)
+
+
+# 用户 “角色或状态变化” 场景
+
+_principal_publishes: set[asyncio.Task] = set()
+"""尚未完成的变化通知，保留引用以免任务被回收"""
+
+
+async def _publish_principal_changes(user_ids: Iterable[int]):
+    try:
+        redis = await get_shared_redis()
+        await redis.publish(PRINCIPAL_CHANNEL, " ".join(str(user_id) for user_id in user_ids))
+    except Exception as e:
+        logger.warning(f"广播用户角色/状态变化失败，其他进程的鉴权缓存最多在 {token_cache.max_ttl} 秒后过期: {e}")
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_changed_principals(session: Session):
+    """
+    UserRepository.edit_info 修改角色或状态时在 session.info["principal_changes"] 中记下用户 ID，
+    提交后立即从本进程的鉴权缓存中移除这些用户，并通知其他进程；令牌本身仍然有效，下一次请求重新读取 users 表
+    """
+    user_ids = session.info.pop("principal_changes", None)
+    if not user_ids:
+        return
+    for user_id in user_ids:
+        token_cache.revoke_user(user_id)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # 同步 Session 在事件循环之外提交（脚本、数据迁移），本进程已清除，无法广播，其他进程等缓存过期
+        logger.warning(f"在事件循环之外修改了用户角色/状态，其他进程的鉴权缓存最多在 {token_cache.max_ttl} 秒后过期")
+        return
+    task = loop.create_task(_publish_principal_changes(user_ids))
+    _principal_publishes.add(task)
+    task.add_done_callback(_principal_publishes.discard)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_principal_changes(session: Session):
+    session.info.pop("principal_changes", None)
 
 
 async def is_token_blacklisted(redis_client: Redis, jti: str) -> bool:
     """
     检查 jwt secret 是否在黑名单中
 
+    本地过滤器判断不在黑名单时直接返回，否则查询 Redis 确认
+
     :param jti: jwt secret
     """
-    key = BLACKLIST_PREFIX + jti
-    return await redis_client.exists(key) == 1
+    with timed("blacklist"):
+        might_contain = blacklist_filter.might_contain(jti)
+        if might_contain is False:
+            return False
+        key = BLACKLIST_PREFIX + jti
+        revoked = await redis_client.exists(key) == 1
+        blacklist_filter.record(might_contain, revoked)
+        return revoked
@@ -0,0 +1,122 @@
+"""进程内 jwt 鉴权缓存
+
+get_current_user 每次都需要验签、查询 redis 黑名单、再查询一次 users 表。
+同一个令牌在有效期内的鉴权结果是稳定的，因此按 jti 缓存验证通过的用户身份，
+命中时不再做任何验签、网络或数据库操作。
+
+令牌被加入黑名单时（add_token_to_blacklist）会立即从本进程的缓存中移除，其他进程收到黑名单的 pub/sub 通知后移除。
+用户的角色或状态变化时（UserRepository.edit_info），提交后按用户 ID 移除该用户的全部条目，同样广播给其他进程。
+"""
+
+import hmac
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from app.core.config import config
+from app.models.user import UserRole
+
+
+@dataclass
+class CachedPrincipal:
+    """已验证的令牌所对应的用户身份"""
+
+    user_id: int
+    username: str
+    role: UserRole
+    status: bool
+    token: str
+    """原始令牌，命中时比对，防止伪造同 jti 的令牌"""
+    expires_at: float
+    """缓存过期的时间戳，不晚于令牌的 exp"""
+
+
+@dataclass
+class TokenCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    """容量淘汰和过期淘汰的条目数"""
+    revocations: int = 0
+    """因令牌加入黑名单、用户角色或状态变化而移除的条目数"""
+
+    def to_json(self):
+        return asdict(self)
+
+
+class TokenCache:
+    """有容量上限、按过期时间淘汰的 LRU 缓存，键为 jti"""
+
+    def __init__(self, maxsize: int, max_ttl: int):
+        self.maxsize = maxsize
+        self.max_ttl = max_ttl
+        self.stats = TokenCacheStats()
+        self._entries: OrderedDict[str, CachedPrincipal] = OrderedDict()
+
+    def get(self, jti: str, token: str) -> Optional[CachedPrincipal]:
+        """
+        获取缓存的用户身份
+
+        :param jti: 令牌ID
+        :param token: 原始令牌
+        """
+        entry = self._entries.get(jti)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        if entry.expires_at <= time.time():
+            del self._entries[jti]
+            self.stats.evictions += 1
+            self.stats.misses += 1
+            return None
+
+        if not hmac.compare_digest(entry.token, token):
+            self.stats.misses += 1
+            return None
+
+        self._entries.move_to_end(jti)
+        self.stats.hits += 1
+        return entry
+
+    def put(self, jti: str, token: str, exp: float, user_id: int, username: str, role: UserRole, status: bool):
+        """
+        缓存验证通过的用户身份，有效期到令牌过期为止（不超过 max_ttl）
+        """
+        if self.maxsize <= 0:
+            return
+
+        self._entries[jti] = CachedPrincipal(
+            user_id=user_id,
+            username=username,
+            role=role,
+            status=status,
+            token=token,
+            expires_at=min(exp, time.time() + self.max_ttl),
+        )
+        self._entries.move_to_end(jti)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def revoke(self, jti: str):
+        """令牌被吊销时立即移除对应条目"""
+        if self._entries.pop(jti, None) is not None:
+            self.stats.revocations += 1
+
+    def revoke_user(self, user_id: int):
+        """用户的角色或状态变化时移除该用户的全部条目，下一次请求重新读取 users 表"""
+        for jti in [jti for jti, entry in self._entries.items() if entry.user_id == user_id]:
+            del self._entries[jti]
+            self.stats.revocations += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+token_cache = TokenCache(maxsize=config.token_cache_size, max_ttl=config.token_cache_max_ttl)
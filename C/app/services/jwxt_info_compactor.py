@@ -0,0 +1,142 @@
+import asyncio
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import config
+from app.core.logger import logger
+from app.core.sql import AsyncSessionLocal
+from app.repositories.jwxt import JWXTRepository
+
+"""教务信息快照清理
+
+每个用户保留最近 jwxt_info_keep_last 条快照，以及最近 jwxt_info_keep_days 天内的快照，其余按用户分批删除。
+可以随 API 进程启动（jwxt_info_compactor_enabled），也可以用 python -m app.workers.jwxt_compact 单独运行。
+"""
+
+
+@dataclass
+class CompactorStats:
+    runs: int = 0
+    """已完成的清理轮数"""
+    running: bool = False
+    """当前是否正在清理"""
+    users: int = 0
+    """本轮处理的用户数"""
+    rows_deleted: int = 0
+    """本轮删除的行数"""
+    bytes_reclaimed: int = 0
+    """本轮删除的 raw_data 字节数"""
+    total_rows_deleted: int = 0
+    total_bytes_reclaimed: int = 0
+    last_run_started: Optional[datetime] = None
+    last_run_seconds: float = 0.0
+
+    def to_json(self):
+        return asdict(self)
+
+
+class JWXTInfoCompactor:
+    """按保留策略删除旧的 jwxt_user_info 快照"""
+
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal):
+        self.session_factory = session_factory
+        self.stats = CompactorStats()
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def select_expired(history: list, keep_last: int, keep_since: Optional[datetime]) -> tuple[list[int], int]:
+        """
+        从按用户、同步时间倒序排列的 (id, user_id, sync_time, 字节数) 中选出要删除的记录
+
+        :return: (要删除的ID列表, 这些记录的 raw_data 字节数)
+        """
+        expired_ids = []
+        expired_bytes = 0
+        current_user_id = None
+        rank = 0
+        for info_id, user_id, sync_time, size in history:
+            if user_id != current_user_id:
+                current_user_id, rank = user_id, 0
+            rank += 1
+            if rank <= keep_last or (keep_since is not None and sync_time >= keep_since):
+                continue
+            expired_ids.append(info_id)
+            expired_bytes += size or 0
+        return expired_ids, expired_bytes
+
+    async def run_once(self):
+        """清理一轮"""
+        keep_last = max(1, config.jwxt_info_keep_last)
+        keep_since = datetime.now() - timedelta(days=config.jwxt_info_keep_days) if config.jwxt_info_keep_days else None
+        self.stats.running = True
+        self.stats.users = self.stats.rows_deleted = self.stats.bytes_reclaimed = 0
+        self.stats.last_run_started = datetime.now()
+        started = time.perf_counter()
+        after_user_id = 0
+
+        try:
+            while True:
+                # 每批用户单独开启并提交一个事务，避免长事务和大范围锁
+                async with self.session_factory() as db:
+                    jwxt_repo = JWXTRepository(db)
+                    user_ids = await jwxt_repo.get_user_ids_over_retention(
+                        keep_last, after_user_id=after_user_id, limit=config.jwxt_info_compact_batch_size
+                    )
+                    if not user_ids:
+                        break
+                    after_user_id = user_ids[-1]
+
+                    history = await jwxt_repo.get_user_info_history(user_ids)
+                    expired_ids, expired_bytes = self.select_expired(history, keep_last, keep_since)
+                    deleted = 0
+                    for i in range(0, len(expired_ids), config.jwxt_info_compact_batch_size):
+                        deleted += await jwxt_repo.delete_user_info_by_ids(
+                            expired_ids[i : i + config.jwxt_info_compact_batch_size]
+                        )
+                    await jwxt_repo.commit()
+
+                self.stats.users += len(user_ids)
+                self.stats.rows_deleted += deleted
+                self.stats.bytes_reclaimed += expired_bytes
+                self.stats.total_rows_deleted += deleted
+                self.stats.total_bytes_reclaimed += expired_bytes
+        finally:
+            self.stats.running = False
+            self.stats.runs += 1
+            self.stats.last_run_seconds = time.perf_counter() - started
+
+        logger.info(
+            f"教务信息快照清理完成: 用户 {self.stats.users}，删除 {self.stats.rows_deleted} 行，"
+            f"释放 {self.stats.bytes_reclaimed} 字节，耗时 {self.stats.last_run_seconds:.1f}s"
+        )
+
+    async def run_forever(self):
+        """每隔 jwxt_info_compact_interval 秒清理一轮"""
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"教务信息快照清理出错: {e}")
+            await asyncio.sleep(config.jwxt_info_compact_interval)
+
+    def start(self):
+        """在当前事件循环中启动后台清理任务"""
+        if self._task is None:
+            logger.info("启动教务信息快照清理任务...")
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+jwxt_info_compactor = JWXTInfoCompactor()
@@ -0,0 +1,377 @@
+"""教务系统绑定/同步任务队列
+
+绑定与同步要访问教务系统两次（登录、获取用户信息），还要解密密码并写入多张表，上游慢时 HTTP 请求会一直挂着，
+客户端超时后重试又让上游的压力翻倍。这里把它们改成任务：
+- 接口把任务写入 Redis（任务状态为 jwxt_job:<id> 哈希，待处理的任务在 jwxt_jobs:queue 列表中）后立即返回任务 ID
+- worker 用 BRPOPLPUSH 把任务从队列移到自己的处理中列表（jwxt_jobs:processing:<进程 ID>:<序号>）再执行，
+  完成后才从处理中列表删除；进程崩溃或被取消时任务留在处理中列表，由其他进程（或重启后的本进程）
+  在该进程的心跳过期后放回队列。worker 每进入一个阶段（[1/4]~[4/4]）更新任务状态，并在 jwxt_job_events:<id> 频道发布，
+  客户端可以轮询状态或订阅 SSE
+- 同一用户的同类任务未结束时，重复提交直接返回正在进行的任务，不会重复访问教务系统
+- 绑定任务中的密码在入队前用 Fernet 加密，Redis 中不出现明文密码
+
+worker 可以随 API 进程启动（jwxt_job_workers），也可以用 python -m app.workers.jwxt_jobs 单独运行。
+"""
+
+import asyncio
+import json
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Literal, Optional
+from uuid import uuid4
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import config
+from app.core.logger import logger
+from app.core.redis import get_shared_redis
+from app.core.sql import AsyncSessionLocal
+from app.models.jwxt import JWXTBinding
+from app.repositories.jwxt import JWXTRepository
+from app.services.jwxt_service import JWXTExternalService, ProgressCallback, jwxt_external_service, report_progress
+from app.services.password_encryption import decrypt_jwxt_password
+from app.services.view_cache import jwxt_info_view_key, view_cache
+
+JOB_PREFIX = "jwxt_job:"
+ACTIVE_JOB_PREFIX = "jwxt_job_active:"
+JOB_QUEUE_KEY = "jwxt_jobs:queue"
+JOB_EVENTS_PREFIX = "jwxt_job_events:"
+PROCESSING_PREFIX = "jwxt_jobs:processing:"
+PROCESSING_LISTS_KEY = "jwxt_jobs:processing_lists"
+"""集合：所有 worker 的处理中列表，回收任务据此查找心跳已过期的列表"""
+HEARTBEAT_PREFIX = "jwxt_jobs:heartbeat:"
+
+JobKind = Literal["bind", "sync"]
+FINISHED_STATUSES = ("succeeded", "failed")
+
+
+@dataclass
+class JobQueueStats:
+    submitted: int = 0
+    coalesced: int = 0
+    """合并到已有任务、没有新建任务的提交次数"""
+    running: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    requeued: int = 0
+    """从心跳过期或出错的 worker 的处理中列表放回队列的任务数"""
+
+    def to_json(self):
+        return asdict(self)
+
+
+def job_key(job_id: str) -> str:
+    return JOB_PREFIX + job_id
+
+
+def active_job_key(kind: str, user_id: int) -> str:
+    return f"{ACTIVE_JOB_PREFIX}{kind}:{user_id}"
+
+
+def job_events_channel(job_id: str) -> str:
+    return JOB_EVENTS_PREFIX + job_id
+
+
+def heartbeat_key(instance_id: str) -> str:
+    return HEARTBEAT_PREFIX + instance_id
+
+
+def decode_job(fields: dict) -> Optional[dict]:
+    """把 Redis 哈希中的字段还原为任务状态，任务不存在时返回 None"""
+    if not fields:
+        return None
+    return {
+        "job_id": fields["job_id"],
+        "user_id": int(fields["user_id"]),
+        "kind": fields["kind"],
+        "status": fields["status"],
+        "stage": int(fields.get("stage") or 0),
+        "stages": 4,
+        "stage_message": fields.get("stage_message") or None,
+        "message": fields.get("message") or None,
+        "data": json.loads(fields["data"]) if fields.get("data") else None,
+        "created_at": fields["created_at"],
+        "updated_at": fields["updated_at"],
+    }
+
+
+class JWXTJobQueue:
+    """基于 Redis 列表的任务队列与进程内 worker 池"""
+
+    def __init__(
+        self,
+        service: JWXTExternalService,
+        session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+        workers: int = config.jwxt_job_workers,
+    ):
+        self.service = service
+        self.session_factory = session_factory
+        self.workers = workers
+        self.stats = JobQueueStats()
+        self.instance_id = uuid4().hex
+        """本进程 worker 的 ID，每次 start 重新生成，处理中列表与心跳都以它命名"""
+        self._tasks: list[asyncio.Task] = []
+        self._processing_keys: list[str] = []
+
+    async def submit(self, user_id: int, kind: JobKind, payload: dict) -> tuple[dict, bool]:
+        """
+        提交任务，返回 (任务状态, 是否合并到了已有任务)
+
+        该用户的同类任务未结束时直接返回该任务。标记在排队期间与任务状态同样保留 jwxt_job_ttl，
+        积压较久时重复提交仍然合并；开始执行时再改为执行时限
+        """
+        redis = await get_shared_redis()
+        job_id = uuid4().hex
+        active_key = active_job_key(kind, user_id)
+        if not await redis.set(active_key, job_id, nx=True, ex=config.jwxt_job_ttl):
+            existing_id = await redis.get(active_key)
+            existing = await self.get(existing_id) if existing_id else None
+            if existing is not None and existing["status"] not in FINISHED_STATUSES:
+                self.stats.coalesced += 1
+                return existing, True
+            # 旧任务已结束但标记尚未删除，由本次提交接管
+            await redis.set(active_key, job_id, ex=config.jwxt_job_ttl)
+
+        now = datetime.now().isoformat()
+        fields = {
+            "job_id": job_id,
+            "user_id": str(user_id),
+            "kind": kind,
+            "status": "queued",
+            "stage": "0",
+            "created_at": now,
+            "updated_at": now,
+        }
+        entry = json.dumps({"job_id": job_id, "user_id": user_id, "kind": kind, "payload": payload})
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.hset(job_key(job_id), mapping=fields)
+            pipe.expire(job_key(job_id), config.jwxt_job_ttl)
+            pipe.lpush(JOB_QUEUE_KEY, entry)
+            await pipe.execute()
+        self.stats.submitted += 1
+        logger.info(f"用户 {user_id} 提交教务系统{kind}任务 {job_id}")
+        return decode_job(fields), False  # type: ignore[return-value]
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        redis = await get_shared_redis()
+        return decode_job(await redis.hgetall(job_key(job_id)))
+
+    async def _update(self, job_id: str, **fields: Any) -> Optional[dict]:
+        """更新任务状态并发布给订阅者"""
+        fields["updated_at"] = datetime.now().isoformat()
+        redis = await get_shared_redis()
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.hset(job_key(job_id), mapping={key: str(value) for key, value in fields.items()})
+            pipe.hgetall(job_key(job_id))
+            _, current = await pipe.execute()
+        job = decode_job(current)
+        if job is not None:
+            await redis.publish(job_events_channel(job_id), json.dumps(job, ensure_ascii=False))
+        return job
+
+    async def process(self, entry: dict):
+        """执行一个任务，结果写回任务状态"""
+        job_id, user_id, kind = entry["job_id"], entry["user_id"], entry["kind"]
+        redis = await get_shared_redis()
+        job = await self.get(job_id)
+        if job is not None and job["status"] in FINISHED_STATUSES:
+            return  # 已完成但未来得及从处理中列表删除，被放回队列的任务
+        # 开始执行时标记改为执行时限，worker 中途退出且任务未被回收时，标记不会一直挡住新的提交
+        active_key = active_job_key(kind, user_id)
+        if await redis.get(active_key) in (None, job_id):
+            await redis.set(active_key, job_id, ex=config.jwxt_job_timeout)
+
+        async def progress(stage: int, message: str):
+            await self._update(job_id, status="running", stage=stage, stage_message=message)
+
+        self.stats.running += 1
+        try:
+            await report_progress(progress, 1, "检查绑定状态" if kind == "bind" else "获取绑定信息")
+            runner = self._run_bind if kind == "bind" else self._run_sync
+            success, message, data = await asyncio.wait_for(
+                runner(user_id, entry["payload"], progress), config.jwxt_job_timeout
+            )
+        except asyncio.TimeoutError:
+            success, message, data = False, "教务系统响应超时，请稍后重试", None
+        except Exception as e:
+            logger.error(f"教务系统{kind}任务 {job_id} 失败 user_id={user_id}: {e}")
+            success, message, data = False, "绑定失败，请稍后重试" if kind == "bind" else "同步失败，请稍后重试", None
+        finally:
+            self.stats.running -= 1
+
+        if success:
+            self.stats.succeeded += 1
+        else:
+            self.stats.failed += 1
+        await self._update(
+            job_id,
+            status="succeeded" if success else "failed",
+            message=message,
+            data=json.dumps(data, ensure_ascii=False) if data else "",
+        )
+        # 只删除属于本任务的标记，标记过期后已被新任务接管时不动
+        if await redis.get(active_job_key(kind, user_id)) == job_id:
+            await redis.delete(active_job_key(kind, user_id))
+
+    async def _run_bind(self, user_id: int, payload: dict, progress: ProgressCallback) -> tuple[bool, str, Optional[dict]]:
+        student_id = payload["student_id"]
+        # 只在读写数据库时持有会话，访问教务系统期间不占用连接
+        async with self.session_factory() as db:
+            jwxt_repo = JWXTRepository(db)
+            if await jwxt_repo.get_binding_by_user_id(user_id):
+                return False, "您已绑定教务系统账号，请先解绑后重新绑定", None
+            if await jwxt_repo.is_student_id_bound(student_id):
+                return False, "该学号已被其他用户绑定", None
+
+        password = decrypt_jwxt_password(payload["password"])
+        if not password:
+            return False, "绑定失败，请稍后重试", None
+        is_valid, user_data, error_msg = await self.service.validate_and_get_user_info(
+            student_id, password, progress=progress
+        )
+        if not is_valid:
+            return False, f"教务系统验证失败: {error_msg}", None
+
+        await report_progress(progress, 4, "保存绑定信息")
+        async with self.session_factory() as db:
+            jwxt_repo = JWXTRepository(db)
+            binding = await jwxt_repo.create_binding(user_id, student_id, password)
+            if user_data:
+                await jwxt_repo.create_user_info(user_id, student_id, user_data)
+            await jwxt_repo.update_binding(binding, last_sync_time=datetime.now())
+            await jwxt_repo.commit()
+        await view_cache.invalidate(jwxt_info_view_key(user_id))
+        logger.info(f"User {user_id} successfully bound JWXT account {student_id}")
+        return True, "绑定成功", user_data  # type: ignore[return-value]
+
+    async def _run_sync(self, user_id: int, payload: dict, progress: ProgressCallback) -> tuple[bool, str, Optional[dict]]:
+        async with self.session_factory() as db:
+            binding = await JWXTRepository(db).get_binding_by_user_id(user_id)
+        if not binding:
+            return False, "您尚未绑定教务系统账号，请先绑定", None
+
+        success, user_data, error_msg = await self.service.sync_with_encrypted_password(
+            binding.student_id, binding.jwxt_password, progress=progress
+        )
+        if not success or not user_data:
+            return False, f"教务系统同步失败: {error_msg}", None
+
+        await report_progress(progress, 4, "更新本地数据")
+        async with self.session_factory() as db:
+            jwxt_repo = JWXTRepository(db)
+            current = await db.get(JWXTBinding, binding.id)
+            if current is None:  # 同步期间已解绑
+                return False, "您尚未绑定教务系统账号，请先绑定", None
+            await jwxt_repo.create_user_info(user_id, current.student_id, user_data)
+            await jwxt_repo.update_binding(current, last_sync_time=datetime.now())
+            await jwxt_repo.commit()
+        await view_cache.invalidate(jwxt_info_view_key(user_id))
+        logger.info(f"User {user_id} successfully synced JWXT info for account {binding.student_id}")
+        return True, "同步成功", user_data  # type: ignore[return-value]
+
+    async def _requeue(self, redis, processing_key: str) -> int:
+        """把处理中列表里的任务逐个放回队列的出队端，先于新任务执行"""
+        count = 0
+        while await redis.lmove(processing_key, JOB_QUEUE_KEY, "RIGHT", "RIGHT") is not None:
+            count += 1
+        self.stats.requeued += count
+        return count
+
+    async def reap(self) -> int:
+        """把心跳已过期的进程留在处理中列表的任务放回队列，返回放回的任务数"""
+        redis = await get_shared_redis()
+        requeued = 0
+        for processing_key in await redis.smembers(PROCESSING_LISTS_KEY):
+            instance_id = processing_key[len(PROCESSING_PREFIX):].rsplit(":", 1)[0]
+            if await redis.exists(heartbeat_key(instance_id)):
+                continue
+            requeued += await self._requeue(redis, processing_key)
+            await redis.srem(PROCESSING_LISTS_KEY, processing_key)
+        if requeued:
+            logger.warning(f"已将 {requeued} 个中断的教务系统任务放回队列")
+        return requeued
+
+    async def _heartbeat(self):
+        """按 1/3 周期续期本进程的心跳，顺便回收其他进程留下的任务"""
+        while True:
+            try:
+                redis = await get_shared_redis()
+                await redis.set(heartbeat_key(self.instance_id), "1", ex=config.jwxt_job_heartbeat_ttl)
+                await self.reap()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"教务系统任务心跳出错: {e}")
+            await asyncio.sleep(max(1, config.jwxt_job_heartbeat_ttl // 3))
+
+    async def _work(self, processing_key: str):
+        """从队列中取出任务执行，Redis 出错时稍后重试"""
+        registered = False
+        while True:
+            try:
+                redis = await get_shared_redis()
+                if not registered:
+                    # 先写心跳再登记列表，其他进程的回收任务不会把刚登记的列表当作已过期
+                    async with redis.pipeline(transaction=True) as pipe:
+                        pipe.set(heartbeat_key(self.instance_id), "1", ex=config.jwxt_job_heartbeat_ttl)
+                        pipe.sadd(PROCESSING_LISTS_KEY, processing_key)
+                        await pipe.execute()
+                    # 处理中列表只由本 worker 使用，空闲时其中的任务都是出错后遗留的
+                    await self._requeue(redis, processing_key)
+                    registered = True
+                # 与 BLMOVE ... RIGHT LEFT 相同，Redis 6.2 以下也可用
+                item = await redis.brpoplpush(JOB_QUEUE_KEY, processing_key, timeout=1)
+                if item is None:
+                    continue
+                await self.process(json.loads(item))
+                await redis.lrem(processing_key, 1, item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"教务系统任务 worker 出错: {e}")
+                registered = False
+                await asyncio.sleep(1)
+
+    def start(self, workers: Optional[int] = None):
+        """在当前事件循环中启动 worker"""
+        count = self.workers if workers is None else workers
+        if self._tasks or count <= 0:
+            return
+        logger.info(f"启动 {count} 个教务系统任务 worker...")
+        self.instance_id = uuid4().hex
+        self._processing_keys = [f"{PROCESSING_PREFIX}{self.instance_id}:{i}" for i in range(count)]
+        self._tasks = [asyncio.create_task(self._work(key)) for key in self._processing_keys]
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+
+    async def stop(self):
+        """取消 worker，被中断的任务立即放回队列；Redis 不可用时留给其他进程在心跳过期后回收"""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        if not self._processing_keys:
+            return
+        try:
+            redis = await get_shared_redis()
+            for processing_key in self._processing_keys:
+                await self._requeue(redis, processing_key)
+                await redis.srem(PROCESSING_LISTS_KEY, processing_key)
+            await redis.delete(heartbeat_key(self.instance_id))
+        except Exception as e:
+            logger.warning(f"放回中断的教务系统任务失败，将在心跳过期后由其他进程回收: {e}")
+        self._processing_keys = []
+
+    async def run_forever(self, workers: Optional[int] = None):
+        """单独运行 worker 进程时使用，直到被取消"""
+        self.start(workers)
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            await self.stop()
+
+
+jwxt_job_queue = JWXTJobQueue(jwxt_external_service)
@@ -0,0 +1,159 @@
+import random
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from app.core.logger import logger
+from app.core.metrics import jwxt_circuit_rejections, jwxt_circuit_state
+
+"""教务系统上游的熔断、重试预算与延迟统计
+
+教务系统变慢或不可用时，每个绑定、同步请求都要等到超时才失败，协程和上游连接都被占住。
+- CircuitBreaker：连续失败达到阈值后打开，打开期间直接失败；冷却后进入半开状态放行少量探测请求，成功则恢复
+- RetryBudget：重试额度随首次请求按比例积累，上游持续出错时重试不会把请求量放大数倍
+- LatencyTracker：记录近期成功请求的延迟，对冲请求在超过 p95 仍未返回时才发出
+"""
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开，请求未发出"""
+
+
+@dataclass
+class CircuitBreakerStats:
+    successes: int = 0
+    failures: int = 0
+    rejections: int = 0
+    """熔断器打开时直接拒绝的请求数"""
+    opened: int = 0
+    """熔断器打开的次数"""
+
+
+class CircuitBreaker:
+    """单个上游主机的熔断器"""
+
+    def __init__(self, name: str, failure_threshold: int, recovery_seconds: float, half_open_probes: int = 1):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_seconds = recovery_seconds
+        self.half_open_probes = max(1, half_open_probes)
+        self.stats = CircuitBreakerStats()
+        self.state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        """半开状态下已放行、尚未返回的探测请求数"""
+        jwxt_circuit_state.labels(name).set(0)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning(f"教务系统熔断器 {self.name}: {self.state} -> {state}")
+            self.state = state
+            jwxt_circuit_state.labels(self.name).set(_STATE_VALUES[state])
+
+    def allow(self) -> bool:
+        """是否放行一个请求；放行后必须调用 record_success、record_failure 或 release 之一"""
+        if self.state == OPEN and time.monotonic() - self._opened_at >= self.recovery_seconds:
+            self._set_state(HALF_OPEN)
+            self._probes = 0
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and self._probes < self.half_open_probes:
+            self._probes += 1
+            return True
+        self.stats.rejections += 1
+        jwxt_circuit_rejections.labels(self.name).inc()
+        return False
+
+    def check(self):
+        """放行则返回，否则抛出 CircuitOpenError"""
+        if not self.allow():
+            raise CircuitOpenError(f"教务系统熔断器 {self.name} 已打开")
+
+    def record_success(self):
+        self.stats.successes += 1
+        self._consecutive_failures = 0
+        if self.state == HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+        self._set_state(CLOSED)
+
+    def record_failure(self):
+        self.stats.failures += 1
+        self._consecutive_failures += 1
+        if self.state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.stats.opened += 1
+            self._opened_at = time.monotonic()
+            self._probes = 0
+            self._set_state(OPEN)
+
+    def release(self):
+        """放行的请求被取消、没有结果时调用，归还半开状态下的探测名额"""
+        if self.state == HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+
+    def to_json(self):
+        data = asdict(self.stats)
+        data["state"] = self.state
+        data["consecutive_failures"] = self._consecutive_failures
+        if self.state == OPEN:
+            data["retry_in_seconds"] = round(max(0.0, self._opened_at + self.recovery_seconds - time.monotonic()), 3)
+        return data
+
+
+class RetryBudget:
+    """
+    重试额度：每个首次请求存入 ratio 个额度，每次重试取出 1 个
+
+    额度上限为 reserve，空闲一段时间后最多可以连续重试 reserve 次；之后重试数被限制在请求数的 ratio 倍以内
+    """
+
+    def __init__(self, ratio: float, reserve: float = 10.0):
+        self.ratio = ratio
+        self.reserve = reserve
+        self._tokens = reserve
+        self.retries = 0
+        self.exhausted = 0
+        """额度不足、放弃重试的次数"""
+
+    def deposit(self):
+        self._tokens = min(self.reserve, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self._tokens < 1:
+            self.exhausted += 1
+            return False
+        self._tokens -= 1
+        self.retries += 1
+        return True
+
+    def to_json(self):
+        return {"ratio": self.ratio, "tokens": round(self._tokens, 2), "retries": self.retries, "exhausted": self.exhausted}
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """第 attempt 次重试（从 1 开始）前的等待时间，在 0 ~ min(cap, base * 2^attempt) 间随机，避免多个请求同时重试"""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+class LatencyTracker:
+    """最近 size 个成功请求的延迟，样本不足 min_samples 时不给出分位数"""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
@@ -1,25 +1,218 @@
+import asyncio
+import importlib.util
+import time
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass
 from typing import Optional, Tuple
 
 import httpx
 
 from app.core.config import config
 from app.core.logger import logger
+from app.core.metrics import jwxt_hedged_requests, jwxt_request_duration, jwxt_retries
+from app.core.timing import record_timing
 from app.schemas.jwxt import (
     JWXTExternalLoginResponse,
     JWXTExternalUserInfoResponse,
     JWXTUserInfoAPIResponse,
 )
+from app.services.jwxt_resilience import CircuitBreaker, CircuitOpenError, LatencyTracker, RetryBudget, backoff_delay
+from app.services.jwxt_token_cache import JWXTTokenCache, jwxt_token_cache
 from app.services.password_encryption import decrypt_jwxt_password
 
 
+ProgressCallback = Callable[[int, str], Awaitable[None]]
+"""同步/绑定的进度回调，参数为阶段序号（1~4）与阶段说明"""
+
+
+async def report_progress(progress: Optional[ProgressCallback], stage: int, message: str):
+    logger.debug(f"[{stage}/4] {message}")
+    if progress is not None:
+        await progress(stage, message)
+
+
+@dataclass
+class HostConnectionStats:
+    """单个上游主机的连接复用情况"""
+
+    requests: int = 0
+    """发出的请求数"""
+    connections_opened: int = 0
+    """新建的 TCP 连接数，requests - connections_opened 即复用长连接的请求数"""
+
+    def to_json(self):
+        data = asdict(self)
+        data["reuse_ratio"] = 1 - self.connections_opened / self.requests if self.requests else 0.0
+        return data
+
+
 class JWXTExternalService:
-    """外部教务系统API服务"""
+    """
+    外部教务系统API服务
 
-    # 教务系统API基础URL
-    BASE_URL = "http://jwxt.gduf.edu.cn/app.do"
+    每个上游主机一个熔断器，连续失败后在冷却期内直接返回失败；getUserInfo 是幂等的，
+    超时、连接失败或 5xx 时在重试预算内带随机退避重试，开启 jwxt_hedge_enabled 时超过近期 p95 仍未返回会再发一个请求。
+    authUser 只发一次。每次调用（含重试）受 jwxt_api_timeout 总时限约束
+    """
 
-    def __init__(self):
+    def __init__(self, base_url: Optional[str] = None, token_cache: JWXTTokenCache = jwxt_token_cache):
+        self.base_url = base_url or config.jwxt_base_url  # 教务系统API基础URL
         self.timeout = config.jwxt_api_timeout  # 使用配置中的超时时间
+        self.token_cache = token_cache
+        self.connection_stats: defaultdict[str, HostConnectionStats] = defaultdict(HostConnectionStats)
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self.retry_budget = RetryBudget(config.jwxt_retry_budget_ratio)
+        self.retry_attempts = config.jwxt_retry_attempts
+        self.retry_backoff = config.jwxt_retry_backoff
+        self.retry_backoff_max = config.jwxt_retry_backoff_max
+        self.hedge_enabled = config.jwxt_hedge_enabled
+        self.latency = LatencyTracker()
+        """getUserInfo 成功请求的近期延迟，用于决定何时发出对冲请求"""
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        """创建进程内共享的长连接客户端，由 main.py 的 lifespan 调用"""
+        if self._client is not None:
+            return
+        http2 = config.jwxt_http2 and importlib.util.find_spec("h2") is not None
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(self.timeout, connect=config.jwxt_connect_timeout, read=config.jwxt_read_timeout),
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=config.jwxt_max_connections,
+                max_keepalive_connections=config.jwxt_max_keepalive_connections,
+                keepalive_expiry=config.jwxt_keepalive_expiry,
+            ),
+            event_hooks={"request": [self._trace_request]},
+        )
+        logger.info(f"初始化 JWXT HTTP 客户端 (http2={http2})")
+
+    async def close(self):
+        """关闭客户端及其所有连接"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            # 未经过 lifespan 启动（如脚本或测试直接调用）时按需初始化
+            await self.start()
+        return self._client  # type: ignore[return-value]
+
+    async def _trace_request(self, request: httpx.Request):
+        """统计每个主机的请求数与新建连接数"""
+        stats = self.connection_stats[request.url.host]
+        stats.requests += 1
+
+        async def trace(event_name: str, info: dict):
+            if event_name == "connection.connect_tcp.complete":
+                stats.connections_opened += 1
+
+        request.extensions["trace"] = trace
+
+    def get_connection_stats(self) -> dict:
+        return {host: stats.to_json() for host, stats in self.connection_stats.items()}
+
+    def get_resilience_stats(self) -> dict:
+        p95 = self.latency.percentile(95)
+        return {
+            "breakers": {host: breaker.to_json() for host, breaker in self.breakers.items()},
+            "retry_budget": self.retry_budget.to_json(),
+            "hedge": {"enabled": self.hedge_enabled, "delay_ms": round(p95 * 1000, 2) if p95 is not None else None},
+        }
+
+    def _get_breaker(self) -> CircuitBreaker:
+        host = httpx.URL(self.base_url).host
+        breaker = self.breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                host,
+                failure_threshold=config.jwxt_breaker_failure_threshold,
+                recovery_seconds=config.jwxt_breaker_recovery_seconds,
+                half_open_probes=config.jwxt_breaker_half_open_probes,
+            )
+            self.breakers[host] = breaker
+        return breaker
+
+    async def _send(
+        self, method: str, send: Callable[[], Awaitable[httpx.Response]], idempotent: bool = False
+    ) -> httpx.Response:
+        """
+        经熔断器发出请求，超时、连接失败与 5xx 记为上游失败
+
+        idempotent 为 True 时失败后在重试预算内重试，并在开启对冲时对每次尝试使用对冲请求。
+        返回最后一次尝试的响应（可能是 5xx，由调用方 raise_for_status），或抛出最后一次尝试的异常
+        """
+        breaker = self._get_breaker()
+        if idempotent:
+            self.retry_budget.deposit()
+        attempt = 0
+        while True:
+            breaker.check()
+            error: Optional[Exception] = None
+            start = time.perf_counter()
+            try:
+                if idempotent and self.hedge_enabled:
+                    response = await self._send_hedged(method, send)
+                else:
+                    response = await send()
+            except httpx.TransportError as e:
+                breaker.record_failure()
+                error, reason = e, "timeout" if isinstance(e, httpx.TimeoutException) else "transport"
+            except BaseException:
+                breaker.release()
+                raise
+            else:
+                if response.status_code < 500:
+                    breaker.record_success()
+                    if idempotent:
+                        self.latency.add(time.perf_counter() - start)
+                    return response
+                breaker.record_failure()
+                reason = "5xx"
+
+            attempt += 1
+            if not idempotent or attempt > self.retry_attempts or not self.retry_budget.withdraw():
+                if error is not None:
+                    raise error
+                return response
+            jwxt_retries.labels(method, reason).inc()
+            logger.warning(f"JWXT {method} 第 {attempt} 次重试，原因: {reason}")
+            await asyncio.sleep(backoff_delay(attempt, self.retry_backoff, self.retry_backoff_max))
+
+    async def _send_hedged(self, method: str, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        """先发一个请求，超过近期 p95 延迟仍未返回时再发一个，取先成功返回的结果并取消另一个"""
+        delay = self.latency.percentile(95)
+        primary = asyncio.ensure_future(send())
+        if delay is None:
+            return await primary
+
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return primary.result()
+
+            hedge = asyncio.ensure_future(send())
+            tasks.append(hedge)
+            pending = set(tasks)
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result().status_code < 500:
+                        jwxt_hedged_requests.labels(method, "hedge" if task is hedge else "primary").inc()
+                        return task.result()
+                if not pending:
+                    # 两个请求都失败，按后返回的一个处理
+                    jwxt_hedged_requests.labels(method, "none").inc()
+                    return done.pop().result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # 避免 "exception was never retrieved" 警告
 
     async def authenticate_user(self, student_id: str, password: str) -> JWXTExternalLoginResponse:
         """
@@ -32,31 +225,44 @@ class JWXTExternalService:
         Returns:
             登录响应结果
         """
+        start = time.perf_counter()
+        outcome = "error"
         try:
-            url = f"{self.BASE_URL}?method=authUser&xh={student_id}&pwd={password}"
-
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(url)
-                response.raise_for_status()
-
-                # 假设返回JSON格式，根据实际API调整
-                data = response.json() if response.content else {}
-
-                # 根据实际API响应格式调整
-                if "token" in data and data.get("success", False):
-                    return JWXTExternalLoginResponse(token=data["token"], success=True, message="登录成功")
-                else:
-                    return JWXTExternalLoginResponse(token=None, success=False, message=data.get("message", "登录失败"))
-
-        except httpx.TimeoutException:
+            url = f"{self.base_url}?method=authUser&xh={student_id}&pwd={password}"
+
+            client = await self._get_client()
+            response = await asyncio.wait_for(self._send("authUser", lambda: client.get(url)), self.timeout)
+            response.raise_for_status()
+
+            # 假设返回JSON格式，根据实际API调整
+            data = response.json() if response.content else {}
+
+            # 根据实际API响应格式调整
+            if "token" in data and data.get("success", False):
+                outcome = "success"
+                return JWXTExternalLoginResponse(token=data["token"], success=True, message="登录成功")
+            else:
+                outcome = "failure"
+                return JWXTExternalLoginResponse(token=None, success=False, message=data.get("message", "登录失败"))
+
+        except CircuitOpenError:
+            outcome = "circuit_open"
+            return JWXTExternalLoginResponse(token=None, success=False, message="教务系统暂时不可用，请稍后重试")
+        except (httpx.TimeoutException, asyncio.TimeoutError):
+            outcome = "timeout"
             logger.error(f"JWXT login timeout for student_id: {student_id}")
             return JWXTExternalLoginResponse(token=None, success=False, message="请求超时，请稍后重试")
         except httpx.HTTPStatusError as e:
+            outcome = "http_error"
             logger.error(f"JWXT login HTTP error for student_id: {student_id}, error: {e}")
             return JWXTExternalLoginResponse(token=None, success=False, message=f"网络错误: {e.response.status_code}")
         except Exception as e:
             logger.error(f"JWXT login error for student_id: {student_id}, error: {e}")
             return JWXTExternalLoginResponse(token=None, success=False, message="系统错误，请联系管理员")
+        finally:
+            elapsed = time.perf_counter() - start
+            jwxt_request_duration.labels("authUser", outcome).observe(elapsed)
+            record_timing("jwxt-authUser", elapsed)
 
     async def get_user_info(self, student_id: str, token: str) -> JWXTExternalUserInfoResponse:
         """
@@ -69,49 +275,105 @@ class JWXTExternalService:
         Returns:
             用户信息响应结果
         """
+        start = time.perf_counter()
+        outcome = "error"
         try:
             params = {"method": "getUserInfo", "xh": student_id}
             headers = {"tokens": token}
 
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(self.BASE_URL, headers=headers, params=params)
-                response.raise_for_status()
-
-                data = response.json()
-
-                return JWXTExternalUserInfoResponse(success=True, message="获取用户信息成功", data=data)
-
-        except httpx.TimeoutException:
+            client = await self._get_client()
+            response = await asyncio.wait_for(
+                self._send(
+                    "getUserInfo",
+                    lambda: client.post(self.base_url, headers=headers, params=params),
+                    idempotent=True,
+                ),
+                self.timeout,
+            )
+            if response.status_code in (401, 403):
+                outcome = "auth_failed"
+                return JWXTExternalUserInfoResponse(success=False, message="登录已失效", data=None, auth_failed=True)
+            response.raise_for_status()
+
+            data = response.json()
+
+            # 正常情况下直接返回用户信息，token 无效时返回 success=false 的错误体
+            if isinstance(data, dict) and data.get("success") is False:
+                outcome = "auth_failed"
+                return JWXTExternalUserInfoResponse(
+                    success=False, message=data.get("message", "登录已失效"), data=None, auth_failed=True
+                )
+
+            outcome = "success"
+            return JWXTExternalUserInfoResponse(success=True, message="获取用户信息成功", data=data)
+
+        except CircuitOpenError:
+            outcome = "circuit_open"
+            return JWXTExternalUserInfoResponse(success=False, message="教务系统暂时不可用，请稍后重试", data=None)
+        except (httpx.TimeoutException, asyncio.TimeoutError):
+            outcome = "timeout"
             logger.error(f"JWXT get user info timeout for student_id: {student_id}")
             return JWXTExternalUserInfoResponse(success=False, message="请求超时，请稍后重试", data=None)
         except httpx.HTTPStatusError as e:
+            outcome = "http_error"
             logger.error(f"JWXT get user info HTTP error for student_id: {student_id}, error: {e}")
             return JWXTExternalUserInfoResponse(success=False, message=f"网络错误: {e.response.status_code}", data=None)
         except Exception as e:
             logger.error(f"JWXT get user info error for student_id: {student_id}, error: {e}")
             return JWXTExternalUserInfoResponse(success=False, message="系统错误，请联系管理员", data=None)
+        finally:
+            elapsed = time.perf_counter() - start
+            jwxt_request_duration.labels("getUserInfo", outcome).observe(elapsed)
+            record_timing("jwxt-getUserInfo", elapsed)
+
+    async def _login(self, student_id: str, password: str) -> Tuple[Optional[str], str]:
+        """
+        登录教务系统并缓存 token
+
+        Returns:
+            (token，失败时为 None, 错误信息)
+        """
+        login_result = await self.authenticate_user(student_id, password)
+        if not login_result.success or not login_result.token:
+            return None, login_result.message
+
+        await self.token_cache.set(student_id, login_result.token)
+        return login_result.token, "成功"
+
+    async def _login_with_encrypted_password(
+        self, student_id: str, encrypted_password: str
+    ) -> Tuple[Optional[str], str]:
+        password = decrypt_jwxt_password(encrypted_password)
+        if not password:
+            return None, "密码解密失败，请重新绑定账号"
+        return await self._login(student_id, password)
 
     async def validate_and_get_user_info(
-        self, student_id: str, password: str
+        self, student_id: str, password: str, progress: Optional[ProgressCallback] = None
     ) -> Tuple[bool, Optional[JWXTUserInfoAPIResponse], str]:
         """
         验证账号密码并获取用户信息
 
+        绑定时必须用密码重新登录以验证密码正确，不使用缓存的 token
+
         Args:
             student_id: 学号
             password: 密码
+            progress: 进度回调，登录与获取用户信息前分别报告第 2、3 阶段
 
         Returns:
             (是否成功, 用户信息数据, 错误信息)
         """
         # 首先尝试登录获取token
-        login_result = await self.authenticate_user(student_id, password)
+        await report_progress(progress, 2, "尝试登录到教务系统")
+        token, error_msg = await self._login(student_id, password)
 
-        if not login_result.success:
-            return False, None, login_result.message
+        if not token:
+            return False, None, error_msg
 
         # 使用token获取用户信息
-        user_info_result = await self.get_user_info(student_id, login_result.token)  # type: ignore
+        await report_progress(progress, 3, "获取用户信息")
+        user_info_result = await self.get_user_info(student_id, token)
 
         if not user_info_result.success:
             return False, None, user_info_result.message
@@ -119,25 +381,48 @@ class JWXTExternalService:
         return True, user_info_result.data, "成功"
 
     async def sync_with_encrypted_password(
-        self, student_id: str, encrypted_password: str
+        self, student_id: str, encrypted_password: str, progress: Optional[ProgressCallback] = None
     ) -> Tuple[bool, Optional[JWXTUserInfoAPIResponse], str]:
         """
         使用加密密码同步用户信息
 
+        优先复用缓存的 token，省掉一次登录请求和密码解密；token 被拒绝时才重新登录
+
         Args:
             student_id: 学号
             encrypted_password: 加密的密码
+            progress: 进度回调，登录与获取用户信息前分别报告第 2、3 阶段
 
         Returns:
             (是否成功, 用户信息数据, 错误信息)
         """
-        # 解密密码
-        password = decrypt_jwxt_password(encrypted_password)
-        if not password:
-            return False, None, "密码解密失败，请重新绑定账号"
+        await report_progress(progress, 2, "尝试登录到教务系统")
+        token = await self.token_cache.get(student_id)
+        from_cache = token is not None
+        if not token:
+            token, error_msg = await self._login_with_encrypted_password(student_id, encrypted_password)
+            if not token:
+                return False, None, error_msg
+
+        await report_progress(progress, 3, "获取用户信息")
+        user_info_result = await self.get_user_info(student_id, token)
+
+        if from_cache:
+            if user_info_result.success:
+                self.token_cache.stats.saved_upstream_calls += 1
+            elif user_info_result.auth_failed:
+                # 缓存的 token 已失效，删除后重新登录
+                self.token_cache.stats.rejected += 1
+                await self.token_cache.invalidate(student_id)
+                token, error_msg = await self._login_with_encrypted_password(student_id, encrypted_password)
+                if not token:
+                    return False, None, error_msg
+                user_info_result = await self.get_user_info(student_id, token)
 
-        # 使用解密后的密码进行同步
-        return await self.validate_and_get_user_info(student_id, password)
+        if not user_info_result.success:
+            return False, None, user_info_result.message
+
+        return True, user_info_result.data, "成功"
 
 
 # 创建服务实例
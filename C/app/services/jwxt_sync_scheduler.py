@@ -0,0 +1,240 @@
+import asyncio
+import random
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+from urllib.parse import urlparse
+from uuid import uuid4
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import config
+from app.core.logger import logger
+from app.core.redis import get_shared_redis
+from app.core.sql import AsyncSessionLocal
+from app.models.jwxt import JWXTBinding
+from app.repositories.jwxt import JWXTRepository
+from app.services.jwxt_service import JWXTExternalService, jwxt_external_service
+from app.services.view_cache import jwxt_info_view_key, view_cache
+
+"""教务系统后台批量同步
+
+定期找出 last_sync_time 早于 jwxt_sync_interval_days 的绑定，分批重新同步。
+通过并发上限、按上游主机限速以及随机延迟把请求打散，避免开学时集中访问教务系统。
+可以随 API 进程启动（jwxt_sync_scheduler_enabled），也可以用 python -m app.workers.jwxt_sync 单独运行。
+每轮开始前在 Redis 中取得租约（SET NX PX），多个 uvicorn worker 或独立进程同时启用时只有一个进程在同步，限速不会被放大。
+"""
+
+LEASE_KEY = "jwxt_sync_scheduler:lease"
+
+
+class RateLimiter:
+    """令牌桶限速器，rate 为每秒允许的次数"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(1.0, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class SyncSchedulerStats:
+    runs: int = 0
+    """已完成的扫描轮数"""
+    skipped: int = 0
+    """租约被其他进程持有而跳过的轮数"""
+    running: bool = False
+    """当前是否正在同步"""
+    scanned: int = 0
+    """本轮已取出的到期绑定数"""
+    synced: int = 0
+    """本轮同步成功数"""
+    failed: int = 0
+    """本轮同步失败数"""
+    total_synced: int = 0
+    total_failed: int = 0
+    last_run_started: Optional[datetime] = None
+    last_run_seconds: float = 0.0
+    last_run_throughput: float = 0.0
+    """上一轮每秒完成的同步数"""
+
+    def to_json(self):
+        return asdict(self)
+
+
+class JWXTSyncScheduler:
+    """按 jwxt_sync_interval_days 周期性重新同步教务系统信息"""
+
+    def __init__(
+        self,
+        service: JWXTExternalService,
+        session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+    ):
+        self.service = service
+        self.session_factory = session_factory
+        self.stats = SyncSchedulerStats()
+        self._limiters: dict[str, RateLimiter] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _limiter_for(self, url: str) -> RateLimiter:
+        host = urlparse(url).hostname or url
+        if host not in self._limiters:
+            self._limiters[host] = RateLimiter(config.jwxt_sync_rate_limit)
+        return self._limiters[host]
+
+    async def _acquire_lease(self) -> Optional[str]:
+        """取得本轮的租约，返回租约标识；其他进程正在同步时返回 None"""
+        token = uuid4().hex
+        redis = await get_shared_redis()
+        if await redis.set(LEASE_KEY, token, nx=True, px=config.jwxt_sync_lease_seconds * 1000):
+            return token
+        return None
+
+    async def _renew_lease(self, token: str, lost: asyncio.Event):
+        """同步期间定期续期；租约已过期并被其他进程取得时设置 lost，本轮在当前批次结束后停止"""
+        while True:
+            await asyncio.sleep(config.jwxt_sync_lease_seconds / 3)
+            try:
+                redis = await get_shared_redis()
+                if await redis.get(LEASE_KEY) != token:
+                    logger.warning("JWXT 后台同步租约已丢失，本批次结束后停止")
+                    lost.set()
+                    return
+                await redis.pexpire(LEASE_KEY, config.jwxt_sync_lease_seconds * 1000)
+            except Exception as e:
+                logger.warning(f"JWXT 后台同步租约续期失败: {e}")
+
+    async def _release_lease(self, token: str):
+        try:
+            redis = await get_shared_redis()
+            if await redis.get(LEASE_KEY) == token:
+                await redis.delete(LEASE_KEY)
+        except Exception as e:
+            logger.warning(f"JWXT 后台同步租约释放失败，将在 {config.jwxt_sync_lease_seconds} 秒后过期: {e}")
+
+    async def run_once(self):
+        """取得租约后扫描一轮所有到期的绑定并同步；其他进程正在同步时跳过本轮"""
+        token = await self._acquire_lease()
+        if token is None:
+            self.stats.skipped += 1
+            logger.info("JWXT 后台同步: 其他进程正在同步，跳过本轮")
+            return
+        lost = asyncio.Event()
+        renewer = asyncio.create_task(self._renew_lease(token, lost))
+        try:
+            await self._run_round(lost)
+        finally:
+            renewer.cancel()
+            await self._release_lease(token)
+
+    async def _run_round(self, lost: asyncio.Event):
+        self.stats.running = True
+        self.stats.scanned = self.stats.synced = self.stats.failed = 0
+        self.stats.last_run_started = datetime.now()
+        started = time.perf_counter()
+        before = datetime.now() - timedelta(days=config.jwxt_sync_interval_days)
+        semaphore = asyncio.Semaphore(config.jwxt_sync_concurrency)
+        after_id = 0
+
+        try:
+            while not lost.is_set():
+                # 只在读取批次时占用数据库连接，访问教务系统期间不持有会话
+                async with self.session_factory() as db:
+                    batch = await JWXTRepository(db).get_bindings_due_for_sync(
+                        before, after_id=after_id, limit=config.jwxt_sync_batch_size
+                    )
+                if not batch:
+                    break
+
+                self.stats.scanned += len(batch)
+                after_id = batch[-1].id
+                await asyncio.gather(*(self._sync_with_limits(semaphore, binding) for binding in batch))
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stats.running = False
+            self.stats.runs += 1
+            self.stats.last_run_seconds = elapsed
+            self.stats.last_run_throughput = self.stats.synced / elapsed if elapsed else 0.0
+
+        logger.info(
+            f"JWXT 后台同步完成: 到期 {self.stats.scanned}，成功 {self.stats.synced}，"
+            f"失败 {self.stats.failed}，耗时 {self.stats.last_run_seconds:.1f}s"
+        )
+
+    async def _sync_with_limits(self, semaphore: asyncio.Semaphore, binding: JWXTBinding):
+        # 随机延迟放在取得并发名额之前，等待期间不占用名额
+        await asyncio.sleep(random.uniform(0, config.jwxt_sync_jitter_seconds))
+        async with semaphore:
+            await self._limiter_for(self.service.base_url).acquire()
+            if await self.sync_binding(binding):
+                self.stats.synced += 1
+                self.stats.total_synced += 1
+            else:
+                self.stats.failed += 1
+                self.stats.total_failed += 1
+
+    async def sync_binding(self, binding: JWXTBinding) -> bool:
+        """同步单个绑定，返回是否成功"""
+        success, user_data, error_msg = await self.service.sync_with_encrypted_password(
+            binding.student_id, binding.jwxt_password
+        )
+        if not success or not user_data:
+            logger.warning(f"JWXT 后台同步失败 user_id={binding.user_id}: {error_msg}")
+            return False
+
+        try:
+            async with self.session_factory() as db:
+                jwxt_repo = JWXTRepository(db)
+                current = await db.get(JWXTBinding, binding.id)
+                if current is None:  # 同步期间已解绑
+                    return False
+                await jwxt_repo.create_user_info(current.user_id, current.student_id, user_data)
+                await jwxt_repo.update_binding(current, last_sync_time=datetime.now())
+                await jwxt_repo.commit()
+            await view_cache.invalidate(jwxt_info_view_key(binding.user_id))
+        except Exception as e:
+            logger.error(f"JWXT 后台同步写入失败 user_id={binding.user_id}: {e}")
+            return False
+        return True
+
+    async def run_forever(self):
+        """每隔 jwxt_sync_poll_interval 秒扫描一轮"""
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"JWXT 后台同步出错: {e}")
+            await asyncio.sleep(config.jwxt_sync_poll_interval * random.uniform(0.9, 1.1))
+
+    def start(self):
+        """在当前事件循环中启动后台同步任务"""
+        if self._task is None:
+            logger.info("启动 JWXT 后台同步任务...")
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+jwxt_sync_scheduler = JWXTSyncScheduler(jwxt_external_service)
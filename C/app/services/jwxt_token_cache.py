@@ -0,0 +1,102 @@
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from app.core.config import config
+from app.core.logger import logger
+from app.core.redis import get_shared_redis
+
+JWXT_TOKEN_PREFIX = "jwxt_token:"
+
+"""教务系统登录 token 缓存
+
+每次同步都要先 method=authUser 登录再 getUserInfo，并且要先解密 Fernet 加密的密码。
+token 在一段时间内有效，按学号缓存后，重复同步只需要一次 getUserInfo。
+L1 为进程内 LRU，L2 为 Redis（多个 worker 共享），token 被教务系统拒绝时删除并重新登录。
+"""
+
+
+@dataclass
+class JWXTTokenCacheStats:
+    l1_hits: int = 0
+    l2_hits: int = 0
+    misses: int = 0
+    saved_upstream_calls: int = 0
+    """复用 token 成功而省掉的登录请求数"""
+    rejected: int = 0
+    """缓存的 token 被教务系统拒绝、需要重新登录的次数"""
+
+    def to_json(self):
+        data = asdict(self)
+        lookups = self.l1_hits + self.l2_hits + self.misses
+        data["hit_rate"] = (self.l1_hits + self.l2_hits) / lookups if lookups else 0.0
+        return data
+
+
+class JWXTTokenCache:
+    """按学号缓存教务系统 token 的两级缓存"""
+
+    def __init__(self, ttl: int, local_size: int):
+        self.ttl = ttl
+        self.local_size = local_size
+        self.stats = JWXTTokenCacheStats()
+        self._local: OrderedDict[str, tuple[str, float]] = OrderedDict()
+
+    async def get(self, student_id: str) -> Optional[str]:
+        """获取缓存的 token，先查进程内缓存再查 Redis"""
+        entry = self._local.get(student_id)
+        if entry is not None:
+            token, expires_at = entry
+            if expires_at > time.time():
+                self._local.move_to_end(student_id)
+                self.stats.l1_hits += 1
+                return token
+            del self._local[student_id]
+
+        try:
+            redis = await get_shared_redis()
+            token = await redis.get(JWXT_TOKEN_PREFIX + student_id)
+            remaining = await redis.ttl(JWXT_TOKEN_PREFIX + student_id) if token else 0
+        except Exception as e:
+            logger.warning(f"读取 JWXT token 缓存失败: {e}")
+            token, remaining = None, 0
+
+        if token:
+            self._set_local(student_id, token, max(remaining, 1))
+            self.stats.l2_hits += 1
+            return token
+
+        self.stats.misses += 1
+        return None
+
+    async def set(self, student_id: str, token: str):
+        """缓存登录得到的 token"""
+        if self.ttl <= 0:
+            return
+        self._set_local(student_id, token, self.ttl)
+        try:
+            redis = await get_shared_redis()
+            await redis.set(JWXT_TOKEN_PREFIX + student_id, token, ex=self.ttl)
+        except Exception as e:
+            logger.warning(f"写入 JWXT token 缓存失败: {e}")
+
+    async def invalidate(self, student_id: str):
+        """token 被拒绝时删除两级缓存"""
+        self._local.pop(student_id, None)
+        try:
+            redis = await get_shared_redis()
+            await redis.delete(JWXT_TOKEN_PREFIX + student_id)
+        except Exception as e:
+            logger.warning(f"删除 JWXT token 缓存失败: {e}")
+
+    def _set_local(self, student_id: str, token: str, ttl: float):
+        if self.local_size <= 0:
+            return
+        self._local[student_id] = (token, time.time() + ttl)
+        self._local.move_to_end(student_id)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+
+jwxt_token_cache = JWXTTokenCache(ttl=config.jwxt_token_ttl, local_size=config.jwxt_token_local_cache_size)
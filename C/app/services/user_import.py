@@ -0,0 +1,242 @@
+import asyncio
+import codecs
+import csv
+import json
+from collections.abc import AsyncIterator
+from typing import Literal, Optional, Union
+
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import config
+from app.core.logger import logger
+from app.core.sql import AsyncSessionLocal
+from app.models.user import UserRole
+from app.repositories.user import UserRepository
+from app.schemas.auth import RegisterRequest
+from app.schemas.user import UserImportError, UserImportResponse
+from app.services.auth.auth_service import hash_passwords
+from app.services.auth.password_hasher import PasswordHasher
+
+"""批量导入用户
+
+逐块读取 CSV（首行为表头）或 JSONL，每行字段与注册接口相同：username、realname、email、password、role（可选）。
+每 user_import_chunk_size 行为一批：先在内存中剔除文件内重复（不区分大小写），再用一条查询找出数据库中已存在的用户名/邮箱，
+剩下的行在进程池中计算哈希后用一条多行 INSERT 写入并提交。与并发创建的用户冲突时重新检查后重试一次，
+仍冲突则逐行写入。出错的行记录在结果中，不影响其他行。
+"""
+
+ImportFormat = Literal["csv", "jsonl"]
+
+# 与 users 表的列长度一致，超长的行在插入前就报错，避免整批失败
+MAX_USERNAME_LENGTH = 12
+MAX_REALNAME_LENGTH = 10
+MAX_EMAIL_LENGTH = 50
+
+user_import_hasher = PasswordHasher(config.user_import_hash_workers, "process")
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """把字节块流按行切分，兼容 UTF-8 BOM 与 \\r\\n"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+async def iter_records(chunks: AsyncIterator[bytes], file_format: ImportFormat) -> AsyncIterator[tuple[int, Union[dict, str]]]:
+    """逐行解析，产出 (行号, 字段字典) 或 (行号, 错误信息)，跳过空行"""
+    header: Optional[list[str]] = None
+    line_no = 0
+    async for line in iter_lines(chunks):
+        line_no += 1
+        if not line.strip():
+            continue
+
+        if file_format == "jsonl":
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, f"JSON 解析失败: {e.msg}"
+                continue
+            yield (line_no, record) if isinstance(record, dict) else (line_no, "每行必须是一个 JSON 对象")
+            continue
+
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield line_no, f"列数 {len(values)} 与表头的 {len(header)} 列不一致"
+            continue
+        yield line_no, dict(zip(header, values))
+
+
+class UserImporter:
+    """流式批量导入用户"""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+        hasher: PasswordHasher = user_import_hasher,
+        chunk_size: Optional[int] = None,
+        bcrypt_rounds: Optional[int] = None,
+    ):
+        self.session_factory = session_factory
+        self.hasher = hasher
+        self.chunk_size = chunk_size or config.user_import_chunk_size
+        self.bcrypt_rounds = bcrypt_rounds or config.user_import_bcrypt_rounds
+        self._seen_usernames: set[str] = set()
+        self._seen_emails: set[str] = set()
+        """本次导入已接受的用户名/邮箱（casefold 后）"""
+
+    async def run(self, chunks: AsyncIterator[bytes], file_format: ImportFormat = "csv") -> UserImportResponse:
+        report = UserImportResponse()
+        self._seen_usernames.clear()
+        self._seen_emails.clear()
+        pending: list[tuple[int, RegisterRequest]] = []
+
+        async for line_no, record in iter_records(chunks, file_format):
+            report.total += 1
+            if isinstance(record, str):
+                self._fail(report, line_no, None, record)
+                continue
+            row = self._validate(report, line_no, record)
+            if row is not None:
+                pending.append((line_no, row))
+            if len(pending) >= self.chunk_size:
+                await self._import_chunk(report, pending)
+                pending = []
+
+        if pending:
+            await self._import_chunk(report, pending)
+
+        report.errors.sort(key=lambda error: error.line)
+        logger.info(f"批量导入用户完成: 共 {report.total} 行，成功 {report.created}，失败 {report.failed}")
+        return report
+
+    @staticmethod
+    def _fail(report: UserImportResponse, line_no: int, username: Optional[str], error: str):
+        report.failed += 1
+        report.errors.append(UserImportError(line=line_no, username=username, error=error))
+
+    def _validate(self, report: UserImportResponse, line_no: int, record: dict) -> Optional[RegisterRequest]:
+        record = {key: value for key, value in record.items() if value not in (None, "")}
+        try:
+            row = RegisterRequest(**record)
+            UserRole(row.role)
+        except ValidationError as e:
+            fields = ", ".join(".".join(str(loc) for loc in error["loc"]) for error in e.errors())
+            self._fail(report, line_no, record.get("username"), f"字段不合法: {fields}")
+            return None
+        except ValueError:
+            self._fail(report, line_no, record.get("username"), f"未知的角色: {record.get('role')}")
+            return None
+
+        for value, limit, name in (
+            (row.username, MAX_USERNAME_LENGTH, "用户名"),
+            (row.realname, MAX_REALNAME_LENGTH, "真实姓名"),
+            (row.email, MAX_EMAIL_LENGTH, "邮箱"),
+        ):
+            if len(value) > limit:
+                self._fail(report, line_no, row.username, f"{name}超过 {limit} 个字符")
+                return None
+        return row
+
+    async def _hash(self, passwords: list[str]) -> list[str]:
+        """按工作进程数切片，每个进程一次计算一片"""
+        size = -(-len(passwords) // self.hasher.max_workers)
+        slices = [passwords[i : i + size] for i in range(0, len(passwords), size)]
+        results = await asyncio.gather(*(self.hasher.run(hash_passwords, part, self.bcrypt_rounds) for part in slices))
+        return [hashed for part in results for hashed in part]
+
+    def _drop_duplicates_in_file(
+        self, report: UserImportResponse, rows: list[tuple[int, RegisterRequest]]
+    ) -> list[tuple[int, RegisterRequest]]:
+        """文件内重复（不区分大小写，与 MySQL 唯一索引的排序规则一致）：保留第一次出现的行，跨批次也生效"""
+        unique_rows = []
+        for line_no, row in rows:
+            username, email = row.username.casefold(), row.email.casefold()
+            if username in self._seen_usernames:
+                self._fail(report, line_no, row.username, "用户名在导入文件中重复")
+            elif email in self._seen_emails:
+                self._fail(report, line_no, row.username, "邮箱在导入文件中重复")
+            else:
+                self._seen_usernames.add(username)
+                self._seen_emails.add(email)
+                unique_rows.append((line_no, row))
+        return unique_rows
+
+    async def _drop_existing(
+        self, report: UserImportResponse, rows: list[tuple[int, RegisterRequest]]
+    ) -> list[tuple[int, RegisterRequest]]:
+        """用一条查询剔除数据库中已存在的用户名/邮箱，只在查询期间持有会话"""
+        async with self.session_factory() as db:
+            existing_usernames, existing_emails = await UserRepository(db).get_existing_usernames_and_emails(
+                [row.username for _, row in rows], [row.email for _, row in rows]
+            )
+        existing_usernames = {username.casefold() for username in existing_usernames}
+        existing_emails = {email.casefold() for email in existing_emails}
+        to_create = []
+        for line_no, row in rows:
+            if row.username.casefold() in existing_usernames:
+                self._fail(report, line_no, row.username, "用户名已存在")
+            elif row.email.casefold() in existing_emails:
+                self._fail(report, line_no, row.username, "邮箱已存在")
+            else:
+                to_create.append((line_no, row))
+        return to_create
+
+    async def _import_chunk(self, report: UserImportResponse, rows: list[tuple[int, RegisterRequest]]):
+        unique_rows = await self._drop_existing(report, self._drop_duplicates_in_file(report, rows))
+        if not unique_rows:
+            return
+
+        # 哈希耗时数秒，在打开写入会话之前算完，不占用数据库连接
+        passwords = await self._hash([row.password for _, row in unique_rows])
+        records = {
+            line_no: {
+                "username": row.username,
+                "password": password,
+                "realname": row.realname,
+                "email": row.email,
+                "role": UserRole(row.role),
+                "status": True,
+            }
+            for (line_no, row), password in zip(unique_rows, passwords)
+        }
+
+        # 插入时与并发创建的用户冲突，则重新检查一次重复后重试
+        for attempt in range(2):
+            async with self.session_factory() as db:
+                try:
+                    await UserRepository(db).bulk_create_users([records[line_no] for line_no, _ in unique_rows])
+                    await db.commit()
+                    report.created += len(unique_rows)
+                    return
+                except IntegrityError as e:
+                    await db.rollback()
+                    logger.warning(f"批量导入用户写入冲突（第 {attempt + 1} 次）: {e}")
+            if attempt == 0:
+                unique_rows = await self._drop_existing(report, unique_rows)
+                if not unique_rows:
+                    return
+
+        # 仍然冲突：逐行写入，每行一个保存点，只有冲突的行失败
+        async with self.session_factory() as db:
+            repo = UserRepository(db)
+            for line_no, row in unique_rows:
+                try:
+                    async with db.begin_nested():
+                        await repo.bulk_create_users([records[line_no]])
+                    report.created += 1
+                except IntegrityError:
+                    self._fail(report, line_no, row.username, "写入数据库失败，用户名或邮箱冲突")
+            await db.commit()
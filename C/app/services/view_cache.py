@@ -0,0 +1,257 @@
+"""个人资料与教务信息视图的读穿透缓存
+
+/api/user/profile 与 /api/jwxt/info 每次打开页面都会查询 users、user_profile、jwxt_binding 与最新的 jwxt_user_info，
+而这些数据只在 setprofile、bind、sync、unbind 时变化。这里把拼好的视图序列化后缓存：
+L1 为进程内 LRU（较短的 TTL），L2 为 Redis（多个 worker 共享）。
+- 同一进程内同一个键同时未命中时只有一个请求去查数据库，其余请求等待它的结果（single-flight）
+- 写接口提交事务后调用 invalidate 删除两级缓存，并通过 Redis pub/sub 通知其他进程清掉各自的 L1
+- 加载期间该键被删除时，加载结果只返回给本次请求，不写入缓存，避免把旧数据写回去。删除时在 Redis 中
+  INCR 该键的代数（view_gen:<key>），加载前读取代数，写入 L2 时用 WATCH 确认代数未变，其他进程的删除同样生效
+"""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Optional
+
+from redis.exceptions import WatchError
+
+from app.core.config import config
+from app.core.logger import logger
+from app.core.redis import get_shared_redis
+
+VIEW_CACHE_PREFIX = "view:"
+VIEW_CACHE_CHANNEL = "view_cache:invalidate"
+VIEW_GENERATION_PREFIX = "view_gen:"
+GENERATION_TTL = 86400
+"""代数键的存活时间（秒），需长于任何一次加载；过期后代数读作 0，加载期间过期只会让写入被跳过"""
+
+_MISSING = object()
+
+
+class _LoadCancelled(Exception):
+    """正在进行的加载被取消，等待它的请求改为自己加载"""
+
+
+def profile_view_key(user_id: int) -> str:
+    return f"profile:{user_id}"
+
+
+def jwxt_info_view_key(user_id: int) -> str:
+    return f"jwxt_info:{user_id}"
+
+
+@dataclass
+class ViewCacheStats:
+    l1_hits: int = 0
+    l2_hits: int = 0
+    misses: int = 0
+    """两级缓存都未命中、查询了数据库的次数"""
+    coalesced: int = 0
+    """未命中时等待同一个键正在进行的加载、没有重复查询数据库的次数"""
+    stale_skipped: int = 0
+    """加载期间被删除、结果没有写入缓存的次数"""
+    invalidations: int = 0
+    errors: int = 0
+    """读写 Redis 失败的次数（失败时直接查数据库）"""
+
+    def to_json(self):
+        data = asdict(self)
+        lookups = self.l1_hits + self.l2_hits + self.misses + self.coalesced
+        data["hit_rate"] = (self.l1_hits + self.l2_hits + self.coalesced) / lookups if lookups else 0.0
+        return data
+
+
+class ViewCache:
+    """两级读穿透缓存，值为可 JSON 序列化的视图（None 表示数据不存在，同样会被缓存）"""
+
+    def __init__(self, ttl: int, local_ttl: float, local_size: int):
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.local_size = local_size
+        self.stats = ViewCacheStats()
+        self._local: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._generations: dict[str, int] = {}
+        """键被删除的次数，加载前后不一致说明加载期间发生了写入"""
+        self._listener: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._local)
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """获取缓存的视图，未命中时调用 loader 加载并写入缓存"""
+        if not self.enabled:
+            return await loader()
+
+        value = self._get_local(key)
+        if value is not _MISSING:
+            self.stats.l1_hits += 1
+            return value
+
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self.stats.coalesced += 1
+            try:
+                return await asyncio.shield(flight)
+            except _LoadCancelled:
+                return await self.get_or_load(key, loader)
+
+        flight = asyncio.get_running_loop().create_future()
+        self._inflight[key] = flight
+        try:
+            value = await self._load(key, loader)
+        except BaseException as e:
+            flight.set_exception(e if isinstance(e, Exception) else _LoadCancelled())
+            flight.exception()  # 没有等待者时避免 "exception was never retrieved" 警告
+            raise
+        else:
+            flight.set_result(value)
+        finally:
+            self._inflight.pop(key, None)
+        return value
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        # 与缓存值一起读取代数；读取失败时代数未知，加载结果不写入 L2
+        shared_generation: Optional[str] = None
+        try:
+            redis = await get_shared_redis()
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.get(VIEW_CACHE_PREFIX + key)
+                pipe.get(VIEW_GENERATION_PREFIX + key)
+                cached, shared_generation = await pipe.execute()
+            shared_generation = shared_generation or "0"
+        except Exception as e:
+            logger.warning(f"读取视图缓存失败: {e}")
+            self.stats.errors += 1
+            cached = None
+
+        if cached is not None:
+            value = json.loads(cached)
+            self._set_local(key, value)
+            self.stats.l2_hits += 1
+            return value
+
+        self.stats.misses += 1
+        generation = self._generations.get(key, 0)
+        value = await loader()
+        if self._generations.get(key, 0) != generation:
+            self.stats.stale_skipped += 1
+            return value
+
+        if shared_generation is not None:
+            try:
+                if not await self._set_if_generation(key, shared_generation, value):
+                    self.stats.stale_skipped += 1
+                    return value
+            except Exception as e:
+                logger.warning(f"写入视图缓存失败: {e}")
+                self.stats.errors += 1
+        self._set_local(key, value)
+        return value
+
+    async def _set_if_generation(self, key: str, generation: str, value: Any) -> bool:
+        """代数仍为加载前读到的值时写入 L2，否则说明加载期间有进程删除了该键，不写入"""
+        redis = await get_shared_redis()
+        generation_key = VIEW_GENERATION_PREFIX + key
+        async with redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(generation_key)
+                if (await pipe.get(generation_key) or "0") != generation:
+                    return False
+                pipe.multi()
+                pipe.set(VIEW_CACHE_PREFIX + key, json.dumps(value, ensure_ascii=False), ex=self.ttl)
+                await pipe.execute()
+            except WatchError:
+                return False
+        return True
+
+    async def invalidate(self, *keys: str):
+        """删除两级缓存并通知其他进程，应在写操作的事务提交之后调用"""
+        if not keys:
+            return
+        self._evict_local(keys)
+        self.stats.invalidations += len(keys)
+        try:
+            redis = await get_shared_redis()
+            async with redis.pipeline(transaction=True) as pipe:
+                for key in keys:
+                    pipe.incr(VIEW_GENERATION_PREFIX + key)
+                    pipe.expire(VIEW_GENERATION_PREFIX + key, GENERATION_TTL)
+                pipe.delete(*(VIEW_CACHE_PREFIX + key for key in keys))
+                pipe.publish(VIEW_CACHE_CHANNEL, json.dumps(keys))
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"删除视图缓存失败: {e}")
+            self.stats.errors += 1
+
+    def _evict_local(self, keys):
+        for key in keys:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            self._local.pop(key, None)
+        if len(self._generations) > self.local_size * 4:
+            # 只有正在进行的加载需要比较代数，没有加载时可以整体清空
+            self._generations = {key: self._generations.get(key, 0) for key in self._inflight}
+
+    def _get_local(self, key: str) -> Any:
+        entry = self._local.get(key)
+        if entry is None:
+            return _MISSING
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._local[key]
+            return _MISSING
+        self._local.move_to_end(key)
+        return value
+
+    def _set_local(self, key: str, value: Any):
+        if self.local_size <= 0 or self.local_ttl <= 0:
+            return
+        self._local[key] = (value, time.monotonic() + self.local_ttl)
+        self._local.move_to_end(key)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+    async def _listen(self):
+        """订阅其他进程发出的删除通知，清掉本进程的 L1"""
+        while True:
+            try:
+                redis = await get_shared_redis()
+                async with redis.pubsub() as pubsub:
+                    await pubsub.subscribe(VIEW_CACHE_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._evict_local(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 断线期间收不到通知，清空 L1，之后最多读到 L2 中的数据
+                logger.warning(f"视图缓存失效通知订阅中断，1 秒后重试: {e}")
+                self._evict_local(list(self._local))
+                await asyncio.sleep(1)
+
+    def start(self):
+        if self.enabled and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+
+view_cache = ViewCache(
+    ttl=config.view_cache_ttl,
+    local_ttl=config.view_cache_local_ttl,
+    local_size=config.view_cache_local_size,
+)
@@ -0,0 +1,33 @@
+"""
+独立运行的教务信息快照清理进程
+
+用法（在 C 目录下）：
+
+    python -m app.workers.jwxt_compact          # 常驻运行
+    python -m app.workers.jwxt_compact --once   # 只清理一轮后退出
+"""
+
+import argparse
+import asyncio
+
+from app.core.logger import logger
+from app.core.sql import close_db
+from app.services.jwxt_info_compactor import jwxt_info_compactor
+
+
+async def main(once: bool):
+    try:
+        if once:
+            await jwxt_info_compactor.run_once()
+        else:
+            await jwxt_info_compactor.run_forever()
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="教务信息快照清理")
+    parser.add_argument("--once", action="store_true", help="只清理一轮后退出")
+    args = parser.parse_args()
+    logger.info("启动教务信息快照清理进程...")
+    asyncio.run(main(args.once))
@@ -0,0 +1,37 @@
+"""
+独立运行的教务系统绑定/同步任务 worker
+
+API 进程设置 JWXT_JOB_WORKERS=0 时只负责入队，由本进程从 Redis 队列中取出任务执行。
+
+用法（在 C 目录下）：
+
+    python -m app.workers.jwxt_jobs               # 4 个并发 worker
+    python -m app.workers.jwxt_jobs --workers 8
+"""
+
+import argparse
+import asyncio
+from app.core.logger import logger
+from app.core.redis import close_redis, load_redis
+from app.core.sql import close_db
+from app.services.jwxt_jobs import jwxt_job_queue
+from app.services.jwxt_service import jwxt_external_service
+
+
+async def main(workers: int):
+    await load_redis()
+    await jwxt_external_service.start()
+    try:
+        await jwxt_job_queue.run_forever(workers)
+    finally:
+        await jwxt_external_service.close()
+        await close_redis()
+        await close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JWXT 绑定/同步任务 worker")
+    parser.add_argument("--workers", type=int, default=4, help="并发 worker 数")
+    args = parser.parse_args()
+    logger.info("启动 JWXT 任务 worker 进程...")
+    asyncio.run(main(args.workers))
@@ -0,0 +1,36 @@
+"""
+独立运行的教务系统后台同步进程
+
+用法（在 C 目录下）：
+
+    python -m app.workers.jwxt_sync          # 常驻运行
+    python -m app.workers.jwxt_sync --once   # 只扫描一轮后退出
+"""
+
+import argparse
+import asyncio
+
+from app.core.logger import logger
+from app.core.sql import close_db
+from app.services.jwxt_service import jwxt_external_service
+from app.services.jwxt_sync_scheduler import jwxt_sync_scheduler
+
+
+async def main(once: bool):
+    await jwxt_external_service.start()
+    try:
+        if once:
+            await jwxt_sync_scheduler.run_once()
+        else:
+            await jwxt_sync_scheduler.run_forever()
+    finally:
+        await jwxt_external_service.close()
+        await close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JWXT 后台同步")
+    parser.add_argument("--once", action="store_true", help="只扫描一轮后退出")
+    args = parser.parse_args()
+    logger.info("启动 JWXT 后台同步进程...")
+    asyncio.run(main(args.once))
@@ -0,0 +1,45 @@
+"""
+从文件批量导入用户
+
+用法（在 C 目录下）：
+
+    python -m app.workers.user_import users.csv
+    python -m app.workers.user_import users.jsonl --format jsonl
+
+文件格式见 app/services/user_import.py，结束后以 JSON 输出导入结果。
+"""
+
+import argparse
+import asyncio
+from collections.abc import AsyncIterator
+
+from app.core.logger import logger
+from app.core.sql import close_db
+from app.services.user_import import UserImporter, user_import_hasher
+
+READ_CHUNK_SIZE = 1 << 16
+
+
+async def read_file(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := await asyncio.to_thread(f.read, READ_CHUNK_SIZE):
+            yield chunk
+
+
+async def main(path: str, file_format: str):
+    try:
+        report = await UserImporter().run(read_file(path), file_format)
+    finally:
+        user_import_hasher.shutdown()
+        await close_db()
+    print(report.model_dump_json(indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="批量导入用户")
+    parser.add_argument("file", help="CSV 或 JSONL 文件路径")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default=None, help="默认按扩展名判断")
+    args = parser.parse_args()
+    file_format = args.format or ("jsonl" if args.file.endswith((".jsonl", ".ndjson")) else "csv")
+    logger.info(f"开始批量导入用户: {args.file} ({file_format})")
+    asyncio.run(main(args.file, file_format))
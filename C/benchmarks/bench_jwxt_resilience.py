@@ -0,0 +1,94 @@
+"""
+教务系统上游容错基准测试
+
+在本地模拟的教务系统上对比：
+- outage: 上游挂起（每个请求 --hang 秒才返回）时，--calls 个 getUserInfo 调用的平均耗时与发到上游的请求数，
+          熔断器关闭（阈值设为极大）与开启两种情况；读超时设为 --read-timeout 秒
+- hedge:  上游有 --tail-rate 比例的请求出现 --tail-latency 秒的长尾时，关闭与开启对冲请求的 p50/p99 与上游请求数
+
+用法（在 C 目录下）：
+
+    python -m benchmarks.bench_jwxt_resilience --calls 40 --concurrency 10
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.core.config import config
+from app.services.jwxt_service import JWXTExternalService
+from tests.jwxt_stub import create_jwxt_stub, run_jwxt_stub
+
+from .common import percentile
+
+
+async def drive(service: JWXTExternalService, token: str, calls: int, concurrency: int) -> list[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def call():
+        async with semaphore:
+            start = time.perf_counter()
+            await service.get_user_info("241500000", token)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(call() for _ in range(calls)))
+    return latencies
+
+
+async def outage(calls: int, concurrency: int, hang: float):
+    for name, threshold in (("no-breaker", 10**9), ("breaker", config.jwxt_breaker_failure_threshold)):
+        config.jwxt_breaker_failure_threshold = threshold
+        stub = create_jwxt_stub()
+        async with run_jwxt_stub(stub) as base_url:
+            service = JWXTExternalService(base_url)
+            token = (await service.authenticate_user("241500000", "password")).token
+            stub.state.latency = hang
+            before = service.connection_stats["127.0.0.1"].requests
+            latencies = await drive(service, token, calls, concurrency)
+            upstream = service.connection_stats["127.0.0.1"].requests - before
+            print(
+                f"outage {name:<10} calls={calls} mean={sum(latencies) / calls * 1000:8.1f}ms "
+                f"max={max(latencies) * 1000:8.1f}ms upstream_requests={upstream}"
+            )
+            await service.close()
+            stub.state.latency = 0
+
+
+async def hedge(calls: int, concurrency: int, tail_rate: float, tail_latency: float):
+    for name, enabled in (("no-hedge", False), ("hedge", True)):
+        stub = create_jwxt_stub(latency=0.02)
+        async with run_jwxt_stub(stub) as base_url:
+            service = JWXTExternalService(base_url)
+            service.hedge_enabled = enabled
+            token = (await service.authenticate_user("241500000", "password")).token
+            # 预热，积累 p95 所需的样本
+            await drive(service, token, 50, concurrency)
+            stub.state.tail_rate = tail_rate
+            stub.state.tail_latency = tail_latency
+            before = service.connection_stats["127.0.0.1"].requests
+            latencies = await drive(service, token, calls, concurrency)
+            upstream = service.connection_stats["127.0.0.1"].requests - before
+            print(
+                f"hedge  {name:<10} calls={calls} p50={percentile(latencies, 50) * 1000:7.1f}ms "
+                f"p99={percentile(latencies, 99) * 1000:7.1f}ms upstream_requests={upstream}"
+            )
+            await service.close()
+
+
+async def main(args: argparse.Namespace):
+    config.jwxt_read_timeout = args.read_timeout
+    config.jwxt_retry_backoff = 0.05
+    await outage(args.calls, args.concurrency, args.hang)
+    await hedge(args.calls * 10, args.concurrency, args.tail_rate, args.tail_latency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--hang", type=float, default=5.0)
+    parser.add_argument("--read-timeout", type=float, default=0.5)
+    parser.add_argument("--tail-rate", type=float, default=0.05)
+    parser.add_argument("--tail-latency", type=float, default=1.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,100 @@
+"""
+日志开销基准测试
+
+并发请求 /api/user/testrecords，对比三种日志配置下的请求延迟：
+- off:   关闭 app logger
+- sync:  改造前的方式，控制台与文件处理器直接挂在 logger 上，在事件循环线程中写出
+- queue: 当前的方式，日志入队后由 QueueListener 后台线程写出
+
+首次鉴权会访问 Redis 黑名单，需要本地可访问的 Redis。控制台输出的日志建议重定向掉：
+
+    python -m benchmarks.bench_logging --requests 2000 --concurrency 20 2>/dev/null
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from httpx import AsyncClient
+
+from app.core import logger as logger_module
+from app.core.logger import logger
+
+from .common import bearer, client, create_user, percentile, sqlite_app
+
+ENDPOINT = "/api/user/testrecords"
+
+
+async def run(http: AsyncClient, total: int, concurrency: int) -> tuple[list[float], float]:
+    headers = bearer("log_user")
+    latencies: list[float] = []
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await http.get(ENDPOINT, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.text
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start
+
+
+def use_sync_handlers() -> list[logging.Handler]:
+    """把 QueueListener 的处理器直接挂回 logger 上，模拟改造前的同步写日志"""
+    listener = logger_module._listener
+    handlers = list(listener.handlers)
+    queue_handlers = list(logger.handlers)
+    for handler in queue_handlers:
+        logger.removeHandler(handler)
+    for handler in handlers:
+        logger.addHandler(handler)
+    return queue_handlers
+
+
+def restore_queue_handlers(queue_handlers: list[logging.Handler]):
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    for handler in queue_handlers:
+        logger.addHandler(handler)
+
+
+def report(name: str, latencies: list[float], elapsed: float):
+    print(
+        f"{name:<6} rps={len(latencies) / elapsed:8.1f} p50={percentile(latencies, 50) * 1000:7.2f}ms "
+        f"p95={percentile(latencies, 95) * 1000:7.2f}ms p99={percentile(latencies, 99) * 1000:7.2f}ms"
+    )
+
+
+async def main(total: int, concurrency: int):
+    async with sqlite_app() as session_factory:
+        await create_user(session_factory, "log_user")
+
+        async with client() as http:
+            await run(http, concurrency, concurrency)  # 预热，填充鉴权缓存
+
+            logger.disabled = True
+            off = await run(http, total, concurrency)
+            logger.disabled = False
+
+            queue_handlers = use_sync_handlers()
+            sync = await run(http, total, concurrency)
+            restore_queue_handlers(queue_handlers)
+
+            queued = await run(http, total, concurrency)
+
+    report("off", *off)
+    report("sync", *sync)
+    report("queue", *queued)
+    print(f"logger stats: {logger_module.get_logger_stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,81 @@
+"""
+登录风暴基准测试
+
+大量并发登录（bcrypt 校验）进行时，测量一个无关接口（/api/user/testrecords）的延迟分布。
+对比 bcrypt 直接在事件循环中执行与放入密码哈希工作池两种方式下的 p50/p99。
+探测请求首次鉴权会访问 Redis 黑名单，需要本地可访问的 Redis。
+
+用法（在 C 目录下）：
+
+    python -m benchmarks.bench_login_storm --logins 200 --probes 200
+"""
+
+import argparse
+import asyncio
+import time
+
+from httpx import AsyncClient
+
+from app.services.auth.password_hasher import password_hasher
+
+from .common import bearer, client, create_user, percentile, sqlite_app
+
+PROBE_ENDPOINT = "/api/user/testrecords"
+
+
+async def inline_run(func, *args):
+    """改造前的行为：在事件循环线程里同步执行 bcrypt"""
+    return func(*args)
+
+
+async def storm(http: AsyncClient, logins: int, probes: int) -> list[float]:
+    async def login():
+        response = await http.post("/api/auth/login", data={"username": "storm_user", "password": "123456"})
+        assert response.status_code == 200, response.text
+
+    async def probe() -> list[float]:
+        latencies = []
+        headers = bearer("probe_user")
+        for _ in range(probes):
+            start = time.perf_counter()
+            response = await http.get(PROBE_ENDPOINT, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.text
+            await asyncio.sleep(0.005)
+        return latencies
+
+    results = await asyncio.gather(probe(), *(login() for _ in range(logins)))
+    return results[0]
+
+
+def report(name: str, latencies: list[float]):
+    print(
+        f"{name:<10} p50={percentile(latencies, 50) * 1000:8.2f}ms "
+        f"p99={percentile(latencies, 99) * 1000:8.2f}ms max={max(latencies) * 1000:8.2f}ms"
+    )
+
+
+async def main(logins: int, probes: int):
+    async with sqlite_app() as session_factory:
+        await create_user(session_factory, "storm_user")
+        await create_user(session_factory, "probe_user")
+
+        async with client() as http:
+            password_hasher.run = inline_run  # type: ignore[method-assign]
+            inline = await storm(http, logins, probes)
+            del password_hasher.run
+
+            pooled = await storm(http, logins, probes)
+            password_hasher.shutdown()
+
+    report("inline", inline)
+    report("pooled", pooled)
+    print(f"hasher stats: {password_hasher.stats.to_json()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--probes", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.probes))
@@ -0,0 +1,68 @@
+"""
+指标中间件开销基准测试
+
+直接以 ASGI 方式调用一个只返回 204 的最小应用 --requests 次，对比有无 MetricsMiddleware 时每个请求的平均耗时，
+差值即为记录一次请求计数与延迟直方图的开销。传入 --multiproc-dir 时在多进程模式（PROMETHEUS_MULTIPROC_DIR）下测量，
+该模式下指标写入 mmap 文件，开销高于单进程模式。
+
+用法（在 C 目录下）：
+
+    python -m benchmarks.bench_metrics --requests 50000
+    python -m benchmarks.bench_metrics --requests 50000 --multiproc-dir /tmp/prometheus
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+
+class Route:
+    path = "/api/user/profile"
+
+
+async def endpoint(scope, receive, send):
+    scope["route"] = Route
+    await send({"type": "http.response.start", "status": 204, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def run(app, requests: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app({"type": "http", "method": "GET", "path": "/api/user/profile"}, receive, send)
+    return (time.perf_counter() - start) / requests
+
+
+async def main(requests: int):
+    from app.core.metrics import MetricsMiddleware, clear_multiproc_dir, prometheus_client
+
+    if prometheus_client is None:
+        raise SystemExit("需要安装 prometheus_client")
+    clear_multiproc_dir()
+    # 预热
+    await run(MetricsMiddleware(endpoint), 1000)
+    bare = await run(endpoint, requests)
+    instrumented = await run(MetricsMiddleware(endpoint), requests)
+    mode = "multiprocess" if "PROMETHEUS_MULTIPROC_DIR" in os.environ else "single"
+    print(f"mode={mode} requests={requests}")
+    print(f"bare         per_request={bare * 1e6:7.2f}us")
+    print(f"instrumented per_request={instrumented * 1e6:7.2f}us overhead={(instrumented - bare) * 1e6:6.2f}us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=50000)
+    parser.add_argument("--multiproc-dir", default=None)
+    args = parser.parse_args()
+    if args.multiproc_dir:
+        # 必须在导入 prometheus_client 之前设置
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = args.multiproc_dir
+        os.makedirs(args.multiproc_dir, exist_ok=True)
+    asyncio.run(main(args.requests))
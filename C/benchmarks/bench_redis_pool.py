@@ -0,0 +1,80 @@
+"""
+Redis 连接池基准测试
+
+对比「每个请求新建一个 Redis 客户端」与「进程内共享连接池」两种方式下，
+已鉴权接口的每秒请求数（RPS）。需要本地可访问的 Redis（config.redis_host/redis_port）。
+
+用法（在 C 目录下）：
+
+    python -m benchmarks.bench_redis_pool --requests 2000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import time
+from collections.abc import AsyncGenerator
+
+from httpx import AsyncClient
+from redis.asyncio import Redis
+
+from app.core import redis as core_redis
+from app.core.config import config
+from app.main import app
+from app.models.user import UserRole
+from app.services.auth.token_cache import token_cache
+
+from .common import bearer, client, create_user, sqlite_app
+
+ENDPOINT = "/api/admin/redis/pool"
+
+
+async def legacy_get_redis_client() -> AsyncGenerator[Redis, None]:
+    """改造前的实现：每个请求新建并关闭一个客户端"""
+    redis_client = Redis(host=config.redis_host, port=config.redis_port, decode_responses=True)
+    try:
+        yield redis_client
+    finally:
+        await redis_client.aclose()
+
+
+async def run(http: AsyncClient, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            response = await http.get(ENDPOINT)
+            assert response.status_code == 200, response.text
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return total / (time.perf_counter() - start)
+
+
+async def main(total: int, concurrency: int):
+    # 关闭鉴权缓存，保证每个请求都会访问 Redis 黑名单
+    token_cache.maxsize = 0
+
+    async with sqlite_app() as session_factory:
+        await create_user(session_factory, "bench_admin", role=UserRole.admin)
+
+        async with client(bearer("bench_admin")) as http:
+            app.dependency_overrides[core_redis.get_redis_client] = legacy_get_redis_client
+            legacy_rps = await run(http, total, concurrency)
+            del app.dependency_overrides[core_redis.get_redis_client]
+
+            await core_redis.load_redis()
+            pooled_rps = await run(http, total, concurrency)
+            stats = core_redis.get_redis_pool_stats()
+            await core_redis.close_redis()
+
+    print(f"per-request client: {legacy_rps:8.1f} req/s")
+    print(f"shared pool:        {pooled_rps:8.1f} req/s  ({pooled_rps / legacy_rps:.2f}x)")
+    print(f"pool stats:         {stats}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,109 @@
+"""
+静态资源服务基准测试
+
+对比原来的 StaticFiles 与 PrecompressedStaticFiles 下，加载一次前端构建产物时：
+- 首次访问传输的字节数与首字节时间（TTFB）p50/p99
+- 再次访问时仍需发往服务器的请求数（带内容哈希的文件标记为 immutable 后浏览器不再重新验证）
+
+默认使用 --dir 指定的前端 dist 目录；未指定时生成一份模拟的 Vite 构建产物。
+
+用法（在 C 目录下）：
+
+    python -m benchmarks.bench_static --rounds 50
+    python -m benchmarks.bench_static --dir "frontend/金融就业服务系统/finance-employment/dist"
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from httpx import ASGITransport, AsyncClient
+from starlette.staticfiles import StaticFiles
+
+from app.core.static import IMMUTABLE_CACHE_CONTROL, PrecompressedStaticFiles
+
+from .common import percentile
+
+
+def fake_dist(root: Path) -> Path:
+    """生成与 Vite 构建产物相近的目录：一个 index.html 与若干带哈希的 js/css"""
+    rng = random.Random(0)
+    words = ["const", "function", "return", "export", "import", "value", "props", "state", "=>", "{", "}"]
+    assets = root / "assets"
+    assets.mkdir(parents=True)
+    (root / "index.html").write_text("<!doctype html><div id=app></div>" * 20)
+    for i, size in enumerate([400_000, 120_000, 40_000, 8_000]):
+        suffix = ".css" if i == 2 else ".js"
+        text = " ".join(rng.choice(words) + str(rng.randint(0, 99)) for _ in range(size // 6))
+        digest = hashlib.sha256(text.encode()).hexdigest()[:8]
+        (assets / f"chunk{i}-{digest}{suffix}").write_text(text)
+    return root
+
+
+async def load_page(http: AsyncClient, paths: list[str]) -> tuple[int, list[float], dict[str, str]]:
+    """依次请求所有资源，返回传输字节数、每个请求的 TTFB 以及每个资源的 ETag"""
+    sent = 0
+    ttfb = []
+    etags = {}
+    for path in paths:
+        start = time.perf_counter()
+        async with http.stream("GET", path, headers={"Accept-Encoding": "br, gzip"}) as response:
+            ttfb.append(time.perf_counter() - start)
+            async for chunk in response.aiter_raw():
+                sent += len(chunk)
+            etags[path] = response.headers.get("etag", "")
+            if response.headers.get("cache-control") == IMMUTABLE_CACHE_CONTROL:
+                etags[path] = ""
+    return sent, ttfb, etags
+
+
+async def revisit(http: AsyncClient, etags: dict[str, str]) -> int:
+    """模拟浏览器再次访问：immutable 的资源直接使用本地缓存，其余资源带 If-None-Match 重新验证"""
+    requests = 0
+    for path, etag in etags.items():
+        if not etag:
+            continue
+        response = await http.get(path, headers={"Accept-Encoding": "br, gzip", "If-None-Match": etag})
+        assert response.status_code in (200, 304)
+        requests += 1
+    return requests
+
+
+async def measure(name: str, static, paths: list[str], rounds: int):
+    async with AsyncClient(transport=ASGITransport(app=static), base_url="http://bench") as http:
+        ttfb: list[float] = []
+        for _ in range(rounds):
+            sent, samples, etags = await load_page(http, paths)
+            ttfb.extend(samples)
+        requests = await revisit(http, etags)
+    print(
+        f"{name:<14} bytes={sent:>9} ttfb p50={percentile(ttfb, 50) * 1000:6.2f}ms "
+        f"p99={percentile(ttfb, 99) * 1000:6.2f}ms revisit_requests={requests}/{len(paths)}"
+    )
+
+
+async def main(directory: str | None, rounds: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        dist = Path(directory) if directory else fake_dist(Path(tmp) / "dist")
+        paths = [
+            "/" + os.path.relpath(os.path.join(dirpath, f), dist).replace(os.sep, "/")
+            for dirpath, _, files in os.walk(dist)
+            for f in files
+            if not f.endswith((".gz", ".br"))
+        ]
+        await measure("StaticFiles", StaticFiles(directory=dist), paths, rounds)
+        precompressed = PrecompressedStaticFiles(directory=str(dist), cache_dir=Path(tmp) / "cache")
+        await measure("precompressed", precompressed, paths, rounds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dir", default=None)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.dir, args.rounds))
@@ -0,0 +1,82 @@
+"""
+测试记录写入基准测试
+
+对比逐条调用 /api/user/addtestrecord 与按批调用 /api/user/addtestrecords 写入同样数量的记录时：
+- 每秒写入的记录数
+- 每条记录平均执行的 SQL 语句数（X-SQL-Statements）
+
+每条记录都带幂等键；最后把最后一批原样重发一次，确认重试不会重复写入。
+首次鉴权会访问 Redis 黑名单，需要本地可访问的 Redis。
+
+用法（在 C 目录下）：
+
+    python -m benchmarks.bench_test_records --records 2000 --batch-size 50 2>/dev/null
+"""
+
+import argparse
+import asyncio
+import time
+from uuid import uuid4
+
+from sqlalchemy import func, select
+
+from app.models.test_record import UserTestRecord
+
+from .common import bearer, client, create_user, sqlite_app
+
+
+def make_records(count: int) -> list[dict]:
+    return [
+        {"test_name": "职业倾向测试", "result": f"第 {i} 题: B", "details": None, "idempotency_key": uuid4().hex}
+        for i in range(count)
+    ]
+
+
+def report(name: str, count: int, elapsed: float, statements: int):
+    print(
+        f"{name:<8} records={count:>6} elapsed={elapsed:7.2f}s throughput={count / elapsed:9.0f} records/s "
+        f"statements/record={statements / count:5.2f}"
+    )
+
+
+async def main(records: int, batch_size: int):
+    async with sqlite_app() as session_factory:
+        await create_user(session_factory, "record_user")
+        async with client(bearer("record_user")) as http:
+            # 预热：首次鉴权走数据库，之后命中鉴权缓存
+            await http.get("/api/user/testrecords")
+
+            rows = make_records(records)
+            statements = 0
+            start = time.perf_counter()
+            for row in rows:
+                response = await http.post("/api/user/addtestrecord", json=row)
+                assert response.status_code == 200, response.text
+                statements += int(response.headers["X-SQL-Statements"])
+            report("single", records, time.perf_counter() - start, statements)
+
+            rows = make_records(records)
+            batches = [rows[i : i + batch_size] for i in range(0, records, batch_size)]
+            statements = 0
+            start = time.perf_counter()
+            for batch in batches:
+                response = await http.post("/api/user/addtestrecords", json={"records": batch})
+                assert response.status_code == 200, response.text
+                statements += int(response.headers["X-SQL-Statements"])
+            report("batch", records, time.perf_counter() - start, statements)
+
+            response = await http.post("/api/user/addtestrecords", json={"records": batches[-1]})
+            assert response.json()["created"] == 0
+
+        async with session_factory() as session:
+            total = (await session.execute(select(func.count(UserTestRecord.id)))).scalar_one()
+        assert total == records * 2, total
+        print(f"retried last batch: 0 duplicates written, total rows={total}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.records, args.batch_size))
@@ -0,0 +1,77 @@
+"""
+令牌黑名单基准测试
+
+向黑名单写入 --revoked 个 jti 后，对 --checks 个未吊销的 jti 做黑名单检查，对比：
+- redis:  改造前的方式，每次检查都 EXISTS 一次
+- filter: 先查本地布隆过滤器，只有可能命中时才访问 Redis
+输出每次检查的平均耗时、访问 Redis 的次数、过滤器内存占用以及估算与实测的误判率。
+另外测量一次吊销某个用户 --user-tokens 个令牌的耗时（一个管道）。需要本地可访问的 Redis。
+
+用法（在 C 目录下）：
+
+    python -m benchmarks.bench_token_blacklist --revoked 50000 --checks 20000
+"""
+
+import argparse
+import asyncio
+import time
+from uuid import uuid4
+
+from app.core.redis import get_shared_redis
+from app.services.auth.token_blacklist import (
+    BLACKLIST_PREFIX,
+    add_token_to_blacklist,
+    blacklist_filter,
+    is_token_blacklisted,
+    revoke_user_tokens,
+    track_issued_token,
+)
+
+
+async def main(revoked: int, checks: int, user_tokens: int):
+    redis = await get_shared_redis()
+    # 并发数不超过连接池上限
+    for start in range(0, revoked, 20):
+        await asyncio.gather(*(add_token_to_blacklist(redis, uuid4().hex, 600) for _ in range(min(20, revoked - start))))
+
+    blacklist_filter.start()
+    while not blacklist_filter.ready:
+        await asyncio.sleep(0.01)
+    unrevoked = [uuid4().hex for _ in range(checks)]
+
+    start = time.perf_counter()
+    for jti in unrevoked:
+        await redis.exists(BLACKLIST_PREFIX + jti)
+    redis_elapsed = time.perf_counter() - start
+
+    before = blacklist_filter.stats.checks - blacklist_filter.stats.local_negatives
+    start = time.perf_counter()
+    for jti in unrevoked:
+        assert not await is_token_blacklisted(redis, jti)
+    filter_elapsed = time.perf_counter() - start
+    redis_calls = blacklist_filter.stats.checks - blacklist_filter.stats.local_negatives - before
+
+    stats = blacklist_filter.to_json()
+    print(f"redis  per_check={redis_elapsed / checks * 1e6:8.1f}us redis_calls={checks}")
+    print(f"filter per_check={filter_elapsed / checks * 1e6:8.1f}us redis_calls={redis_calls}")
+    print(
+        f"filter items={stats['items']} memory={stats['memory_bytes'] / 1024:.1f}KiB hash_count={stats['hash_count']} "
+        f"estimated_fpr={stats['estimated_false_positive_rate']:.2e} "
+        f"observed_fpr={stats['observed_false_positive_rate']:.2e}"
+    )
+
+    for _ in range(user_tokens):
+        await track_issued_token(redis, 0, uuid4().hex, 600)
+    start = time.perf_counter()
+    count = await revoke_user_tokens(redis, 0)
+    print(f"revoke_user_tokens tokens={count} elapsed={(time.perf_counter() - start) * 1000:.2f}ms")
+    await blacklist_filter.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--revoked", type=int, default=50000)
+    parser.add_argument("--checks", type=int, default=20000)
+    parser.add_argument("--user-tokens", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.revoked, args.checks, args.user_tokens))
@@ -0,0 +1,86 @@
+"""
+批量导入用户基准测试
+
+对比逐个调用 /api/auth/register 与 UserImporter 批量导入时每分钟创建的用户数。
+两者耗时都主要在 bcrypt 上：注册使用默认的 rounds（12），批量导入使用 user_import_bcrypt_rounds（默认同为 12），
+并在 user_import_hash_workers 个进程中并行计算，吞吐量大致与 CPU 核数成正比。
+内存 SQLite 只有一个连接，注册请求依次发送，即「一个一个注册」的情形。
+
+用法（在 C 目录下）：
+
+    python -m benchmarks.bench_user_import --users 1000 --register-users 100
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from app.core.config import config
+from app.services.auth.password_hasher import password_hasher
+from app.services.user_import import UserImporter, user_import_hasher
+
+from .common import client, sqlite_app
+
+
+def csv_rows(prefix: str, count: int) -> list[dict]:
+    return [
+        {
+            "username": f"{prefix}{i:06d}",
+            "realname": f"用户{i}",
+            "email": f"{prefix}{i:06d}@m.gduf.edu.cn",
+            "password": f"password{i}",
+        }
+        for i in range(count)
+    ]
+
+
+async def csv_chunks(rows: list[dict]):
+    yield b"username,realname,email,password\n"
+    for row in rows:
+        yield f"{row['username']},{row['realname']},{row['email']},{row['password']}\n".encode()
+
+
+async def bench_register(count: int) -> float:
+    rows = csv_rows("r", count)
+    async with sqlite_app(), client() as http:
+        start = time.perf_counter()
+        for row in rows:
+            response = await http.post("/api/auth/register", json=row)
+            assert response.status_code == 200, response.text
+        elapsed = time.perf_counter() - start
+    password_hasher.shutdown()
+    return elapsed
+
+
+async def bench_import(count: int) -> tuple[float, int]:
+    rows = csv_rows("i", count)
+    async with sqlite_app() as session_factory:
+        start = time.perf_counter()
+        report = await UserImporter(session_factory).run(csv_chunks(rows), "csv")
+        elapsed = time.perf_counter() - start
+    user_import_hasher.shutdown()
+    assert report.failed == 0, report.errors[:5]
+    return elapsed, report.created
+
+
+def report(name: str, count: int, elapsed: float):
+    print(f"{name:<10} users={count:>6} elapsed={elapsed:8.2f}s throughput={count / elapsed * 60:10.0f} users/min")
+
+
+async def main(users: int, register_users: int):
+    print(
+        f"cpu={os.cpu_count()} hash_workers={config.user_import_hash_workers} "
+        f"import_rounds={config.user_import_bcrypt_rounds} chunk_size={config.user_import_chunk_size}"
+    )
+    report("register", register_users, await bench_register(register_users))
+    elapsed, created = await bench_import(users)
+    report("import", created, elapsed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--register-users", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.register_users))
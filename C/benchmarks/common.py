@@ -0,0 +1,77 @@
+"""基准测试公用工具：基于内存 SQLite 启动 app，并提供常用统计函数"""
+
+import statistics
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from datetime import timedelta
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.sql import Base, get_db
+from app.main import app
+from app.models.user import User, UserRole
+from app.schemas.auth import Payload
+from app.services.auth.auth_service import create_access_token, get_password_hash
+
+
+@asynccontextmanager
+async def sqlite_app() -> AsyncGenerator[async_sessionmaker[AsyncSession], None]:
+    """把 app 的 get_db 替换为内存 SQLite，返回会话工厂"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async def override_get_db():
+        async with session_factory() as session:
+            try:
+                yield session
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        yield session_factory
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        await engine.dispose()
+
+
+async def create_user(
+    session_factory: async_sessionmaker[AsyncSession],
+    username: str,
+    password: str = "123456",
+    role: UserRole = UserRole.student,
+) -> User:
+    async with session_factory() as session:
+        user = User(
+            username=username,
+            password=get_password_hash(password),
+            realname=username[:10],
+            email=f"{username}@m.gduf.edu.cn",
+            role=role,
+        )
+        session.add(user)
+        await session.commit()
+        return user
+
+
+def bearer(username: str) -> dict:
+    token = create_access_token(Payload(sub=username), timedelta(minutes=30))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def client(headers: dict | None = None) -> AsyncClient:
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://bench", headers=headers)
+
+
+def percentile(samples: list[float], p: float) -> float:
+    """p 取 0~100"""
+    if not samples:
+        return 0.0
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[max(0, min(98, int(p) - 1))]
@@ -1,18 +1,40 @@
+from collections import OrderedDict
 from collections.abc import AsyncGenerator
 from uuid import uuid4
 
+import pytest
 import pytest_asyncio
 from database import close_db, get_db, init_test_db
 from httpx import ASGITransport, AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core import redis as core_redis
 from app.deps.sql import get_db as get_sql_db
 from app.main import app
 from app.models.user import User, UserRole
 from app.repositories.profile import UserProfileRepository
 from app.repositories.test_record import UserTestRecordRepository
 from app.repositories.user import UserRepository
-from app.services.authenticate_service import get_password_hash
+from app.services.auth.auth_service import get_password_hash
+from app.services.view_cache import view_cache
+
+try:
+    from fakeredis.aioredis import FakeRedis
+except ImportError:  # 未安装 fakeredis 时使用本地 Redis
+    FakeRedis = None
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch):
+    """每个测试使用一个全新的进程内 Redis，不依赖本地 Redis 服务，测试之间的黑名单、缓存互不影响"""
+    # 视图缓存的本地一级缓存也按测试隔离，用户 ID 在测试间被复用时不会读到其他用户的视图
+    monkeypatch.setattr(view_cache, "_local", OrderedDict())
+    if FakeRedis is None:
+        yield None
+        return
+    client = FakeRedis(decode_responses=True)
+    monkeypatch.setattr(core_redis, "_client", client)
+    yield client
 
 
 @pytest_asyncio.fixture(scope="session")
@@ -0,0 +1,90 @@
+import asyncio
+import random
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from typing import Optional
+from uuid import uuid4
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def create_jwxt_stub(latency: float = 0.0, error_rate: float = 0.0) -> FastAPI:
+    """
+    本地模拟的教务系统，实现 method=authUser 与 method=getUserInfo
+
+    已签发的 token 保存在 stub.state.valid_tokens 中，清空即可模拟 token 过期。
+    latency 为每个请求的延迟（秒），error_rate 为返回 503 的概率，用于压测时模拟慢或不稳定的上游；
+    另外可以在 stub.state 中设置 tail_rate / tail_latency（按概率出现的长尾延迟）与 fail_next（接下来固定失败的请求数）。
+    这些参数都可以在运行中修改
+    """
+    stub = FastAPI()
+    stub.state.valid_tokens = set()
+    stub.state.latency = latency
+    stub.state.error_rate = error_rate
+    stub.state.tail_rate = 0.0
+    stub.state.tail_latency = 0.0
+    stub.state.fail_next = 0
+
+    @stub.api_route("/app.do", methods=["GET", "POST"])
+    async def app_do(request: Request):
+        method = request.query_params.get("method")
+        student_id = request.query_params.get("xh", "")
+
+        if stub.state.tail_rate > 0 and random.random() < stub.state.tail_rate:
+            await asyncio.sleep(stub.state.tail_latency)
+        elif stub.state.latency > 0:
+            await asyncio.sleep(stub.state.latency)
+        if stub.state.fail_next > 0:
+            stub.state.fail_next -= 1
+            return JSONResponse({"success": False, "message": "服务暂不可用"}, status_code=503)
+        if stub.state.error_rate > 0 and random.random() < stub.state.error_rate:
+            return JSONResponse({"success": False, "message": "服务暂不可用"}, status_code=503)
+
+        if method == "authUser":
+            token = f"stub-token-{student_id}-{uuid4().hex}"
+            stub.state.valid_tokens.add(token)
+            return {"success": True, "token": token}
+
+        if method == "getUserInfo":
+            if request.headers.get("tokens") not in stub.state.valid_tokens:
+                return JSONResponse({"success": False, "message": "token无效"}, status_code=401)
+            return {
+                "fxzy": "",
+                "xh": student_id,
+                "xm": "测试学生",
+                "dqszj": "2024",
+                "usertype": "2",
+                "yxmc": "计算机与信息工程学院",
+                "xz": 4,
+                "bj": "计科1班",
+                "dh": None,
+                "email": None,
+                "rxnf": "2024",
+                "xb": "男",
+                "ksh": "",
+                "nj": "2024",
+                "qq": None,
+                "zymc": "计算机科学与技术",
+            }
+
+        return JSONResponse({"success": False, "message": "未知方法"}, status_code=400)
+
+    return stub
+
+
+@asynccontextmanager
+async def run_jwxt_stub(stub: Optional[FastAPI] = None) -> AsyncGenerator[str, None]:
+    """在随机端口上启动模拟教务系统，返回其 app.do 地址"""
+    stub = stub or create_jwxt_stub()
+    server = uvicorn.Server(uvicorn.Config(stub, host="127.0.0.1", port=0, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    try:
+        yield f"http://127.0.0.1:{port}/app.do"
+    finally:
+        server.should_exit = True
+        await task
@@ -1,9 +1,25 @@
+import asyncio
+from uuid import uuid4
+
 from fastapi.testclient import TestClient
 from httpx import AsyncClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
 
+from app.core.redis import get_shared_redis
 from app.main import app
 from app.models.user import User
 from app.repositories.user import UserRepository
+from app.services.auth.token_blacklist import (
+    BLACKLIST_INDEX_KEY,
+    BLACKLIST_PREFIX,
+    BloomFilter,
+    add_token_to_blacklist,
+    blacklist_filter,
+    is_token_blacklisted,
+    revoke_user_tokens,
+)
+from app.services.auth.token_cache import token_cache
 
 client = TestClient(app)
 access_token: str = ""
@@ -43,3 +59,103 @@ async def test_logout(async_client: AsyncClient):
     assert response.status_code == 200
     response = await async_client.post("/api/student/info")
     assert response.status_code != 200
+
+
+def test_bloom_filter_false_positive_rate():
+    bloom = BloomFilter(capacity=10000, error_rate=0.01)
+    for i in range(10000):
+        bloom.add(f"revoked-{i}")
+    assert all(f"revoked-{i}" in bloom for i in range(10000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(20000))
+    assert false_positives / 20000 < 0.02
+    assert bloom.memory_bytes < 13000
+
+
+async def test_blacklist_filter_skips_redis_for_unrevoked_tokens():
+    redis = await get_shared_redis()
+    await add_token_to_blacklist(redis, "revoked-before-start", 60)
+    # 索引上线前登出的令牌只有黑名单键
+    await redis.set(BLACKLIST_PREFIX + "revoked-before-index", "true", ex=60)
+    blacklist_filter.start()
+    try:
+        for _ in range(100):
+            if blacklist_filter.ready:
+                break
+            await asyncio.sleep(0.01)
+        assert blacklist_filter.ready
+
+        negatives = blacklist_filter.stats.local_negatives
+        assert not await is_token_blacklisted(redis, uuid4().hex)
+        assert blacklist_filter.stats.local_negatives == negatives + 1
+
+        # 启动前吊销的令牌通过全量加载进入过滤器，之后吊销的通过 pub/sub 与本地更新
+        assert await is_token_blacklisted(redis, "revoked-before-start")
+        assert await is_token_blacklisted(redis, "revoked-before-index")
+        assert await redis.zscore(BLACKLIST_INDEX_KEY, "revoked-before-index") is not None
+        await add_token_to_blacklist(redis, "revoked-after-start", 60)
+        assert await is_token_blacklisted(redis, "revoked-after-start")
+    finally:
+        await blacklist_filter.stop()
+
+
+async def test_revoke_all_user_tokens(async_client: AsyncClient, test_user: User):
+    tokens = []
+    for _ in range(3):
+        response = await async_client.post(
+            "/api/auth/login", data={"username": test_user.username, "password": "123456"}
+        )
+        tokens.append(response.json()["access_token"])
+    for token in tokens:
+        response = await async_client.get("/api/user/profile", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200
+
+    assert await revoke_user_tokens(await get_shared_redis(), test_user.id) == 3
+    for token in tokens:
+        response = await async_client.get("/api/user/profile", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 401
+
+
+async def test_disabling_user_evicts_cached_principal(
+    student_client: AsyncClient, test_user: User, user_repo: UserRepository
+):
+    assert (await student_client.get("/api/user/profile")).status_code == 200
+    revocations = token_cache.stats.revocations
+
+    # 令牌已在鉴权缓存中，禁用用户并提交后，下一次请求重新读取 users 表
+    await user_repo.edit_info(test_user, status=False)
+    await user_repo.session.commit()
+    assert token_cache.stats.revocations == revocations + 1
+    assert (await student_client.get("/api/user/profile")).status_code == 401
+
+
+def test_principal_change_committed_outside_event_loop():
+    # 脚本或数据迁移中的同步 Session 提交时没有事件循环，不能因为广播而报错
+    engine = create_engine("sqlite://")
+    with Session(engine) as session:
+        session.execute(text("SELECT 1"))
+        session.info["principal_changes"] = {42}
+        session.commit()
+    engine.dispose()
+
+
+async def test_server_timing_only_for_admins_or_debug_header(student_client: AsyncClient, test_admin: User):
+    response = await student_client.get("/api/user/profile")
+    assert "Server-Timing" not in response.headers
+
+    # 开发环境下调试请求头对任何用户生效
+    response = await student_client.get("/api/user/profile", headers={"X-Server-Timing": "1"})
+    assert "jwt;dur=" in response.headers["Server-Timing"]
+
+    response = await student_client.post(
+        "/api/auth/login",
+        data={"username": test_admin.username, "password": "123456"},
+        headers={"X-Server-Timing": "1"},
+    )
+    assert "bcrypt;dur=" in response.headers["Server-Timing"]
+    assert "db;dur=" in response.headers["Server-Timing"]
+
+    # 管理员不需要调试请求头
+    admin_token = response.json()["access_token"]
+    response = await student_client.get("/api/user/profile", headers={"Authorization": f"Bearer {admin_token}"})
+    phases = {metric.split(";")[0].strip() for metric in response.headers["Server-Timing"].split(",")}
+    assert {"jwt", "blacklist", "db", "total"} <= phases
@@ -0,0 +1,35 @@
+from pathlib import Path
+
+import pytest
+from httpx import AsyncClient
+
+from app.core.frontend import FrontendRoutes, frontend_routes
+
+
+@pytest.fixture
+def spa_frontend(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> FrontendRoutes:
+    dist = tmp_path / "dist"
+    dist.mkdir()
+    (dist / "index.html").write_text("<div id=app></div>", encoding="utf-8")
+    routes = FrontendRoutes(str(tmp_path), str(dist))
+    monkeypatch.setattr(frontend_routes, "spa_index", routes.spa_index)
+    return routes
+
+
+async def test_spa_routes_served_from_memory(async_client: AsyncClient, spa_frontend: FrontendRoutes):
+    response = await async_client.get("/some/vue/route")
+    assert response.status_code == 200
+    assert response.text == "<div id=app></div>"
+    etag = response.headers["etag"]
+
+    # 删除磁盘上的文件后仍然从内存返回
+    Path(spa_frontend.spa_index.path).unlink()
+    response = await async_client.get("/api/auth/register")
+    assert response.status_code == 200
+
+    response = await async_client.get("/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    last_modified = response.headers["last-modified"]
+    response = await async_client.get("/another", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
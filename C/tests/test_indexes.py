@@ -0,0 +1,76 @@
+import os
+from pathlib import Path
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.sql import Base
+from app.repositories.jwxt import JWXTRepository
+from app.repositories.test_record import UserTestRecordRepository
+
+SEED_ROWS = int(os.getenv("INDEX_TEST_ROWS", "1000000"))
+SEED_USERS = 10000
+
+
+async def _seed(conn):
+    await conn.exec_driver_sql(
+        f"""
+        WITH RECURSIVE seq(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM seq WHERE i < {SEED_USERS})
+        INSERT INTO users (username, password, realname, email, role, status, create_time, update_time)
+        SELECT 'user' || i, 'x', 'user' || i, 'user' || i || '@m.gduf.edu.cn', 'student', 1,
+               datetime('now'), datetime('now')
+        FROM seq
+        """
+    )
+    await conn.exec_driver_sql(
+        f"""
+        WITH RECURSIVE seq(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM seq WHERE i < {SEED_ROWS})
+        INSERT INTO jwxt_user_info (user_id, student_id, sync_time)
+        SELECT i % {SEED_USERS} + 1, '2415' || (i % {SEED_USERS}), datetime('now', '-' || i || ' seconds')
+        FROM seq
+        """
+    )
+    await conn.exec_driver_sql(
+        f"""
+        WITH RECURSIVE seq(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM seq WHERE i < {SEED_ROWS})
+        INSERT INTO user_test_record (user_id, test_name, result, create_time, update_time)
+        SELECT i % {SEED_USERS} + 1, 'test' || (i % 7), 'result', datetime('now', '-' || i || ' seconds'),
+               datetime('now')
+        FROM seq
+        """
+    )
+    await conn.exec_driver_sql("ANALYZE")
+
+
+async def test_hot_lookups_use_indexes(tmp_path: Path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'explain.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await _seed(conn)
+
+    # 记录仓库方法实际发出的 SQL，再逐条 EXPLAIN
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    async with AsyncSession(engine) as session:
+        await JWXTRepository(session).get_user_info_by_user_id(42)
+        await UserTestRecordRepository(session).get_by_username("user42", "test3")
+        await UserTestRecordRepository(session).get_by_user_id(42, "test3")
+        page = await UserTestRecordRepository(session).get_page_by_user_id(42, limit=20)
+        await UserTestRecordRepository(session).get_page_by_user_id(42, "test3", 20, (page[-1].create_time, page[-1].id))
+    event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+    async with engine.connect() as conn:
+        for statement, parameters in statements:
+            plan = (await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)).all()
+            details = [row[-1] for row in plan]
+            for detail in details:
+                # SCAN 表示全表（或全索引）扫描，TEMP B-TREE 表示没有利用索引排序
+                assert not detail.startswith(("SCAN jwxt_user_info", "SCAN user_test_record")), (statement, details)
+                assert "TEMP B-TREE" not in detail, (statement, details)
+            assert any("ix_jwxt_user_info_user_id_sync_time" in d or "ix_user_test_record_user_id" in d for d in details)
+
+    await engine.dispose()
@@ -0,0 +1,227 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from database import async_session
+from httpx import AsyncClient
+from jwxt_stub import create_jwxt_stub, run_jwxt_stub
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import config
+from app.core.redis import get_shared_redis
+from app.core.sql import Base
+from app.models.jwxt import JWXTUserInfo
+from app.models.user import User
+from app.repositories.jwxt import JWXTRepository
+from app.services.jwxt_info_compactor import JWXTInfoCompactor
+from app.services.jwxt_jobs import JOB_QUEUE_KEY, PROCESSING_LISTS_KEY, PROCESSING_PREFIX, jwxt_job_queue
+from app.services.jwxt_service import JWXTExternalService, jwxt_external_service
+from app.services.jwxt_sync_scheduler import JWXTSyncScheduler
+from app.services.jwxt_token_cache import JWXTTokenCache
+from app.services.password_encryption import encrypt_jwxt_password
+
+
+async def test_sync_reuses_upstream_connections():
+    async with run_jwxt_stub() as base_url:
+        service = JWXTExternalService(base_url)
+        for _ in range(3):
+            is_valid, user_data, _ = await service.validate_and_get_user_info("241500000", "password")
+            assert is_valid
+            assert user_data and user_data["xh"] == "241500000"
+        await service.close()
+
+    stats = service.connection_stats["127.0.0.1"]
+    # 三次同步（登录 + 获取信息）共六个请求，只建立一次连接
+    assert stats.requests == 6
+    assert stats.connections_opened == 1
+
+
+async def test_sync_reuses_cached_jwxt_token():
+    stub = create_jwxt_stub()
+    encrypted_password = encrypt_jwxt_password("password")
+    async with run_jwxt_stub(stub) as base_url:
+        service = JWXTExternalService(base_url, token_cache=JWXTTokenCache(ttl=60, local_size=10))
+        for _ in range(2):
+            success, _, _ = await service.sync_with_encrypted_password("241500002", encrypted_password)
+            assert success
+
+        # 第二次同步复用 token，只需要 getUserInfo
+        assert service.connection_stats["127.0.0.1"].requests == 3
+        assert service.token_cache.stats.saved_upstream_calls == 1
+
+        # token 失效后重新登录
+        stub.state.valid_tokens.clear()
+        success, _, _ = await service.sync_with_encrypted_password("241500002", encrypted_password)
+        assert success
+        assert service.token_cache.stats.rejected == 1
+        await service.close()
+
+
+async def test_user_info_retries_then_circuit_opens(monkeypatch):
+    monkeypatch.setattr(config, "jwxt_breaker_failure_threshold", 3)
+    monkeypatch.setattr(config, "jwxt_breaker_recovery_seconds", 0.2)
+    stub = create_jwxt_stub()
+    async with run_jwxt_stub(stub) as base_url:
+        service = JWXTExternalService(base_url)
+        service.retry_backoff = 0
+        token = (await service.authenticate_user("241500003", "password")).token
+        stats = service.connection_stats["127.0.0.1"]
+
+        # 一次 503 后重试成功
+        stub.state.fail_next = 1
+        assert (await service.get_user_info("241500003", token)).success
+        assert stats.requests == 3
+
+        # 首次请求 + 两次重试都失败，熔断器打开
+        stub.state.error_rate = 1.0
+        assert not (await service.get_user_info("241500003", token)).success
+        assert stats.requests == 6
+        assert service.breakers["127.0.0.1"].state == "open"
+
+        # 打开期间不再请求教务系统
+        result = await service.get_user_info("241500003", token)
+        assert not result.success and "暂时不可用" in result.message
+        assert stats.requests == 6
+
+        # 冷却后半开，探测成功即关闭
+        await asyncio.sleep(0.25)
+        stub.state.error_rate = 0.0
+        assert (await service.get_user_info("241500003", token)).success
+        assert service.breakers["127.0.0.1"].state == "closed"
+        await service.close()
+
+
+async def wait_for_job(client: AsyncClient, job_id: str) -> dict:
+    for _ in range(100):
+        job = (await client.get(f"/api/jwxt/jobs/{job_id}")).json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        await asyncio.sleep(0.05)
+    raise AssertionError(f"任务 {job_id} 未在限定时间内结束")
+
+
+async def test_bind_and_sync_run_as_coalesced_jobs(student_client: AsyncClient, monkeypatch):
+    monkeypatch.setattr(jwxt_job_queue, "session_factory", async_session)
+    stub = create_jwxt_stub(latency=0.05)
+    async with run_jwxt_stub(stub) as base_url:
+        monkeypatch.setattr(jwxt_external_service, "base_url", base_url)
+        jwxt_job_queue.start(2)
+        try:
+            # 任务结束前重复提交，合并到同一任务
+            first = await student_client.post("/api/jwxt/bind", json={"student_id": "241500004", "password": "password"})
+            second = await student_client.post("/api/jwxt/bind", json={"student_id": "241500004", "password": "password"})
+            assert first.status_code == second.status_code == 202
+            assert second.json()["job_id"] == first.json()["job_id"] and second.json()["coalesced"]
+
+            job = await wait_for_job(student_client, first.json()["job_id"])
+            assert job["status"] == "succeeded" and job["stage"] == 4
+            assert job["data"]["xh"] == "241500004"
+
+            response = await student_client.post("/api/jwxt/sync")
+            assert response.status_code == 202
+            job_id = response.json()["job_id"]
+            async with student_client.stream("GET", f"/api/jwxt/jobs/{job_id}/events") as events:
+                states = [json.loads(line[len("data: "):]) async for line in events.aiter_lines() if line.startswith("data: ")]
+            assert states[-1]["status"] == "succeeded" and states[-1]["message"] == "同步成功"
+            assert (await student_client.get("/api/jwxt/info")).status_code == 200
+        finally:
+            await jwxt_job_queue.stop()
+        await jwxt_external_service.close()
+
+    assert (await student_client.get("/api/jwxt/jobs/unknown")).status_code == 404
+
+    # 任务在独立会话中提交了绑定，删除以免影响之后复用该用户 ID 的测试
+    async with async_session() as db:
+        jwxt_repo = JWXTRepository(db)
+        await jwxt_repo.delete_binding(await jwxt_repo.get_binding_by_student_id("241500004"))
+        await jwxt_repo.commit()
+
+
+async def test_interrupted_job_is_requeued(student_client: AsyncClient, monkeypatch):
+    monkeypatch.setattr(jwxt_job_queue, "session_factory", async_session)
+    response = await student_client.post("/api/jwxt/sync")
+    job_id = response.json()["job_id"]
+
+    # 模拟执行任务时崩溃的进程：任务留在它的处理中列表，心跳已过期
+    redis = await get_shared_redis()
+    dead_list = f"{PROCESSING_PREFIX}crashed:0"
+    await redis.lmove(JOB_QUEUE_KEY, dead_list, "RIGHT", "LEFT")
+    await redis.sadd(PROCESSING_LISTS_KEY, dead_list)
+
+    jwxt_job_queue.start(1)
+    try:
+        job = await wait_for_job(student_client, job_id)
+    finally:
+        await jwxt_job_queue.stop()
+    assert job["status"] == "failed" and job["message"] == "您尚未绑定教务系统账号，请先绑定"
+    assert await redis.llen(dead_list) == 0
+    assert not await redis.sismember(PROCESSING_LISTS_KEY, dead_list)
+    assert not await redis.smembers(PROCESSING_LISTS_KEY)
+
+
+async def test_scheduler_syncs_due_bindings(database: AsyncSession, test_user: User, monkeypatch):
+    monkeypatch.setattr(config, "jwxt_sync_jitter_seconds", 0)
+    jwxt_repo = JWXTRepository(database)
+    binding = await jwxt_repo.create_binding(test_user.id, "241500001", "password")
+    binding.last_sync_time = datetime.now() - timedelta(days=config.jwxt_sync_interval_days + 1)
+    await jwxt_repo.commit()
+
+    async with run_jwxt_stub() as base_url:
+        # 两个进程同时启用时，只有取得租约的一个同步
+        scheduler = JWXTSyncScheduler(JWXTExternalService(base_url), session_factory=async_session)
+        other = JWXTSyncScheduler(JWXTExternalService(base_url), session_factory=async_session)
+        await asyncio.gather(scheduler.run_once(), other.run_once())
+        await scheduler.service.close()
+        await other.service.close()
+
+    assert scheduler.stats.scanned == 1
+    assert scheduler.stats.synced == 1
+    assert other.stats.skipped == 1 and other.stats.scanned == 0
+
+    await database.refresh(binding)
+    assert binding.last_sync_time and binding.last_sync_time > datetime.now() - timedelta(minutes=1)
+    user_info = await jwxt_repo.get_latest_user_info(test_user.id)
+    assert user_info is not None
+    assert user_info.student_id == "241500001"
+
+
+async def test_user_info_history_is_deduplicated_and_compacted(tmp_path: Path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'history.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def count_rows() -> int:
+        async with session_factory() as db:
+            return (await db.execute(select(func.count(JWXTUserInfo.id)))).scalar_one()
+
+    async with session_factory() as db:
+        jwxt_repo = JWXTRepository(db)
+        # 内容不变时只更新同步时间
+        for _ in range(3):
+            await jwxt_repo.create_user_info(1, "241500003", {"xh": "241500003", "xm": "张三"})
+        await jwxt_repo.commit()
+        assert await count_rows() == 1
+
+        for grade in range(8):
+            await jwxt_repo.create_user_info(1, "241500003", {"xh": "241500003", "nj": str(2020 + grade)})
+            await jwxt_repo.create_user_info(2, "241500004", {"xh": "241500004", "nj": str(2020 + grade)})
+        await jwxt_repo.commit()
+        assert await count_rows() == 17
+
+    monkeypatch.setattr(config, "jwxt_info_keep_last", 3)
+    monkeypatch.setattr(config, "jwxt_info_keep_days", 0)
+    monkeypatch.setattr(config, "jwxt_info_compact_batch_size", 1)
+    compactor = JWXTInfoCompactor(session_factory)
+    await compactor.run_once()
+
+    assert await count_rows() == 6
+    assert compactor.stats.users == 2
+    assert compactor.stats.rows_deleted == 11
+    assert compactor.stats.bytes_reclaimed > 0
+    async with session_factory() as db:
+        latest = await JWXTRepository(db).get_latest_user_info(1)
+        assert latest is not None and latest.grade == "2027"
+    await engine.dispose()
@@ -0,0 +1,16 @@
+import pytest
+from httpx import AsyncClient
+
+pytest.importorskip("prometheus_client")
+
+
+async def test_metrics_labelled_by_route_template(student_client: AsyncClient):
+    await student_client.get("/api/user/profile")
+    await student_client.get("/api/user/testrecords", params={"cursor": "不是游标"})
+
+    response = await student_client.get("/metrics")
+    assert response.status_code == 200
+    body = response.text
+    assert 'http_requests_total{method="GET",route="/api/user/profile",status="2xx"}' in body
+    assert 'http_requests_total{method="GET",route="/api/user/testrecords",status="4xx"}' in body
+    assert 'http_request_duration_seconds_bucket{le="0.001",method="GET",route="/api/user/profile"}' in body
@@ -0,0 +1,93 @@
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core import sql
+from app.core.sql import Base, RoutingSession, TimedQueuePool, get_db_pool_stats
+from app.main import app
+from app.models.user import User
+from app.repositories.test_record import UserTestRecordRepository
+from app.repositories.user import UserRepository
+from app.schemas.auth import Payload
+from app.services.auth.auth_service import create_access_token
+
+
+async def test_routing_session_reads_replica_until_user_writes(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    primary = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}", poolclass=TimedQueuePool)
+    replica = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}", poolclass=TimedQueuePool)
+    for engine in (primary, replica):
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    monkeypatch.setattr(sql, "_engine", primary)
+    monkeypatch.setattr(sql, "_replica_engine", replica)
+    session_factory = async_sessionmaker(primary, class_=AsyncSession, sync_session_class=RoutingSession)
+
+    def new_user(username: str) -> User:
+        return User(username=username, password="x", realname=username, email=f"{username}@m.gduf.edu.cn")
+
+    # 副本中存在、主库中不存在的用户，只读查询应从副本读到
+    async with AsyncSession(replica) as session:
+        session.add(new_user("replica_only"))
+        await session.commit()
+
+    async with session_factory() as session:
+        session.info["sticky_key"] = "writer"
+        assert await UserRepository(session).get_by_username("replica_only") is not None
+        session.add(new_user("fresh_user"))
+        await session.commit()
+        # 写过之后同一会话读主库
+        assert await UserRepository(session).get_by_username("fresh_user") is not None
+
+    # 刚写入的用户在后续请求中继续读主库，其他用户仍读副本
+    async with session_factory() as session:
+        session.info["sticky_key"] = "writer"
+        assert await UserRepository(session).get_by_username("fresh_user") is not None
+    async with session_factory() as session:
+        session.info["sticky_key"] = "reader"
+        assert await UserRepository(session).get_by_username("fresh_user") is None
+
+    stats = get_db_pool_stats()
+    assert stats["primary"]["checkouts"] > 0 and stats["replica"]["checkouts"] > 0
+    await primary.dispose()
+    await replica.dispose()
+
+
+async def test_get_db_commits_once_per_write_request(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'app.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(
+        engine, class_=AsyncSession, sync_session_class=RoutingSession, expire_on_commit=False
+    )
+    monkeypatch.setattr(sql, "AsyncSessionLocal", session_factory)
+    async with session_factory() as session:
+        await UserRepository(session).create_user("tx_user", "x", "tx_user", "tx_user@m.gduf.edu.cn")
+        await session.commit()
+
+    commits = []
+    event.listen(engine.sync_engine, "commit", lambda conn: commits.append(conn))
+
+    token = create_access_token(Payload(sub="tx_user"), timedelta(minutes=5))
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        client.headers["Authorization"] = f"Bearer {token}"
+        response = await client.post(
+            "/api/user/addtestrecord", json={"test_name": "性格测试", "result": "外向型", "details": None}
+        )
+        assert response.status_code == 200
+        # 仓库层不提交，接口在返回前提交一次，get_db 结束时没有待提交的修改
+        assert len(commits) == 1
+
+        response = await client.get("/api/user/testrecords")
+        assert response.status_code == 200
+        assert len(response.json()["test_records"]) == 1
+        # 只读请求不提交
+        assert len(commits) == 1
+
+    async with session_factory() as session:
+        assert len(await UserTestRecordRepository(session).get_by_username("tx_user")) == 1
+    await engine.dispose()
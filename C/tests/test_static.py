@@ -0,0 +1,37 @@
+import gzip
+from pathlib import Path
+
+from httpx import ASGITransport, AsyncClient
+
+from app.core.static import IMMUTABLE_CACHE_CONTROL, PrecompressedStaticFiles
+
+
+async def test_precompressed_static_files(tmp_path: Path):
+    dist = tmp_path / "dist"
+    (dist / "assets").mkdir(parents=True)
+    script = b"console.log('hello');\n" * 200
+    (dist / "assets" / "index-BxYz12Ab.js").write_bytes(script)
+
+    static = PrecompressedStaticFiles(directory=str(dist), cache_dir=tmp_path / "cache")
+    async with AsyncClient(transport=ASGITransport(app=static), base_url="http://static") as client:
+        response = await client.get("/assets/index-BxYz12Ab.js", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+        assert response.headers["content-type"].startswith("text/javascript")
+        assert int(response.headers["content-length"]) < len(script)
+        assert response.content == script
+
+        response = await client.get(
+            "/assets/index-BxYz12Ab.js",
+            headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]},
+        )
+        assert response.status_code == 304
+
+        response = await client.get(
+            "/assets/index-BxYz12Ab.js", headers={"Accept-Encoding": "identity", "Range": "bytes=0-9"}
+        )
+        assert response.status_code == 206
+        assert response.content == script[:10]
+
+    assert gzip.decompress((tmp_path / "cache" / "assets" / "index-BxYz12Ab.js.gz").read_bytes()) == script
@@ -1,9 +1,23 @@
+import asyncio
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+import pytest
 from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 
+from app.core.sql import Base
+from app.models.test_record import UserTestRecord
 from app.models.user import User
 from app.repositories.profile import UserProfileRepository
 from app.repositories.test_record import UserTestRecordRepository
 from app.repositories.user import UserRepository
+from app.services.auth.auth_service import verify_and_update_password
+from app.services.auth.password_hasher import PasswordHasher
+from app.services.user_import import UserImporter
 
 
 async def test_reset_password(student_client: AsyncClient, test_user: User):
@@ -89,15 +103,49 @@ async def test_add_test_record(
     assert record.details == "你是一个外向、乐观的人，喜欢与人交往。"
 
 
+async def test_add_test_records_batch_is_idempotent(
+    student_client: AsyncClient, test_user: User, test_record_repo: UserTestRecordRepository
+):
+    records = [
+        {"test_name": "批量测试", "result": "A", "idempotency_key": "k1"},
+        {"test_name": "批量测试", "result": "B", "idempotency_key": "k2"},
+        {"test_name": "批量测试", "result": "A", "idempotency_key": "k1"},
+    ]
+    response = await student_client.post("/api/user/addtestrecords", json={"records": records})
+    assert response.status_code == 200
+    assert response.json() == {"created": 2, "duplicates": ["k1"]}
+
+    # 客户端重试整批
+    response = await student_client.post("/api/user/addtestrecords", json={"records": records})
+    assert response.json() == {"created": 0, "duplicates": ["k1", "k2", "k1"]}
+
+    response = await student_client.post("/api/user/addtestrecord", json=records[1])
+    assert response.status_code == 200
+
+    more = [{"test_name": "批量测试", "result": "C", "idempotency_key": f"c{i}"} for i in range(50)]
+    response = await student_client.post("/api/user/addtestrecords", json={"records": more})
+    assert response.json()["created"] == 50
+    # 鉴权已缓存：查重、多行 INSERT、回查各一次
+    assert int(response.headers["X-SQL-Statements"]) == 3
+
+    saved = await test_record_repo.get_by_user_id(test_user.id, "批量测试")
+    assert sorted(record.result for record in saved) == ["A", "B"] + ["C"] * 50
+
+
 async def test_get_test_records(
     student_client: AsyncClient, test_user: User, test_record_repo: UserTestRecordRepository
 ):
     # First, add a test record
-    await test_record_repo.create_test_record(
-        user_id=test_user.id,
-        test_name="职业倾向测试",
-        result="适合从事金融行业",
-        details="你适合从事金融分析、投资等工作。",
+    await test_record_repo.bulk_create_test_records(
+        test_user.id,
+        [
+            {
+                "test_name": "职业倾向测试",
+                "result": "适合从事金融行业",
+                "details": "你适合从事金融分析、投资等工作。",
+                "idempotency_key": None,
+            }
+        ],
     )
 
     response = await student_client.get("/api/user/testrecords", params={"test_name": "职业倾向测试"})
@@ -109,3 +157,178 @@ async def test_get_test_records(
     assert record["test_name"] == "职业倾向测试"
     assert record["result"] == "适合从事金融行业"
     assert record["details"] == "你适合从事金融分析、投资等工作。"
+
+
+async def test_test_records_keyset_pagination(
+    student_client: AsyncClient, test_user: User, test_record_repo: UserTestRecordRepository
+):
+    # 一部分记录的 create_time 相同，依靠 id 保证顺序稳定
+    times = [datetime(2026, 1, 1, 8, 0, 0)] * 4 + [datetime(2026, 1, 2, 8, 0, 0)] * 3
+    for i, create_time in enumerate(times):
+        test_record_repo.session.add(
+            UserTestRecord(user_id=test_user.id, test_name="分页测试", result=f"r{i}", create_time=create_time)
+        )
+    await test_record_repo.session.flush()
+
+    results = []
+    cursor = None
+    pages = 0
+    while True:
+        params = {"test_name": "分页测试", "limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        data = (await student_client.get("/api/user/testrecords", params=params)).json()
+        results += [record["result"] for record in data["test_records"]]
+        pages += 1
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    assert pages == 3
+    assert results == ["r6", "r5", "r4", "r3", "r2", "r1", "r0"]
+
+    response = await student_client.get("/api/user/testrecords", params={"test_name": "分页测试", "stream": True})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line)["result"] for line in response.text.splitlines()] == results
+
+    response = await student_client.get("/api/user/testrecords", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+async def test_get_profile_loads_user_once(student_client: AsyncClient):
+    response = await student_client.get("/api/user/profile")
+    assert response.status_code == 200
+    # 当前用户 + 用户资料，最多两条语句
+    assert int(response.headers["X-SQL-Statements"]) <= 2
+
+
+async def check_addition_order_under_concurrency(engine: AsyncEngine, registrations: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def register(prefix: str) -> int:
+        async with session_factory() as session:
+            repo = UserRepository(session)
+            order = await repo.get_addition_order(prefix)
+            username = f"{prefix}{order:05d}"
+            await repo.create_user(username, "x", username[:10], f"{username}@m.gduf.edu.cn")
+            await session.commit()
+            return order
+
+    # 已有 3 个该前缀的用户，计数器第一次使用时从 4 开始
+    async with session_factory() as session:
+        for i in range(1, 4):
+            session.add(User(username=f"gd{i:05d}", password="x", realname="x", email=f"gd{i}@m.gduf.edu.cn"))
+        await session.commit()
+    assert await register("gd") == 4
+
+    orders = await asyncio.gather(*(register("gd") for _ in range(registrations)))
+    assert sorted(orders) == list(range(5, registrations + 5))
+
+    # 新前缀的计数器行由并发的首次注册同时创建
+    orders = await asyncio.gather(*(register("nw") for _ in range(20)))
+    assert sorted(orders) == list(range(1, 21))
+
+    async with session_factory() as session:
+        usernames = (await session.execute(select(User.username))).scalars().all()
+    assert len(usernames) == len(set(usernames)) == registrations + 24
+
+
+async def test_addition_order_is_unique_under_concurrency(tmp_path: Path):
+    # 每个并发注册都能直接拿到连接，不在连接池上排队超时；SQLite 的写锁等待也放宽
+    registrations = 100
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'users.db'}",
+        pool_size=20,
+        max_overflow=registrations,
+        pool_timeout=60,
+        connect_args={"timeout": 60},
+    )
+    await check_addition_order_under_concurrency(engine, registrations)
+    await engine.dispose()
+
+
+@pytest.mark.skipif(not os.environ.get("TEST_MYSQL_URL"), reason="需要 TEST_MYSQL_URL 指向一个空的 MySQL 测试库")
+async def test_addition_order_is_unique_under_concurrency_mysql():
+    # 覆盖 INSERT ... ON DUPLICATE KEY UPDATE 分支：REPEATABLE READ 下并发的首次注册不应死锁
+    engine = create_async_engine(os.environ["TEST_MYSQL_URL"], pool_size=20)
+    try:
+        await check_addition_order_under_concurrency(engine, 200)
+    finally:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+
+async def test_bulk_import_reports_bad_rows(tmp_path: Path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'import.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as session:
+        session.add(User(username="taken", password="x", realname="x", email="taken@m.gduf.edu.cn"))
+        await session.commit()
+
+    lines = ["username,realname,email,password,role"]
+    lines += [f"imp{i},导入{i},imp{i}@m.gduf.edu.cn,pass{i:04d},student" for i in range(25)]
+    lines += [
+        "imp3,重复,dup@m.gduf.edu.cn,password,student",  # 第 27 行：文件内重复
+        "taken,已存在,new@m.gduf.edu.cn,password,student",  # 第 28 行：数据库中已存在
+        "bad,邮箱错误,bad@example.com,password,student",  # 第 29 行：邮箱不合法
+        "short,密码太短,short@m.gduf.edu.cn,123,student",  # 第 30 行：密码太短
+        "toomany,x,x@m.gduf.edu.cn,password,student,extra",  # 第 31 行：列数不对
+    ]
+    data = "\r\n".join(lines).encode()
+
+    async def chunks():
+        # 故意在多字节字符中间切开
+        for i in range(0, len(data), 7):
+            yield data[i : i + 7]
+
+    importer = UserImporter(session_factory, PasswordHasher(2), chunk_size=10, bcrypt_rounds=4)
+    report = await importer.run(chunks(), "csv")
+
+    assert (report.total, report.created, report.failed) == (30, 25, 5)
+    assert [error.line for error in report.errors] == [27, 28, 29, 30, 31]
+
+    async with session_factory() as session:
+        user = await UserRepository(session).get_by_username("imp7")
+    assert user is not None and user.realname == "导入7"
+    # 导入时用较低的 rounds，登录时会被重新哈希
+    valid, new_hash = verify_and_update_password("pass0007", user.password)
+    assert valid and new_hash is not None
+    await engine.dispose()
+
+
+async def test_bulk_import_isolates_conflicting_rows(tmp_path: Path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'import.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as session:
+        session.add(User(username="raced", password="x", realname="x", email="raced@m.gduf.edu.cn"))
+        await session.commit()
+
+    # 模拟检查之后才被并发创建的用户：重复检查看不到它，两次整批插入都冲突
+    async def nothing_exists(self, usernames, emails):
+        return set(), set()
+
+    monkeypatch.setattr(UserRepository, "get_existing_usernames_and_emails", nothing_exists)
+
+    lines = ["username,realname,email,password,role"]
+    lines += [f"ok{i},导入{i},ok{i}@m.gduf.edu.cn,pass{i:04d},student" for i in range(5)]
+    lines += [
+        "raced,冲突,other@m.gduf.edu.cn,password,student",  # 第 7 行：与并发创建的用户冲突
+        "OK1,大小写,case@m.gduf.edu.cn,password,student",  # 第 8 行：用户名仅大小写不同
+    ]
+    data = "\n".join(lines).encode()
+
+    async def chunks():
+        yield data
+
+    importer = UserImporter(session_factory, PasswordHasher(2), chunk_size=10, bcrypt_rounds=4)
+    report = await importer.run(chunks(), "csv")
+
+    assert (report.total, report.created, report.failed) == (7, 5, 2)
+    assert [error.line for error in report.errors] == [7, 8]
+    await engine.dispose()
@@ -0,0 +1,91 @@
+import asyncio
+
+from httpx import AsyncClient
+
+from app.models.user import User
+from app.services.view_cache import ViewCache, profile_view_key, view_cache
+
+
+async def test_concurrent_misses_load_once():
+    cache = ViewCache(ttl=60, local_ttl=60, local_size=100)
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"value": calls}
+
+    results = await asyncio.gather(*(cache.get_or_load("k", loader) for _ in range(50)))
+    assert calls == 1
+    assert all(result == {"value": 1} for result in results)
+    assert cache.stats.misses == 1 and cache.stats.coalesced == 49
+
+    # 加载期间被删除的结果不写入缓存
+    async def slow_loader():
+        await asyncio.sleep(0.05)
+        return "old"
+
+    loading = asyncio.create_task(cache.get_or_load("k2", slow_loader))
+    await asyncio.sleep(0.01)
+    await cache.invalidate("k2")
+    assert await loading == "old"
+    assert await cache.get_or_load("k2", loader) == {"value": 2}
+
+
+async def test_profile_view_cached_until_setprofile(student_client: AsyncClient, test_user: User):
+    response = await student_client.get("/api/user/profile")
+    assert response.json()["realname"] == "Test User"
+
+    hits = view_cache.stats.l1_hits
+    response = await student_client.get("/api/user/profile")
+    assert response.json()["realname"] == "Test User"
+    assert view_cache.stats.l1_hits == hits + 1
+    # 鉴权与视图都命中缓存，不访问数据库
+    assert int(response.headers["X-SQL-Statements"]) == 0
+
+    await student_client.post("/api/user/setprofile", json={"realname": "新名字", "college": "金融学院"})
+    response = await student_client.get("/api/user/profile")
+    assert response.json()["realname"] == "新名字"
+    assert response.json()["college"] == "金融学院"
+    assert profile_view_key(test_user.id) in view_cache._local
+
+
+async def test_invalidation_from_another_process_skips_stale_write():
+    cache = ViewCache(ttl=60, local_ttl=60, local_size=100)
+    other = ViewCache(ttl=60, local_ttl=60, local_size=100)  # 另一个 worker 进程
+
+    async def slow_loader():
+        await asyncio.sleep(0.05)
+        return "old"
+
+    async def loader():
+        return "new"
+
+    # 另一个进程在加载期间删除了该键，本进程的本地代数没有变化，靠 Redis 中的代数发现
+    loading = asyncio.create_task(cache.get_or_load("k", slow_loader))
+    await asyncio.sleep(0.01)
+    await other.invalidate("k")
+    assert await loading == "old"
+    assert cache.stats.stale_skipped == 1
+    assert await other.get_or_load("k", loader) == "new"
+
+
+async def test_waiters_load_themselves_when_loader_is_cancelled():
+    cache = ViewCache(ttl=60, local_ttl=60, local_size=100)
+    started = asyncio.Event()
+
+    async def hanging_loader():
+        started.set()
+        await asyncio.sleep(10)
+
+    async def loader():
+        return "value"
+
+    leader = asyncio.create_task(cache.get_or_load("k", hanging_loader))
+    await started.wait()
+    waiter = asyncio.create_task(cache.get_or_load("k", loader))
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert await waiter == "value"
+    assert cache.stats.coalesced == 1